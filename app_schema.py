@@ -1,11 +1,36 @@
 import streamlit as st
 import streamlit.components.v1 as components
-from pyvis.network import Network
+import numpy as np
 import pandas as pd
 import json
 import sqlite3
 import os
 import re
+import time
+import threading
+import contextvars
+import functools
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from centrality import load_centrality as load_precomputed_centrality
+from codebook_cache import load_compiled_codebook
+from column_stats import load_or_profile
+from datafication_sql import SU_SHI_ID, build_panel_queries, pick_table, resolve_tables
+from db_pool import ReadOnlyPool
+from edge_confidence import load_or_score
+from graph_html import field_lens_data, render_network_html, schema_vis_data, to_script_json
+from graph_layout import load_or_compute_layout
+from index_advisor import advise, find_scans, recommend, sidecar_path
+from nianhao import NianhaoIndex, register_functions
+from perf_trace import read_sql, span, sql_trace, start_trace, stop_trace, traced
+from person_graph import KIND_ASSOC, KIND_KIN, PersonGraph, ensure_person_graph, graph_dir
+from person_search import ensure_person_index, search_persons
+from posting_cube import UNKNOWN, ensure_cube
+from row_preview import FIRST_ROWID, ChunkCache, code_lookups, decode_codes, fetch_chunk
+from schema_graph import SchemaGraph
+from schema_search import SchemaSearchIndex
+from schema_snapshot import build_schema, db_fingerprint, refresh_table_columns
 
 # ================= 1. 页面配置 =================
 st.set_page_config(
@@ -14,6 +39,17 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# 本次重跑的起始时间（用于统计各模式的首屏耗时）
+RUN_T0 = time.perf_counter()
+
+# 性能追踪（侧边栏「性能追踪」勾选后开启，未开启时各埋点几乎没有开销）
+if st.session_state.get("cbdb_debug"):
+    TRACE = start_trace()
+else:
+    # 会话的脚本线程在多次重跑间复用同一上下文：清掉上次运行（如中途中断）留下的追踪
+    stop_trace()
+    TRACE = None
+
 st.markdown("""
 <style>
     #MainMenu {visibility: hidden;}
@@ -52,14 +88,13 @@ THEME = {
     "Social": "#E1BEE7", "Entry": "#FFE0B2", "Text": "#D7CCC8", "Dict": "#F5F5F5", "Other": "#E0E0E0"
 }
 
-IGNORE_COLS = {"c_created_by", "c_created_date", "c_modified_by", "c_modified_date", "tts_sysno", "c_notes", "c_source",
-               "c_pages"}
-
 
+@traced("load_codebook_metadata")
 @st.cache_data
 def load_codebook_metadata(excel_path):
     """
     从 cbdb_codebook.xlsx 自动提取表含义和字段含义
+    解析结果编译为按工作簿内容哈希命名的本地缓存，冷启动时无需重新解析 Excel。
     """
     t_map = {}
     f_map = {}
@@ -69,297 +104,472 @@ def load_codebook_metadata(excel_path):
         return t_map, f_map
 
     try:
-        xls = pd.ExcelFile(excel_path)
-
-        # 1. 提取表含义 (从 TABLE_LIST sheet)
-        # 根据你提供的 CSV，表名清单在 "TABLE_LIST" sheet 中
-        if 'TABLE_LIST' in xls.sheet_names:
-            df_tables = pd.read_excel(xls, 'TABLE_LIST')
-            # 统一列名小写，防止大小写差异
-            df_tables.columns = [c.lower() for c in df_tables.columns]
-
-            for _, row in df_tables.iterrows():
-                # 获取表名 (table_code) 和 中文解释 (explanation_cn)
-                t_code = str(row.get('table_code', '')).strip().upper()
-                t_cn = str(row.get('explanation_cn', '')).strip()
-                t_en = str(row.get('explanation_en', '')).strip()
-
-                # 优先使用中文，没有则用英文
-                meaning = t_cn if t_cn and t_cn.lower() != 'nan' else t_en
-                if t_code:
-                    t_map[t_code] = meaning
-
-        # 2. 提取字段含义 (遍历其他所有 sheet)
-        # 假设每个 sheet 对应一张表，里面包含 column_code 和 meaning_cn
-        for sheet_name in xls.sheet_names:
-            if sheet_name == 'TABLE_LIST': continue  # 跳过目录页
-
-            try:
-                df_sheet = pd.read_excel(xls, sheet_name)
-                df_sheet.columns = [c.lower() for c in df_sheet.columns]
-
-                # 检查是否包含字段代码列
-                if 'column_code' in df_sheet.columns:
-                    for _, row in df_sheet.iterrows():
-                        c_code = str(row.get('column_code', '')).strip()
-                        c_cn = str(row.get('meaning_cn', '')).strip()
-                        c_en = str(row.get('meaning_en', '')).strip()
-
-                        meaning = c_cn if c_cn and c_cn.lower() != 'nan' else c_en
-
-                        # 存入字典。注意：如果不同表有同名字段但含义不同，这里会覆盖。
-                        # 通常 CBDB 中同名字段含义是一致的。
-                        if c_code and meaning:
-                            if c_code not in f_map:  # 避免重复读取覆盖，保留第一次读到的（或者去掉if以最后一次为准）
-                                f_map[c_code] = meaning
-            except Exception as e:
-                # 某些 sheet 可能格式不对，跳过
-                continue
-
+        t_map, f_map = load_compiled_codebook(excel_path)
     except Exception as e:
         st.error(f"读取 Excel 字典出错: {e}")
 
     return t_map, f_map
 
 
-# --- 初始化加载 ---
-CODEBOOK_PATH = 'cbdb_codebook.xlsx'  # 确保此文件在你的根目录下
-TABLE_MEANING_MAP, FIELD_DESC_MAP = load_codebook_metadata(CODEBOOK_PATH)
+# --- 按需加载 ---
+CODEBOOK_PATH = os.environ.get("CBDB_CODEBOOK_PATH", 'cbdb_codebook.xlsx')  # 确保此文件在你的根目录下（可用环境变量覆盖）
+
+
+# 以下 get_* 提供者在第一次被调用时才加载，并在本次重跑内只计算一次
+# （脚本每次重跑都会重新定义它们，lru_cache 不会跨重跑保留旧数据）。
+# 只有用到字典 / 表结构的模式才会付出 Excel 解析与结构分析的代价。
+@functools.lru_cache(maxsize=None)
+def get_codebook():
+    """返回 (表含义, 字段含义) 两个字典。"""
+    t_map, f_map = load_codebook_metadata(CODEBOOK_PATH)
+    # 如果读取失败（例如文件不存在），提供少量的默认值防止报错
+    if not t_map:
+        t_map = {"BIOG_MAIN": "古代人物基本资料表(默认)"}
+    return t_map, f_map
+
+
+# ================= 补充：数据库连接池 =================
+def _init_connection(conn):
+    """
+    在新连接上注册年号换算函数（nianhao_label / nianhao_year / nianhao_eras）。
+    读取 NIAN_HAO 失败（如缺少预期的列）时改用空索引注册：查询照常执行，年号列为空。
+    """
+    try:
+        register_functions(conn)
+    except Exception:
+        register_functions(conn, NianhaoIndex([], [], [], [], []))
 
-# 如果读取失败（例如文件不存在），提供少量的默认值防止报错
-if not TABLE_MEANING_MAP:
-    TABLE_MEANING_MAP = {"BIOG_MAIN": "古代人物基本资料表(默认)"}
+
+@st.cache_resource
+def _pool_registry():
+    """进程级登记表 {(数据库路径, 指纹): 连接池}、已淘汰的 (路径, 指纹) 集合及其锁。"""
+    return {}, set(), threading.Lock()
+
+
+def get_db_pool(db_path, fingerprint):
+    """
+    进程级只读连接池（所有会话共享），按 (路径, 指纹) 登记。
+    同一路径出现新指纹（文件已变化）时淘汰并关闭该路径的旧池，因为 immutable=1 的连接不会感知
+    文件内容的变化；旧池借出中的连接在归还时关闭。仍持有旧指纹的重跑拿到一个不登记、用完即关的池，
+    不会反过来关闭当前的池。开启性能追踪时，借出期间执行的 SQL 记入追踪。
+    """
+    pools, retired, lock = _pool_registry()
+    key = (db_path, fingerprint)
+    with lock:
+        pool = pools.get(key)
+        if pool is not None:
+            return pool
+        pool = ReadOnlyPool(db_path, init=_init_connection, checkout=sql_trace)
+        if key in retired:
+            pool.close()
+            return pool
+        stale = [k for k in pools if k[0] == db_path]
+        retired.update(stale)
+        stale_pools = [pools.pop(k) for k in stale]
+        pools[key] = pool
+    for old in stale_pools:
+        old.close()
+    return pool
 
 
 # ================= 补充：数据库结构分析逻辑 =================
-def analyze_database_structure(db_path):
+@st.cache_data(show_spinner=False)
+def _analyze_snapshot(db_path, fingerprint):
     """
-    智能分析数据库结构 (依赖已加载的 TABLE_MEANING_MAP 和 FIELD_DESC_MAP)
+    按数据库指纹缓存的结构分析结果。指纹变化时只重新读取 DDL 变化的表。
+    """
+    tables, _ = refresh_table_columns(db_path, get_db_pool(db_path, fingerprint))
+    return build_schema(tables, *get_codebook())
+
+
+@traced("analyze_database_structure")
+def analyze_database_structure(db_path, fingerprint=None):
+    """
+    智能分析数据库结构 (依赖 get_codebook() 提供的表含义和字段含义)
+    每次重跑只计算一次数据库指纹，结构本身从缓存快照中读取。
     """
     # 如果数据库不存在，返回空结构，防止报错
     if not os.path.exists(db_path):
-        return {}, [], {}, {}, []
-
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    # 获取所有表名
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    all_tables_raw = [row[0] for row in cursor.fetchall()]
-    table_map = {t.upper(): t for t in all_tables_raw if not t.startswith("sqlite_")}
-
-    nodes = {}
-    edges = []
-    schema_docs = {}
-    field_info_for_js = {}
-    col_to_tables = {}
-
-    # --- 第一遍扫描：构建节点 (表) ---
-    for table_real in table_map.values():
-        table_upper = table_real.upper()
-
-        # 简单的分组逻辑
-        group = "Other"
-        if "BIOG" in table_upper:
-            group = "Core"
-        elif any(x in table_upper for x in ["OFFICE", "POSTED", "APPT"]):
-            group = "Office"
-        elif "KIN" in table_upper:
-            group = "Kinship"
-        elif "ASSOC" in table_upper:
-            group = "Social"
-        elif "ENTRY" in table_upper:
-            group = "Entry"
-        elif "TEXT" in table_upper:
-            group = "Text"
-        elif any(x in table_upper for x in ["CODES", "DYNAST", "ADDR"]):
-            group = "Dict"
+        return {}, [], {}, {}, [], SchemaGraph()
 
-        try:
-            df_info = pd.read_sql(f"PRAGMA table_info({table_real})", conn)
-        except:
-            continue
-
-        cols = df_info['name'].tolist()
-
-        # 📝 使用从 Excel 加载的字典
-        # 尝试大写匹配，如果没有再尝试原名匹配
-        cn_meaning = TABLE_MEANING_MAP.get(table_upper, TABLE_MEANING_MAP.get(table_real, ""))
-        if not cn_meaning: cn_meaning = "(未定义含义)"
-
-        # 纯文本 Tooltip
-        tooltip_text = f"【 {table_real} 】\n\n📝 含义: {cn_meaning}\n📊 列数: {len(cols)}"
-
-        nodes[table_real] = {
-            "label": table_real,
-            "group": group,
-            "title": tooltip_text
-        }
-
-        doc_rows = []
-        for _, row in df_info.iterrows():
-            fname = row['name']
-            if fname not in IGNORE_COLS:
-                if fname not in col_to_tables: col_to_tables[fname] = []
-                col_to_tables[fname].append(table_real)
-
-            # 📝 使用从 Excel 加载的字段字典
-            desc = FIELD_DESC_MAP.get(fname, "")
-
-            # 兜底策略：如果字典里没有，尝试简单的规则推断
-            if not desc:
-                if fname.endswith("_chn"):
-                    desc = "中文名称"
-                elif fname.endswith("_code"):
-                    desc = "代码 (FK)"
-                elif fname.endswith("_id"):
-                    desc = "ID (FK)"
-                elif fname.endswith("_year"):
-                    desc = "年份"
-
-            doc_rows.append([fname, row['type'], desc])
-
-            if fname not in field_info_for_js:
-                field_info_for_js[fname] = {"desc": desc or fname, "tables": []}
-            field_info_for_js[fname]["tables"].append(table_real)
-
-        schema_docs[table_real] = doc_rows
-
-    # --- 第二遍扫描：建立连接 (基于命名规则) ---
-    connected_tables = set()
-
-    def add_edge(src, dst, label):
-        if src == dst: return
-        if (dst, src, label) not in edges:
-            edges.append((src, dst, label))
-            connected_tables.add(src)
-            connected_tables.add(dst)
-
-    for table_real in nodes.keys():
-        cols = [r[0] for r in schema_docs[table_real]]
-
-        for col in cols:
-            if col in IGNORE_COLS: continue
-
-            # 强规则连接
-            if col == "c_personid" and "BIOG_MAIN" in table_map.values():
-                add_edge(table_real, "BIOG_MAIN", col)
-                continue
-            if col == "c_dy" and "DYNASTIES" in table_map.values():
-                add_edge(table_real, "DYNASTIES", col)
-                continue
-
-            # 命名推断连接 (例如 c_addr_id -> ADDR_CODES)
-            if "_code" in col or "_id" in col:
-                core_root = col.replace("c_", "").replace("_code", "").replace("_id", "").replace("index_", "").upper()
-                if len(core_root) > 2:
-                    candidates = [f"{core_root}_CODES", f"{core_root}_DATA", f"CODE_{core_root}"]
-                    for cand in candidates:
-                        if cand in table_map and table_map[cand] != table_real:
-                            add_edge(table_real, table_map[cand], col)
-                            break
-
-    # --- 第三遍扫描：孤岛救援 (基于字段同名) ---
-    orphan_tables = set(nodes.keys()) - connected_tables
-    for orphan in orphan_tables:
-        cols = [r[0] for r in schema_docs[orphan]]
-        for col in cols:
-            if col in IGNORE_COLS: continue
-            if col in col_to_tables:
-                others = col_to_tables[col]
-                for other in others:
-                    if other != orphan:
-                        add_edge(orphan, other, col)
-                        break
-            if orphan in connected_tables: break
-
-    conn.close()
-    return nodes, edges, schema_docs, field_info_for_js, sorted(list(col_to_tables.keys()))
+    return _analyze_snapshot(db_path, fingerprint or db_fingerprint(db_path))
 
 
 # --- 执行数据库分析 ---
-DB_PATH = 'cbdb_lite.db'
-# 这里定义了后续侧边栏需要的 NODES_REAL 全局变量
-NODES_REAL, EDGES_REAL, SCHEMA_DOCS_REAL, FIELD_INFO_JS, ALL_LINK_KEYS = analyze_database_structure(DB_PATH)
+DB_PATH = os.environ.get("CBDB_DB_PATH", 'cbdb_lite.db')  # 可用环境变量覆盖（例如基准测试指向合成库）
+DB_FINGERPRINT = db_fingerprint(DB_PATH) if os.path.exists(DB_PATH) else None
+SchemaInfo = namedtuple("SchemaInfo", "nodes edges docs field_info link_keys graph")
+
+
+@functools.lru_cache(maxsize=None)
+def get_schema():
+    """
+    数据库结构（节点、连线、字典、字段透视信息、关联键、连接图），只有架构拓扑图模式会用到。
+    """
+    return SchemaInfo(*analyze_database_structure(DB_PATH, DB_FINGERPRINT))
+
+
 # ================= 3. 侧边栏 =================
 with st.sidebar:
     st.markdown("# 🏛️ CBDB Project")
-    mode = st.radio("模式:", ("架构拓扑图 (Schema)", "数据化原理 (Datafication)"))
+    mode = st.radio("模式:", ("架构拓扑图 (Schema)", "数据化原理 (Datafication)", "人物关系网络 (Network)",
+                           "任官时空分布 (Postings)"))
     st.divider()
 
     if mode == "架构拓扑图 (Schema)":
         st.markdown("### 👁️ 视图控制")
-        available_groups = sorted(list(set([n['group'] for n in NODES_REAL.values()]))) if NODES_REAL else []
-        selected_keys = st.multiselect("展示模块:", available_groups, default=available_groups)
-        spring_len = st.slider("连线长度", 50, 800, 300)
+        st.caption("模块筛选、连线长度与覆盖率过滤在拓扑图右上角的面板中调整，不会重新加载图。")
+        layout_mode = st.radio("布局方式:", ("静态布局 (服务端预计算)", "动态物理 (浏览器计算)"),
+                               help="静态布局在服务端一次性算好坐标并关闭浏览器物理引擎，大图可立即显示。")
+        static_layout = layout_mode.startswith("静态")
+        verify_edges = st.checkbox("🔍 校验连线 (抽样引用覆盖率)",
+                                   help="抽样检查每条推断连线的字段取值能否在目标表中找到，覆盖率越高连线越粗。")
+
+    if mode == "人物关系网络 (Network)":
+        st.markdown("### 👁️ 视图控制")
+        ego_hops = st.slider("扩展跳数", 1, 3, 2)
+        ego_cap = st.slider("每人最多展开邻居数", 5, 200, 30,
+                            help="中心人物关系很多时只展开前 N 位（亲属优先，其次是关系多的人物），避免二跳后节点爆炸。")
+
+
+# ================= 4. 拓扑图逻辑 (内存渲染 + 结构快照缓存) =================
+# 拓扑图的 vis.js 选项（物理引擎参数与原 pyvis 版本一致，连线长度由前端 applyView() 调整）
+GRAPH_OPTIONS = {
+    "physics": {
+        "barnesHut": {"gravitationalConstant": -2000, "centralGravity": 0.3, "springLength": 300,
+                      "springConstant": 0.04, "damping": 0.09, "avoidOverlap": 0.1},
+        "minVelocity": 0.75
+    },
+    "interaction": {"dragNodes": True, "hover": True, "zoomView": True}
+}
 
 
-# ================= 4. 拓扑图逻辑 (Pyvis 缓存安全修复版) =================
-@st.cache_data(show_spinner=False)
-def get_pyvis_graph_html(selected_keys, spring_len):
+@st.cache_data(show_spinner=False, max_entries=4)
+def get_static_layout(fingerprint):
     """
-    使用 Streamlit 缓存来确保 Pyvis 图的生成和读取是原子的、稳定的。
-    返回 Pyvis 生成的原始 HTML 字符串。
+    按结构快照缓存的静态布局单位坐标 {表: (x, y)}（平均连线长度为 1）。
+    """
+    schema = get_schema()
+    return load_or_compute_layout(list(schema.nodes.keys()), schema.edges)
+
 
-    修复：将 /tmp/ 绝对路径改为相对路径，解决云端 FileNotFoundError 问题。
+@st.cache_data(show_spinner="正在抽样校验推断连线（每个数据库版本只需一次）…", max_entries=1)
+def get_edge_confidence(db_path, fingerprint):
+    """
+    每条推断连线的引用覆盖率 {edge_key: {"confidence", "sampled", "non_null"}}，按数据库指纹缓存。
     """
-    if not NODES_REAL:
+    schema = get_schema()
+    columns = {t: {row[0] for row in rows} for t, rows in schema.docs.items()}
+    return load_or_score(get_db_pool(db_path, fingerprint), fingerprint, schema.edges, columns)
+
+
+@traced("get_pyvis_graph_html")
+@st.cache_data(show_spinner=False, max_entries=4)
+def get_pyvis_graph_html(fingerprint, static_layout=False, verify_edges=False):
+    """
+    返回拓扑图的完整 HTML 字符串（按结构快照缓存）。
+
+    每个结构快照 (fingerprint) 只生成一份包含全部节点的完整图；
+    模块筛选和连线长度由浏览器端的 applyView() 通过 vis.js DataSet / setOptions 应用，
+    调整筛选条件不会触发服务器端重建，也不会为每种组合缓存一份 HTML。
+
+    HTML 由预解析的模板与节点/边 JSON 在内存中拼接而成，不再写读 schema_v_real.html 临时文件，
+    多个会话并发生成时不会争用同一个文件名。
+
+    static_layout=True 时节点带上服务端预计算的坐标，并关闭浏览器端物理引擎。
+    verify_edges=True 时连线宽度按抽样引用覆盖率调整，并带上置信度供前端过滤。
+    """
+    schema = get_schema()
+    if not schema.nodes:
         return None  # 如果没有节点，不生成HTML
 
-    # 1. 初始化 Pyvis 网络
-    net = Network(height="800px", width="100%", bgcolor="#ffffff", font_color="black", directed=False)
-
-    # --- 节点和边构建逻辑 (保持不变) ---
-    node_degrees = {n: 0 for n in NODES_REAL}
-    valid_edges = []
-    for src, dst, label in EDGES_REAL:
-        s_node = NODES_REAL.get(src)
-        d_node = NODES_REAL.get(dst)
-        if s_node and d_node and s_node['group'] in selected_keys and d_node['group'] in selected_keys:
-            valid_edges.append((src, dst, label))
-            node_degrees[src] += 1
-            node_degrees[dst] += 1
-    for node_id, info in NODES_REAL.items():
-        if info["group"] not in selected_keys: continue
-        size = 15
-        if node_degrees[node_id] > 5: size = 25
-        if node_degrees[node_id] > 20: size = 40
-        net.add_node(node_id, label=info["label"], title=info["title"], color=THEME.get(info["group"], "#E0E0E0"),
-                     shape="dot", size=size, borderWidth=1)
-    for src, dst, label in valid_edges:
-        try:
-            net.add_edge(src, dst, title=label, color="#CFD8DC", width=1)
-        except:
-            pass
-    # --- 节点和边构建逻辑结束 ---
+    # 节点和边构建逻辑 (全量；节点大小由前端按可见连线数重算)
+    confidence = get_edge_confidence(DB_PATH, fingerprint) if verify_edges else None
+    vis_nodes, vis_edges = schema_vis_data(schema.nodes, schema.edges, THEME, confidence)
 
-    net.set_options(
-        f"""var options = {{ "physics": {{ "barnesHut": {{ "gravitationalConstant": -2000, "centralGravity": 0.3, "springLength": {spring_len}, "springConstant": 0.04, "damping": 0.09, "avoidOverlap": 0.1 }}, "minVelocity": 0.75 }}, "interaction": {{ "dragNodes": true, "hover": true, "zoomView": true }} }}""")
+    options = GRAPH_OPTIONS
+    if static_layout:
+        # 单位坐标 ux/uy 留给前端按连线长度缩放，x/y 为默认连线长度下的初始位置
+        layout = get_static_layout(fingerprint)
+        for node in vis_nodes:
+            ux, uy = layout.get(node["id"], (0.0, 0.0))
+            node.update({"ux": ux, "uy": uy, "x": ux * 300, "y": uy * 300})
+        options = {**GRAPH_OPTIONS, "physics": {"enabled": False}}
 
-    # 2. 写入文件（使用相对路径，解决 FileNotFoundError）
-    temp_filename = "schema_v_real.html"
-    net.save_graph(temp_filename)  # 👈 关键修改：不再使用 /tmp/ 绝对路径
+    return render_network_html(vis_nodes, vis_edges, options)
 
-    # 3. 读取文件内容并返回
-    # 注意：如果 net.save_graph() 失败，这里仍会报错，但使用相对路径能大大提高成功率
-    with open(temp_filename, 'r', encoding='utf-8') as f:
-        html_content = f.read()
 
-    # 4. 删除临时文件 (必须删除，防止污染)
-    os.remove(temp_filename)
+@st.cache_data(show_spinner=False, max_entries=4)
+def get_field_lens_json(fingerprint):
+    """
+    字段透视镜的数据（按结构快照缓存）：表名驻留为数组，附带字段 -> 连线 id 索引。
+    连线 id 与 get_pyvis_graph_html 中的一致（均由 schema_vis_data 按顺序编号）。
+    """
+    schema = get_schema()
+    _, vis_edges = schema_vis_data(schema.nodes, schema.edges, THEME)
+    return to_script_json(field_lens_data(schema.link_keys, schema.field_info, vis_edges))
 
-    return html_content
+
+def build_view_script(groups, static_layout=False, verify_edges=False):
+    """
+    生成拓扑图右上角的视图控制面板与脚本：模块筛选、连线长度、（校验连线时）按覆盖率隐藏连线。
+    控件都在 iframe 内，调整时直接用 DataSet.update 修改节点和连线，不触发 Streamlit 重跑，
+    iframe 的 HTML 在各次重跑之间保持不变，浏览器不会重新加载图、也不会重启物理引擎。
+    隐藏不在所选模块内的节点及其连线、以及覆盖率低于阈值的连线（未校验的连线保留），
+    并按可见连线数重算节点大小（与服务端规则一致）。静态布局下连线长度只是把预计算的单位坐标整体缩放。
+    """
+    boxes = "".join(
+        f'<label style="display: block; font-size: 13px; color: #555; cursor: pointer;">'
+        f'<input type="checkbox" class="view-group" value="{g}" checked onchange="readView()"> {g}</label>'
+        for g in groups)
+    conf_html = ""
+    if verify_edges:
+        conf_html = """
+            <div style="margin-top: 10px; font-size: 13px; color: #555;">隐藏覆盖率低于 <b id="view-conf-text">0</b>% 的连线
+                <input type="range" id="view-conf" min="0" max="100" step="5" value="0" oninput="readView()" style="width: 100%;">
+                <span id="view-hidden-text" style="color: #888;"></span></div>"""
+    return f"""
+    <div id="view-panel" style="position: absolute; top: 20px; right: 20px; z-index: 999; background: rgba(255, 255, 255, 0.95); border-radius: 12px; box-shadow: 0 4px 20px rgba(0,0,0,0.15); font-family: 'Segoe UI', Arial, sans-serif; border: 1px solid #eee; width: 220px;">
+        <div style="padding: 10px 15px; background: #f1f3f5; border-bottom: 1px solid #eee; font-weight: bold; color: #2c3e50;">👁️ 视图控制</div>
+        <div style="padding: 12px 15px; max-height: 600px; overflow-y: auto;">
+            {boxes}
+            <div style="margin-top: 10px; font-size: 13px; color: #555;">连线长度 <b id="view-spring-text">300</b>
+                <input type="range" id="view-spring" min="50" max="800" step="10" value="300" oninput="readView()" style="width: 100%;"></div>{conf_html}
+        </div>
+    </div>
+    <script>
+    var viewStatic = {json.dumps(bool(static_layout))};
+    function applyView(groups, springLen, staticLayout, minConf) {{
+        var visible = new Set(groups);
+        var nodes = network.body.data.nodes, edges = network.body.data.edges;
+        var shown = {{}}, degree = {{}};
+        var unit = {{}};
+        nodes.get({{fields: ['id', 'cbdbGroup', 'ux', 'uy']}}).forEach(function(n) {{ shown[n.id] = visible.has(n.cbdbGroup); degree[n.id] = 0; unit[n.id] = n; }});
+        var edgeUpdates = [], lowConf = 0;
+        edges.get({{fields: ['id', 'from', 'to', 'cbdbConf']}}).forEach(function(e) {{
+            var low = e.cbdbConf != null && e.cbdbConf < minConf;
+            var ok = shown[e.from] && shown[e.to] && !low;
+            if (low) lowConf += 1;
+            if (ok) {{ degree[e.from] += 1; degree[e.to] += 1; }}
+            edgeUpdates.push({{id: e.id, hidden: !ok}});
+        }});
+        var nodeUpdates = [];
+        Object.keys(shown).forEach(function(id) {{
+            var d = degree[id], size = 15;
+            if (d > 5) size = 25;
+            if (d > 20) size = 40;
+            var update = {{id: id, hidden: !shown[id], size: size}};
+            if (staticLayout) {{ update.x = unit[id].ux * springLen; update.y = unit[id].uy * springLen; }}
+            nodeUpdates.push(update);
+        }});
+        nodes.update(nodeUpdates);
+        edges.update(edgeUpdates);
+        if (!staticLayout) network.setOptions({{physics: {{barnesHut: {{springLength: springLen}}}}}});
+        return lowConf;
+    }}
+    function readView() {{
+        var groups = [];
+        document.querySelectorAll('.view-group').forEach(function(box) {{ if (box.checked) groups.push(box.value); }});
+        var springLen = parseInt(document.getElementById('view-spring').value, 10);
+        document.getElementById('view-spring-text').innerText = springLen;
+        var conf = document.getElementById('view-conf'), minConf = conf ? parseInt(conf.value, 10) / 100 : 0;
+        var lowConf = applyView(groups, springLen, viewStatic, minConf);
+        if (conf) {{
+            document.getElementById('view-conf-text').innerText = conf.value;
+            document.getElementById('view-hidden-text').innerText = '已隐藏 ' + lowConf + ' 条';
+        }}
+    }}
+    readView();
+    </script>"""
 
 
 # --- 主渲染函数 ---
-def render_schema_topology(selected_keys, spring_len):
+@st.cache_data(show_spinner="正在抽样统计字段…")
+def get_column_stats(db_path, fingerprint, table):
+    """
+    单张表的字段统计（行数、空值率、不同值估计、最小/最大值），选中该表时才计算，按数据库指纹缓存。
+    页面每次只统计一张表，进程池无从并行，启动子进程反而比统计本身慢，因此在当前进程内串行计算；
+    多表并行用于命令行 `python column_stats.py` 的全库预计算（结果写入同一缓存）。
+    失败结果不进入缓存，下次重跑时重试。
+    """
+    stats = load_or_profile(db_path, fingerprint, [table], workers=1).get(table, {})
+    if "error" in stats:
+        raise RuntimeError(stats["error"])
+    return stats
+
+
+def _fmt_stat(value):
+    return "" if value is None else str(value)
+
+
+def build_dictionary_frame(table):
+    """字典表：字段名 / 类型 / 含义，统计可用时追加空值率、不同值、最小/最大值与示例值。"""
+    df = pd.DataFrame(get_schema().docs[table], columns=["字段名", "数据类型", "含义说明"])
+    if not DB_FINGERPRINT:
+        return df
+    try:
+        stats = get_column_stats(DB_PATH, DB_FINGERPRINT, table)
+    except Exception as e:
+        st.warning(f"字段统计失败: {e}")
+        return df
+    if not stats:
+        return df
+
+    note = f"（抽样 {stats['scanned']:,} 行估算）" if stats["sampled"] else ""
+    st.caption(f"共 {stats['rows']:,} 行{note}")
+    cols = stats["columns"]
+    df["空值率"] = [f"{cols[f]['null_rate']:.1%}" if cols.get(f, {}).get("null_rate") is not None else ""
+                   for f in df["字段名"]]
+    df["不同值(估)"] = [cols.get(f, {}).get("distinct") for f in df["字段名"]]
+    df["最小值"] = [_fmt_stat(cols.get(f, {}).get("min")) for f in df["字段名"]]
+    df["最大值"] = [_fmt_stat(cols.get(f, {}).get("max")) for f in df["字段名"]]
+    df["示例值"] = [" / ".join(map(str, cols.get(f, {}).get("examples", []))) for f in df["字段名"]]
+    return df
+
+
+@st.cache_resource
+def get_chunk_cache():
+    """进程级的表数据预览块缓存（最近 32 块）。"""
+    return ChunkCache(max_chunks=32)
+
+
+def _preview_step(delta):
+    st.session_state["preview_state"]["page"] += delta
+
+
+def render_row_preview(table):
+    """
+    表数据预览：按 rowid 键集分页，每页固定行数，可选把代码列解码为名称。
+    """
+    if not st.checkbox("👀 预览表数据", key="preview_on"):
+        return
+    col_size, col_decode, col_prev, col_next = st.columns([1.2, 1.5, 1, 1])
+    with col_size:
+        size = st.selectbox("每页行数", (100, 200, 500, 1000), index=1, key="preview_size")
+    with col_decode:
+        decode = st.checkbox("解码代码列", value=True, key="preview_decode",
+                             help="按推断的代码表连线 (*_CODES、BIOG_MAIN、DYNASTIES) 在代码列后追加名称列。")
+
+    # starts[k] 为第 k 页之前最后一行的 rowid（键集分页的起点），翻过的页才知道下一页的起点
+    state = st.session_state.setdefault("preview_state", {})
+    if state.get("table") != table or state.get("size") != size:
+        state.clear()
+        state.update(table=table, size=size, starts=[FIRST_ROWID], page=0)
+    page = state["page"]
+    after = state["starts"][page]
+
+    schema = get_schema()
+    lookups = code_lookups(table, schema.edges, schema.docs) if decode else []
+    pool = get_db_pool(DB_PATH, DB_FINGERPRINT)
+
+    def load():
+        with pool.connection() as conn:
+            chunk, last = fetch_chunk(conn, table, after, size)
+            if lookups and chunk.num_rows:
+                chunk = decode_codes(conn, chunk, lookups)
+        return chunk, last
+
+    t0 = time.perf_counter()
+    try:
+        (chunk, last), hit = get_chunk_cache().get_or_load(
+            (DB_FINGERPRINT, table, after, size, tuple(lookups)), load)
+    except sqlite3.OperationalError as e:
+        st.info(f"该表无法按 rowid 分页预览: {e}")
+        return
+    elapsed = (time.perf_counter() - t0) * 1000
+
+    if chunk.num_rows == size and last is not None:
+        if len(state["starts"]) == page + 1:
+            state["starts"].append(last)
+    else:
+        del state["starts"][page + 1:]
+    with col_prev:
+        st.button("⬅️ 上一页", on_click=_preview_step, args=(-1,), disabled=page == 0, key="preview_prev")
+    with col_next:
+        st.button("下一页 ➡️", on_click=_preview_step, args=(1,), disabled=len(state["starts"]) <= page + 1,
+                  key="preview_next")
+
+    if not chunk.num_rows:
+        st.info("该表没有数据。")
+        return
+    rowids = chunk.column("rowid")
+    st.caption(f"第 {page + 1} 页 · rowid {rowids[0].as_py()}–{rowids[-1].as_py()} · {chunk.num_rows} 行"
+               f"{f' · 解码 {len(lookups)} 个代码列' if lookups else ''} · "
+               f"{'缓存命中' if hit else '读取'} {elapsed:.1f} ms")
+    st.dataframe(chunk, hide_index=True, use_container_width=True)
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_schema_search_index(fingerprint):
+    """
+    表名 / 字段名 / 表含义 / 字段释义的倒排索引（按结构快照构建一次，所有会话共享）。
+    """
+    schema = get_schema()
+    return SchemaSearchIndex.from_schema(schema.docs, get_codebook()[0], schema.field_info)
+
+
+def render_schema_search():
+    """
+    表结构检索框：列出命中的表与字段，返回在拓扑图中高亮这些表及字段连线的脚本（未检索时为空串）。
+    """
+    query = st.text_input("🔎 检索表 / 字段 / 含义:", placeholder="例如：籍贯、科举、c_addr_id、ADDRESSES")
+    if not query.strip():
+        return ""
+
+    index = get_schema_search_index(DB_FINGERPRINT)
+    t0 = time.perf_counter()
+    results = index.search(query)
+    elapsed = (time.perf_counter() - t0) * 1000
+    if not results:
+        st.info("没有找到匹配的表或字段。")
+        return ""
+
+    st.caption(f"共 {len(results)} 条结果（按相关度排序），检索耗时 {elapsed:.2f} ms · 拓扑图中已高亮相关的表与字段连线")
+    st.dataframe(pd.DataFrame({
+        "类型": ["表" if r["kind"] == "table" else "字段" for r in results],
+        "名称": [r["name"] for r in results],
+        "含义": [r["meaning"] for r in results],
+        "所在表": [", ".join(r["tables"]) if r["kind"] == "field" else "" for r in results],
+    }), hide_index=True, use_container_width=True)
+
+    tables = list(dict.fromkeys(t for r in results for t in r["tables"] if t in get_schema().nodes))
+    fields = [r["name"] for r in results if r["kind"] == "field"]
+    return f"""<script>
+    (function(tables, fields) {{
+        network.body.data.nodes.update(tables.map(function(id) {{
+            return {{id: id, borderWidth: 3, shadow: {{enabled: true, color: 'rgba(255,69,0,0.85)', size: 24, x: 0, y: 0}}}};
+        }}));
+        var ids = [];
+        fields.forEach(function(f) {{ ids = ids.concat(edgesOf(f)); }});
+        searchEdges = ids;
+        network.body.data.edges.update(ids.map(function(id) {{
+            return {{id: id, color: '#FF8C00', width: 3, label: lens.fields[edgeField[id]]}};
+        }}));
+    }})({to_script_json(tables)}, {to_script_json(fields)});
+    </script>"""
+
+
+def render_schema_topology(static_layout=False, verify_edges=False):
     # 1. 检查数据库是否加载成功
-    if not NODES_REAL:
+    schema = get_schema()
+    if not schema.nodes:
         st.warning("⚠️ 数据库结构分析失败。请检查 cbdb_lite.db 和 cbdb_codebook.xlsx 是否已正确上传到 GitHub。")
         return
 
-    # 2. 调用缓存函数获取 HTML
-    html_raw = get_pyvis_graph_html(tuple(selected_keys), spring_len)  # 传递不可变类型给缓存
+    # 2. 调用缓存函数获取 HTML（每个结构快照只生成一次），视图控制面板在前端应用筛选
+    try:
+        html_raw = get_pyvis_graph_html(DB_FINGERPRINT, static_layout, verify_edges)
+    except Exception as e:
+        st.warning(f"连线校验失败，改为显示未校验的拓扑图: {e}")
+        html_raw, verify_edges = get_pyvis_graph_html(DB_FINGERPRINT, static_layout), False
+    if html_raw:
+        groups = sorted({n["group"] for n in schema.nodes.values()})
+        html_raw = html_raw.replace('</body>', f'{build_view_script(groups, static_layout, verify_edges)}</body>')
+    if html_raw and verify_edges:
+        scores = [v.get("confidence") for v in get_edge_confidence(DB_PATH, DB_FINGERPRINT).values()]
+        known = [c for c in scores if c is not None]
+        st.caption(f"🔍 已抽样校验 {len(known)} 条连线（{len(scores) - len(known)} 条因目标表无同名键或抽样无非空值而无法校验），"
+                   f"覆盖率低于 50% 的 {sum(1 for c in known if c < 0.5)} 条；可在图右上角按覆盖率隐藏连线。")
 
     # 3. UI 标题栏与下载按钮
     col_header, col_btn = st.columns([4, 1])
@@ -374,11 +584,12 @@ def render_schema_topology(selected_keys, spring_len):
                 mime="text/html",
                 help="下载生成的 HTML 文件，可以用浏览器直接打开，支持交互操作。"
             )
+    search_script = render_schema_search()
 
     # 4. 渲染图表（使用 components.html）
     if html_raw:
-        options_html = "".join([f'<option value="{k}">{k}</option>' for k in ALL_LINK_KEYS])
-        field_info_json = json.dumps(FIELD_INFO_JS, ensure_ascii=False)
+        options_html = "".join([f'<option value="{k}">{k}</option>' for k in schema.link_keys])
+        field_lens_json = get_field_lens_json(DB_FINGERPRINT)
 
         overlay_html = f"""
         <div id="control-panel" style="position: absolute; top: 20px; left: 20px; z-index: 999; background: rgba(255, 255, 255, 0.95); border-radius: 12px; box-shadow: 0 4px 20px rgba(0,0,0,0.15); font-family: 'Segoe UI', Arial, sans-serif; border: 1px solid #eee; width: 320px;">
@@ -398,58 +609,247 @@ def render_schema_topology(selected_keys, spring_len):
         </div>
         """
         js_logic = f"""<script>
-        const fieldInfo = {field_info_json};
+        const lens = {field_lens_json};
+        var lensIndex = Object.create(null), edgeField = {{}};
+        lens.fields.forEach(function(f, i) {{ lensIndex[f] = i; lens.fieldEdges[i].forEach(function(id) {{ edgeField[id] = i; }}); }});
+        var lensState = {{field: "", labels: false}};
+        var searchEdges = [];  // 表结构检索高亮的连线，透视镜第一次更新时一并恢复
+        var baseWidth = {{}};  // 未高亮时的连线宽度（校验连线时随覆盖率变化）
+        network.body.data.edges.get({{fields: ['id', 'width']}}).forEach(function(e) {{ baseWidth[e.id] = e.width || 1; }});
         dragElement(document.getElementById("control-panel"));
         function dragElement(elmnt) {{ var pos1=0,pos2=0,pos3=0,pos4=0; document.getElementById(elmnt.id+"-header").onmousedown=dragMouseDown; function dragMouseDown(e){{ e=e||window.event;e.preventDefault();pos3=e.clientX;pos4=e.clientY;document.onmouseup=closeDragElement;document.onmousemove=elementDrag; }} function elementDrag(e){{ e=e||window.event;e.preventDefault();pos1=pos3-e.clientX;pos2=pos4-e.clientY;pos3=e.clientX;pos4=e.clientY;elmnt.style.top=(elmnt.offsetTop-pos2)+"px";elmnt.style.left=(elmnt.offsetLeft-pos1)+"px"; }} function closeDragElement(){{ document.onmouseup=null;document.onmousemove=null; }} }}
+        function edgesOf(field) {{ return field in lensIndex ? lens.fieldEdges[lensIndex[field]] : []; }}
+        function edgeStyle(id, val, showLabels) {{
+            var title = lens.fields[edgeField[id]];
+            var isMatch = (val !== "" && title === val);
+            var newColor, newWidth, newLabel;
+            if(val === "") {{ newColor = '#CFD8DC'; newWidth = baseWidth[id]; }} else if(isMatch) {{ newColor = '#FF4500'; newWidth = 4; }} else {{ newColor = '#E0E0E0'; newWidth = baseWidth[id]; }}
+            if (showLabels || isMatch) {{ newLabel = title; }} else {{ newLabel = " "; }}
+            return {{id: id, color: newColor, width: newWidth, label: newLabel}};
+        }}
         function updateGraphState() {{
             var val = document.getElementById('field-selector').value;
             var showLabels = document.getElementById('show-labels-check').checked;
             var detailsBox = document.getElementById('field-details-box');
-            var allEdges = network.body.data.edges.get();
-            var updates = [];
-            allEdges.forEach(function(e){{
-                var isMatch = (e.title === val);
-                var newColor, newWidth, newLabel;
-                if(val === "") {{ newColor = '#CFD8DC'; newWidth = 1; }} else if(isMatch) {{ newColor = '#FF4500'; newWidth = 4; }} else {{ newColor = '#E0E0E0'; newWidth = 1; }}
-                if (showLabels || isMatch) {{ newLabel = e.title; }} else {{ newLabel = " "; }}
-                updates.push({{id:e.id, color: newColor, width: newWidth, label: newLabel}});
-            }});
-            network.body.data.edges.update(updates);
-            if(val && fieldInfo[val]) {{
+            var ids;
+            if (showLabels !== lensState.labels || (val === "") !== (lensState.field === "")) {{
+                // 标签开关或「有 / 无选中字段」变化时，所有连线的样式都会改变
+                ids = network.body.data.edges.getIds();
+            }} else if (val !== lensState.field) {{
+                // 只在字段之间切换：只有旧字段与新字段的连线需要重绘
+                ids = edgesOf(lensState.field).concat(edgesOf(val));
+            }} else {{
+                ids = [];
+            }}
+            if (searchEdges.length) {{
+                var seen = {{}};
+                ids = ids.concat(searchEdges).filter(function(id) {{ return seen[id] ? false : (seen[id] = true); }});
+                searchEdges = [];
+            }}
+            lensState = {{field: val, labels: showLabels}};
+            if (ids.length) network.body.data.edges.update(ids.map(function(id) {{ return edgeStyle(id, val, showLabels); }}));
+            if(val in lensIndex) {{
+                var i = lensIndex[val];
                 detailsBox.style.display='block';
-                document.getElementById('field-desc-text').innerText = fieldInfo[val].desc || "暂无说明";
-                document.getElementById('field-table-count').innerText = fieldInfo[val].tables.length;
+                document.getElementById('field-desc-text').innerText = lens.desc[i] || "暂无说明";
+                document.getElementById('field-table-count').innerText = lens.fieldTables[i].length;
             }} else {{ detailsBox.style.display='none'; }}
         }}
-        network.on("click", function(params) {{ if (params.edges.length > 0) {{ var edgeId = params.edges[0]; var edge = network.body.data.edges.get(edgeId); if (edge.title) {{ document.getElementById('field-selector').value = edge.title; updateGraphState(); }} }} else if (params.nodes.length === 0) {{ document.getElementById('field-selector').value = ""; updateGraphState(); }} }});
+        network.on("click", function(params) {{ if (params.edges.length > 0) {{ var f = edgeField[params.edges[0]]; if (f !== undefined) {{ document.getElementById('field-selector').value = lens.fields[f]; updateGraphState(); }} }} else if (params.nodes.length === 0) {{ document.getElementById('field-selector').value = ""; updateGraphState(); }} }});
         </script>"""
 
-        components.html(html_raw.replace('<body>', f'<body>{overlay_html}').replace('</body>', f'{js_logic}</body>'),
+        components.html(html_raw.replace('<body>', f'<body>{overlay_html}').replace('</body>', f'{js_logic}{search_script}</body>'),
                         height=800)
 
     st.markdown("---")
     st.subheader("📖 数据库字典与字段解析")
-    tab_list = sorted(list(SCHEMA_DOCS_REAL.keys()))
+    tab_list = sorted(list(schema.docs.keys()))
     if tab_list:
         sel = st.selectbox("查看表结构:", tab_list)
-        st.dataframe(pd.DataFrame(SCHEMA_DOCS_REAL[sel], columns=["字段名", "数据类型", "含义说明"]),
-                     use_container_width=True, hide_index=True)
+        st.dataframe(build_dictionary_frame(sel), use_container_width=True, hide_index=True)
+        render_row_preview(sel)
+
+        # 任意两表之间的最短连接路径 (预计算 BFS，直接生成 JOIN SQL)
+        st.markdown("#### 🔗 关联路径查询")
+        col_a, col_b = st.columns(2)
+        with col_a:
+            path_src = st.selectbox("起点表:", tab_list, index=tab_list.index(sel), key="path_src")
+        with col_b:
+            default_dst = tab_list.index("BIOG_MAIN") if "BIOG_MAIN" in tab_list else 0
+            path_dst = st.selectbox("终点表:", tab_list, index=default_dst, key="path_dst")
+
+        hops = schema.graph.shortest_path(path_src, path_dst)
+        if hops is None:
+            st.info("两张表之间没有推断出的连接路径。")
+        elif hops:
+            st.caption(" → ".join([path_src] + [f"[{label}] {dst}" for _, dst, label in hops]))
+            st.code(schema.graph.join_sql(path_src, path_dst), "sql")
 
 
 # ================= 5. 数据化原理 (V11.1 核心聚合版) [最终版] =================
+@st.cache_data(show_spinner="正在构建人物检索索引（每个数据库版本只需一次）…", max_entries=1)
+def get_person_index(db_path, fingerprint):
+    """
+    人物检索的 FTS5 旁路索引路径（按数据库指纹构建一次，写在缓存目录中）。
+    """
+    with get_db_pool(db_path, fingerprint).connection() as conn:
+        ts = resolve_tables(conn)
+        t_biog = pick_table(ts, ["BIOG_MAIN"])
+        t_alt = pick_table(ts, ["ALTNAME_DATA"])
+        if not t_biog:
+            return None
+        return ensure_person_index(conn, fingerprint, t_biog, t_alt)
+
+
+def render_person_search():
+    """
+    人物检索框：按姓名、字号、别名检索，返回选中的人物 ID（未检索时为苏轼）。
+    """
+    query = st.text_input("🔍 检索人物 (姓名 / 字号 / 别名 / 拼音):", placeholder="例如：苏轼、子瞻、东坡、Su Shi")
+    if not query.strip():
+        return SU_SHI_ID
+
+    try:
+        index_path = get_person_index(DB_PATH, DB_FINGERPRINT)
+    except Exception as e:
+        st.error(f"人物检索索引构建失败: {e}")
+        return SU_SHI_ID
+    if not index_path:
+        st.info("未检测到 BIOG_MAIN 表，无法检索人物。")
+        return SU_SHI_ID
+
+    results = search_persons(index_path, query)
+    if not results:
+        st.info("没有找到匹配的人物。")
+        return SU_SHI_ID
+
+    centrality = load_centrality()
+
+    def fmt(r):
+        life = f"{r['birthyear'] or '?'}–{r['deathyear'] or '?'}"
+        alt = f" · 别名: {r['alt_names']}" if r['alt_names'] else ""
+        metrics = centrality.lookup(r['personid']) if centrality else None
+        rank = f" · 影响力 #{metrics['rank']}" if metrics else ""
+        return f"{r['name_chn'] or r['name']} ({life}) · ID {r['personid']}{rank}{alt}"
+
+    chosen = st.selectbox(f"检索结果 (共 {len(results)} 条，按相关度排序):", results, format_func=fmt)
+    return int(chosen["personid"])
+
+
+def query_db_path():
+    """数据化查询使用的数据库：带索引的旁路副本存在时用副本，否则用发布版原库。"""
+    sidecar = sidecar_path(DB_FINGERPRINT)
+    return sidecar if os.path.exists(sidecar) else DB_PATH
+
+
+@st.cache_resource
+def _sidecar_jobs():
+    """进程级的旁路副本后台构建任务 {数据库指纹: 任务状态 dict} 及其锁。"""
+    return {}, threading.Lock()
+
+
+def _start_sidecar_build(db_path, fingerprint, person_id):
+    """
+    在后台线程中构建带索引的旁路副本并测速（复制整个数据库，耗时较长），不阻塞页面渲染；
+    同一指纹同时只有一个构建任务。返回任务状态 dict。
+    """
+    jobs, lock = _sidecar_jobs()
+    with lock:
+        job = jobs.get(fingerprint)
+        if job is not None and job["status"] == "running":
+            return job
+        job = {"status": "running", "report": None, "error": None, "started": time.time()}
+        jobs[fingerprint] = job
+
+    def run():
+        try:
+            job["report"] = advise(db_path, person_id, build=True, fingerprint=fingerprint)
+            job["status"] = "done"
+        except Exception as e:
+            job["error"] = str(e)
+            job["status"] = "failed"
+
+    # 不复制当前上下文：后台构建不计入本次重跑的性能追踪
+    threading.Thread(target=run, name="cbdb-sidecar-build", daemon=True).start()
+    return job
+
+
+def render_sidecar_build(person_id, query_db, can_build):
+    """旁路副本的构建按钮（有需要建的索引时）与后台构建状态。"""
+    job = _sidecar_jobs()[0].get(DB_FINGERPRINT)
+    if job is None or job["status"] == "failed":
+        if job is not None:
+            st.error(f"旁路副本构建失败: {job['error']}")
+        if can_build and query_db == DB_PATH and st.button("🛠️ 构建带索引的旁路副本并测速"):
+            job = _start_sidecar_build(DB_PATH, DB_FINGERPRINT, person_id)
+    if job is None:
+        return
+    if job["status"] == "running":
+        st.info(f"正在后台复制数据库并建立索引（已用 {time.time() - job['started']:.0f} 秒），页面可照常使用。")
+        st.button("🔄 刷新构建状态")
+    elif job["status"] == "done":
+        st.dataframe(pd.DataFrame([
+            {"面板": k, "建索引前 (ms)": round(v["before"] * 1000, 2), "建索引后 (ms)": round(v.get("after", 0) * 1000, 2)}
+            for k, v in job["report"]["panels"].items()
+        ]), hide_index=True)
+        if query_db == DB_PATH:
+            st.caption("重新运行页面后，数据化查询将自动使用旁路副本。")
+
+
+def render_index_advisor(pool, person_id, query_db):
+    """
+    索引诊断：对本页三条查询执行 EXPLAIN QUERY PLAN，列出全表扫描 / 自动临时索引，
+    并可在后台构建带覆盖索引的旁路副本（原库保持不变），报告前后耗时。
+    只在读取执行计划时借用连接，构建旁路副本前已归还。
+    """
+    with st.expander("🧭 索引诊断 (EXPLAIN QUERY PLAN)"):
+        if query_db != DB_PATH:
+            st.success(f"当前查询使用带覆盖索引的旁路副本: {query_db}")
+
+        with pool.connection() as conn:
+            queries = {k: q for k, q in build_panel_queries(resolve_tables(conn), person_id, nianhao="function").items() if q}
+            problems = {name: find_scans(conn, q) for name, q in queries.items()}
+        rows = [{"面板": name, "表": p["table"], "执行计划": p["detail"]} for name, ps in problems.items() for p in ps]
+        if not rows:
+            st.info("三条查询的所有查找都已命中索引。")
+        else:
+            st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+            statements = recommend([p for ps in problems.values() for p in ps])
+            st.code(";\n".join(statements) + ";", "sql")
+        render_sidecar_build(person_id, query_db, can_build=bool(rows))
+
+
 def render_datafication_case_study():
     st.title("📜 从史料到数据库：历史人物的数据化之旅")
     st.markdown(
-        "本模块以 **苏轼 (Su Shi, ID: 3767)** 为例，展示如何通过 SQL 的 `JOIN` 操作，将数据库中的数字 ID 还原为有意义的历史信息。")
+        "本模块以 **苏轼 (Su Shi, ID: 3767)** 为例，展示如何通过 SQL 的 `JOIN` 操作，将数据库中的数字 ID 还原为有意义的历史信息。"
+        "也可以在下方检索 CBDB 中的任意人物。")
 
     # --- 数据库连接检查 ---
-    if not os.path.exists('cbdb_lite.db'):
+    if not os.path.exists(DB_PATH):
         st.warning("请上传 cbdb_lite.db 文件，并确保名称正确。");
         return
 
-    conn = sqlite3.connect('cbdb_lite.db')
+    person_id = render_person_search()
+    render_person_metrics(person_id)
+
+    # 存在带覆盖索引的旁路副本（见 index_advisor.py）时优先查询副本
+    query_db = query_db_path()
 
-    # 1. 文本展示
+    # 三个面板的查询各自从进程级只读连接池借用连接并发执行，哪个先完成就先渲染
+    pool = get_db_pool(query_db, DB_FINGERPRINT)
+    _render_datafication_panels(pool, person_id)
+    render_index_advisor(pool, person_id, query_db)
+
+
+def _render_datafication_panels(pool, person_id=SU_SHI_ID):
+    # 1. 文本展示（史料原文仅针对苏轼案例）
+    if person_id == SU_SHI_ID:
+        _render_su_shi_source_text()
+    _render_person_panels(pool, int(person_id))
+
+
+def _render_su_shi_source_text():
     st.header("1. 史料原文 (非结构化)")
     st.markdown("""
     <div class="highlight-text">
@@ -460,158 +860,366 @@ def render_datafication_case_study():
     """, unsafe_allow_html=True)
     st.markdown('<div class="arrow-down">⬇️ 关联查询 (JOIN Operation) ⬇️</div>', unsafe_allow_html=True)
 
-    # 2. 数据库表名探测
-    cursor = conn.cursor()
-    cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
-    ts = {r[0].upper(): r[0] for r in cursor.fetchall()}
 
-    def get(n):
-        for x in n:
-            if x in ts: return ts[x]
-        return None
+def _read_panel(pool, sql):
+    """在线程池中执行：借用独立的只读连接读取一个面板的结果。"""
+    with pool.connection() as conn:
+        return read_sql(sql, conn)
 
-    col1, col2 = st.columns([1, 1.2])
 
-    # --- 左侧：核心身份 (不含籍贯) ---
-    with col1:
-        st.subheader("👤 核心身份 (BIOG_MAIN)")
+def _show_bio(df, person_id):
+    st.dataframe(df, hide_index=True)
 
-        T_DYNASTY = get(["DYNASTIES"])
-        T_ALT_DATA = get(["ALTNAME_DATA"])
-
-        # 基础字段（使用列表存储，方便换行拼接）
-        select_parts = [
-            "B.c_personid AS [人物ID]",
-            "B.c_name_chn AS [姓名]",
-            "B.c_birthyear AS [生年]"
-        ]
-        join_parts = []
-        group_by = ""
-
-        # 连接朝代
-        if T_DYNASTY:
-            select_parts.append("D.c_dynasty_chn AS [朝代]")
-            join_parts.append(f"LEFT JOIN {T_DYNASTY} D ON B.c_dy = D.c_dy")
-
-        # 🗑️ 删除籍贯查询逻辑，不再添加地址相关字段和 JOIN
-
-        # 连接别名并聚合 (一对多 -> 一对一字符串)
-        if T_ALT_DATA:
-            select_parts.append("GROUP_CONCAT(DISTINCT ALT.c_alt_name_chn) AS [别名/字号]")
-            join_parts.append(f"LEFT JOIN {T_ALT_DATA} ALT ON B.c_personid = ALT.c_personid")
-            group_by = "GROUP BY B.c_personid"
+
+def _show_entry(df, person_id):
+    if df.empty:
+        if person_id == SU_SHI_ID:
+            st.info("注：当前数据库中未找到嘉祐二年的特定记录。")
         else:
-            select_parts.append("'[别名表缺失]' AS [别名/字号]")
+            st.info("注：当前数据库中未找到该人物的入仕记录。")
+    else:
+        st.dataframe(df, hide_index=True)
 
-        # 优化 SQL 格式：使用 '\n    ' 强制换行和缩进
-        sql_bio = f"""SELECT 
-    {',\n    '.join(select_parts)}
-FROM BIOG_MAIN B 
-{'\n'.join(join_parts)}
-WHERE B.c_personid = 3767
-{group_by}"""
 
-        st.code(sql_bio, "sql")
-        try:
-            st.dataframe(pd.read_sql(sql_bio, conn), hide_index=True)
-        except Exception as e:
-            st.error(f"核心身份查询失败: {e}")
+def _show_office(df, person_id):
+    # 这里的 fillna("—") 依然保留，用于处理其他可能存在的 NaN 值
+    df.fillna("—", inplace=True)
+    st.dataframe(df, hide_index=True, use_container_width=True)
+
+
+# 面板名 -> (渲染函数, 失败提示)
+PANEL_RENDERERS = {
+    "bio": (_show_bio, "核心身份查询失败"),
+    "entry": (_show_entry, "入仕查询失败"),
+    "office": (_show_office, "查询失败"),
+}
+
+
+def _render_person_panels(pool, person_id):
+    # 2. 数据库表名探测 + 生成三个面板的 SQL
+    with pool.connection() as conn:
+        queries = build_panel_queries(resolve_tables(conn), person_id, nianhao="function")
+
+    col1, col2 = st.columns([1, 1.2])
+    slots = {}
+
+    # --- 左侧：核心身份 (不含籍贯) ---
+    with col1:
+        st.subheader("👤 核心身份 (BIOG_MAIN)")
+        st.code(queries["bio"].sql, "sql")
+        slots["bio"] = st.empty()
 
         st.divider()
 
-        # --- 入仕记录 (精准定位嘉祐二年) ---
+        # --- 入仕记录 (苏轼案例精准定位嘉祐二年，其他人物列出全部记录) ---
         st.subheader("🎓 入仕记录 (ENTRY_DATA)")
-        T_ENTRY_DATA = get(["ENTRY_DATA"])
-        T_ENTRY_CODES = get(["ENTRY_CODES", "CODE_ENTRY"])
-        T_NIAN_HAO = get(["NIAN_HAO"])
-
-        if T_ENTRY_DATA and T_ENTRY_CODES:
-            cols = [
-                "E.c_year AS [西历]",
-                "C.c_entry_desc_chn AS [入仕途径]",
-                "E.c_age AS [年龄]"
-            ]
-            joins = [
-                f"LEFT JOIN {T_ENTRY_CODES} C ON E.c_entry_code = C.c_entry_code"
-            ]
-
-            if T_NIAN_HAO:
-                cols.insert(0, "N.c_nianhao_chn || ' ' || E.c_entry_nh_year || '年' AS [年号纪年]")
-                joins.append(f"LEFT JOIN {T_NIAN_HAO} N ON E.c_nianhao_id = N.c_nianhao_id")
-
-            # 优化 SQL 格式
-            sql_entry = f"""SELECT 
-    {',\n    '.join(cols)}
-FROM {T_ENTRY_DATA} E
-{' '.join(joins)}
-WHERE E.c_personid = 3767 
-  AND E.c_year = 1057"""
-
-            st.code(sql_entry, "sql")
-            try:
-                df_entry = pd.read_sql(sql_entry, conn)
-                if df_entry.empty:
-                    st.info("注：当前数据库中未找到嘉祐二年的特定记录。")
-                else:
-                    st.dataframe(df_entry, hide_index=True)
-            except Exception as e:
-                st.error(f"入仕查询失败: {e}")
+        if queries["entry"]:
+            st.code(queries["entry"].sql, "sql")
+            slots["entry"] = st.empty()
         else:
             st.info("未检测到入仕数据表。")
 
     # --- 右侧：任官履历 ---
     with col2:
         st.subheader("📜 任官履历 (OFFICE_DATA)")
+        st.code(queries["office"].sql, "sql")
+        slots["office"] = st.empty()
+
+    for slot in slots.values():
+        slot.caption("⏳ 查询中…")
+
+    # 工作线程只负责读数据，Streamlit 元素统一在主线程按完成顺序填入占位
+    # (每个任务在当前上下文的副本中运行，性能追踪可以记录到工作线程里的查询)
+    with ThreadPoolExecutor(max_workers=len(slots)) as executor:
+        futures = {executor.submit(contextvars.copy_context().run, _read_panel, pool, queries[name].sql): name
+                   for name in slots}
+        for future in as_completed(futures):
+            name = futures[future]
+            show, error_label = PANEL_RENDERERS[name]
+            with slots[name].container():
+                try:
+                    show(future.result(), person_id)
+                except Exception as e:
+                    st.error(f"{error_label}: {e}")
+
+
+# ================= 补充：人物关系网络 (KIN_DATA / ASSOC_DATA) =================
+EGO_HOP_COLORS = ["#E53935", "#FFB74D", "#90CAF9", "#CFD8DC"]
+EGO_EDGE_COLORS = {KIND_KIN: "#66BB6A", KIND_ASSOC: "#AB47BC"}
+
+
+@st.cache_resource(show_spinner="正在构建人物关系图（每个数据库版本只需一次）…", max_entries=1)
+def get_person_graph(db_path, fingerprint):
+    """
+    亲属与社会关系的 CSR 邻接图（按数据库指纹构建一次，内存映射打开，所有会话共享）。
+    """
+    with get_db_pool(db_path, fingerprint).connection() as conn:
+        ts = resolve_tables(conn)
+        t_kin = pick_table(ts, ["KIN_DATA"])
+        t_assoc = pick_table(ts, ["ASSOC_DATA"])
+        if not t_kin and not t_assoc:
+            return None
+        return PersonGraph(ensure_person_graph(conn, fingerprint, t_kin, t_assoc))
 
-        T_OFFICE_DATA = get(["POSTED_TO_OFFICE_DATA"])
-        T_OFFICE_CODES = get(["OFFICE_CODES", "CODE_OFFICE"])
-        T_ADDR_DATA = get(["POSTED_TO_ADDR_DATA"])
-        T_ADDRESSES_OFFICE = get(["ADDRESSES"])
 
-        # 基础字段（使用列表存储，方便换行拼接）
-        select_parts_office = [
-            "P.c_firstyear AS [任职年份]"
-        ]
-        join_clause = []
+CENTRALITY_HINT = "尚未预计算中心性指标，影响力排名等指标暂不显示。可在命令行运行 `python centrality.py {db}` 预计算后刷新页面。"
 
-        if T_OFFICE_CODES:
-            select_parts_office.append("O.c_office_chn AS [官职名称]")
-            join_clause.append(f"LEFT JOIN {T_OFFICE_CODES} O ON P.c_office_id = O.c_office_id")
-        else:
-            select_parts_office.append("'[未知官职]' AS [官职名称]")
-
-        # ✨ 修复任职地点连接：使用 COALESCE 处理空值，空值显示为 "—"
-        if T_ADDR_DATA and T_ADDRESSES_OFFICE:
-            # COALESCE(A.c_name_chn, '—') 确保如果 A.c_name_chn 为空，则显示"—"
-            select_parts_office.append("COALESCE(A.c_name_chn, '—') AS [任职地点]")
-            join_clause.append(f"LEFT JOIN {T_ADDR_DATA} PA ON P.c_posting_id = PA.c_posting_id")
-            join_clause.append(f"LEFT JOIN {T_ADDRESSES_OFFICE} A ON PA.c_addr_id = A.c_addr_id")
-        else:
-            select_parts_office.append("'—' AS [任职地点]")  # 如果表不存在，直接显示"—"
-
-        # 优化 SQL 格式
-        sql_office = f"""SELECT 
-    {',\n    '.join(select_parts_office)}
-FROM {T_OFFICE_DATA} P
-{'\n'.join(join_clause)}
-WHERE P.c_personid = 3767
-ORDER BY P.c_firstyear
-LIMIT 10"""
-
-        st.code(sql_office, "sql")
-        try:
-            df = pd.read_sql(sql_office, conn)
-            # 这里的 fillna("—") 依然保留，用于处理其他可能存在的 NaN 值
-            df.fillna("—", inplace=True)
-            st.dataframe(df, hide_index=True, use_container_width=True)
-        except Exception as e:
-            st.error(f"查询失败: {e}")
 
-    conn.close()
+@st.cache_resource(max_entries=1)
+def get_centrality(fingerprint):
+    """
+    全图 PageRank / 度数 / 近似中介中心性：只读取 `python centrality.py` 预计算的结果（内存映射），
+    页面中不构建关系图、也不计算；尚未预计算时返回 None。
+    """
+    return load_precomputed_centrality(graph_dir(fingerprint))
+
+
+def load_centrality():
+    """读取中心性指标；尚未预计算或读取失败时返回 None（不影响页面其他部分）。"""
+    if not DB_FINGERPRINT:
+        return None
+    try:
+        centrality = get_centrality(DB_FINGERPRINT)
+    except Exception as e:
+        st.warning(f"中心性指标读取失败: {e}")
+        return None
+    if centrality is None:
+        # 不缓存「缺失」：命令行预计算完成后刷新页面即可读到
+        get_centrality.clear()
+    return centrality
+
+
+def render_person_metrics(person_id):
+    """人物在全图中的影响力指标。"""
+    centrality = load_centrality()
+    if centrality is None:
+        if DB_FINGERPRINT:
+            st.caption(CENTRALITY_HINT.format(db=DB_PATH))
+        return
+    metrics = centrality.lookup(person_id)
+    if not metrics:
+        return
+    c1, c2, c3 = st.columns(3)
+    c1.metric("影响力排名 (PageRank)", f"#{metrics['rank']:,} / {metrics['total']:,}")
+    c2.metric("直接关系人数 (度数)", f"{metrics['degree']:,}")
+    c3.metric("中介中心性 (估计)", f"{metrics['betweenness']:,.0f}")
+
+
+def _lookup_labels(conn, ts, person_ids):
+    """查询人物姓名与关系代码的中文名称（分批使用参数化 IN）。"""
+    names = {}
+    t_biog = pick_table(ts, ["BIOG_MAIN"])
+    if t_biog:
+        ids = list(person_ids)
+        for i in range(0, len(ids), 500):
+            batch = ids[i:i + 500]
+            sql = f"SELECT c_personid, COALESCE(c_name_chn, c_name) FROM {t_biog} WHERE c_personid IN ({','.join('?' * len(batch))})"
+            names.update(conn.execute(sql, batch).fetchall())
+
+    relations = {}
+    t_kin_codes = pick_table(ts, ["KINSHIP_CODES"])
+    if t_kin_codes:
+        relations.update({(KIND_KIN, c): n for c, n in conn.execute(f"SELECT c_kincode, c_kinrel_chn FROM {t_kin_codes}")})
+    t_assoc_codes = pick_table(ts, ["ASSOC_CODES"])
+    if t_assoc_codes:
+        relations.update({(KIND_ASSOC, c): n for c, n in conn.execute(f"SELECT c_assoc_code, c_assoc_desc_chn FROM {t_assoc_codes}")})
+    return names, relations
+
+
+def render_person_network(hops, max_neighbors):
+    st.title("🕸️ 人物关系网络")
+    st.markdown("以选定人物为中心，展开 **亲属 (KIN_DATA)** 与 **社会关系 (ASSOC_DATA)** 的多跳关系网络。")
+
+    if not os.path.exists(DB_PATH):
+        st.warning("请上传 cbdb_lite.db 文件，并确保名称正确。")
+        return
+
+    person_id = render_person_search()
+    render_person_metrics(person_id)
+    try:
+        graph = get_person_graph(DB_PATH, DB_FINGERPRINT)
+    except Exception as e:
+        st.error(f"人物关系图构建失败: {e}")
+        return
+    if graph is None:
+        st.info("未检测到 KIN_DATA / ASSOC_DATA 表。")
+        return
+
+    t0 = time.perf_counter()
+    ego = graph.ego_network(person_id, hops, max_neighbors)
+    elapsed = (time.perf_counter() - t0) * 1000
+    if not ego["nodes"]:
+        st.info("该人物在当前数据库中没有亲属或社会关系记录。")
+        return
+
+    with get_db_pool(DB_PATH, DB_FINGERPRINT).connection() as conn:
+        names, relations = _lookup_labels(conn, resolve_tables(conn), ego["nodes"])
+
+    vis_nodes = [{"id": pid, "label": names.get(pid) or str(pid), "title": f"{names.get(pid) or ''} · ID {pid} · 第 {hop} 跳",
+                  "color": EGO_HOP_COLORS[min(hop, len(EGO_HOP_COLORS) - 1)], "shape": "dot",
+                  "size": 30 if hop == 0 else 18 - 3 * hop, "font": {"color": "black"}}
+                 for pid, hop in ego["nodes"].items()]
+    vis_edges = [{"from": a, "to": b, "title": relations.get((kind, code)) or str(code),
+                  "color": EGO_EDGE_COLORS[kind], "width": 1}
+                 for a, b, kind, code in ego["edges"]]
+
+    st.caption(f"关系图共 {len(graph):,} 人、{graph.edge_count:,} 条关系；本次展开 {len(vis_nodes)} 人、"
+               f"{len(vis_edges)} 条关系，用时 {elapsed:.1f} ms。绿色为亲属，紫色为社会关系。")
+    if ego["capped"]:
+        st.caption("以下人物关系过多，已截断: " + "、".join(
+            f"{names.get(pid) or pid} (省略 {n})" for pid, n in list(ego["capped"].items())[:10]))
+    components.html(render_network_html(vis_nodes, vis_edges, GRAPH_OPTIONS), height=800)
+
+    centrality = load_centrality()
+    if centrality:
+        r = centrality.report
+        st.caption(f"中心性预计算：{r['nodes']:,} 人 / {r['edges']:,} 条关系，PageRank {r['pagerank_seconds']:.2f}s "
+                   f"({r['pagerank_iterations']} 轮)，中介中心性 {r['betweenness_seconds']:.2f}s ({r['pivots']} 个抽样源点)，"
+                   f"内存峰值 {r['peak_memory_mb']:.1f} MB，结果 {r['result_bytes'] / 1024:.0f} KB。")
+
+
+# ================= 补充：任官时空分布 (地点 × 年代 × 朝代 × 官职类别) =================
+@st.cache_resource(show_spinner="正在预聚合任官数据立方体（每个数据库版本只需一次）…", max_entries=1)
+def get_posting_cube(db_path, fingerprint):
+    """
+    任官次数的稀疏数据立方体（按数据库指纹聚合一次，所有会话共享，切片与上卷在内存中完成）。
+    """
+    with get_db_pool(db_path, fingerprint).connection() as conn:
+        return ensure_cube(conn, resolve_tables(conn), fingerprint)
+
+
+def render_posting_heatmap(cube, mask, parent, top_n=30):
+    """任官次数最多的 top_n 个地点 × 年代热力图。"""
+    top = cube.addr_frame(mask, parent).head(top_n)
+    df = cube.rollup(["addr", "decade"], mask, parent)
+    df = df.loc[df["addr_idx"].isin(top["addr_idx"])].copy()
+    df["地点"] = cube.names("addr")[df["addr_idx"].to_numpy()]
+    df["年代"] = cube.values("decade")[df["decade_idx"].to_numpy()]
+    df = df.rename(columns={"count": "任官次数"})[["地点", "年代", "任官次数"]]
+    st.vega_lite_chart(df, {
+        "mark": "rect",
+        "encoding": {
+            "x": {"field": "年代", "type": "ordinal", "sort": "ascending"},
+            "y": {"field": "地点", "type": "nominal", "sort": list(top["地点"])},
+            "color": {"field": "任官次数", "type": "quantitative", "scale": {"scheme": "orangered"}},
+            "tooltip": [{"field": "地点"}, {"field": "年代"}, {"field": "任官次数"}],
+        },
+    }, use_container_width=True)
+
+
+def render_posting_cube():
+    st.title("🗺️ 任官时空分布")
+    st.markdown("按 **任职地点 × 年代 × 朝代 × 官职类别** 预聚合的任官次数 "
+                "(POSTED_TO_OFFICE_DATA → POSTED_TO_ADDR_DATA → ADDRESSES)。")
+
+    if not os.path.exists(DB_PATH):
+        st.warning("请上传 cbdb_lite.db 文件，并确保名称正确。")
+        return
+    try:
+        cube = get_posting_cube(DB_PATH, DB_FINGERPRINT)
+    except Exception as e:
+        st.error(f"任官数据立方体构建失败: {e}")
+        return
+    if cube is None:
+        st.info("未检测到任官或地点数据表。")
+        return
+
+    dy_values, dy_names = cube.values("dynasty").tolist(), cube.names("dynasty").tolist()
+    cat_values, cat_names = cube.values("category").tolist(), cube.names("category").tolist()
+    decades = [d for d in cube.values("decade").tolist() if d != UNKNOWN]
+
+    col_a, col_b = st.columns(2)
+    with col_a:
+        dy_sel = st.multiselect("朝代:", dy_values, default=dy_values, format_func=dict(zip(dy_values, dy_names)).get)
+        parent = st.radio("地点层级:", ("任职地点", "上级行政区"), horizontal=True) == "上级行政区"
+    with col_b:
+        cat_sel = st.multiselect("官职类别:", cat_values, default=cat_values,
+                                 format_func=dict(zip(cat_values, cat_names)).get)
+        decade_range = st.select_slider("年代范围:", decades, value=(decades[0], decades[-1])) if decades else None
+
+    t0 = time.perf_counter()
+    mask = cube.mask(dy_sel, cat_sel, decade_range)
+    places = cube.addr_frame(mask, parent)
+    elapsed = (time.perf_counter() - t0) * 1000
+    st.caption(f"立方体共 {len(cube.count):,} 个非空格子、{cube.total:,} 次任官；"
+               f"当前切片 {int(places['count'].sum()):,} 次任官、{len(places):,} 个地点，切片与上卷用时 {elapsed:.1f} ms。")
+
+    located = places.dropna(subset=["lat", "lon"])
+    if not located.empty:
+        located = located.assign(size=np.sqrt(located["count"] / located["count"].max()) * 40000)
+        st.map(located, latitude="lat", longitude="lon", size="size")
+    else:
+        st.info("所选地点没有坐标信息，无法绘制地图。")
+
+    if not places.empty:
+        render_posting_heatmap(cube, mask, parent)
+        st.dataframe(places[["地点", "count", "lon", "lat"]].rename(columns={"count": "任官次数"}).head(200),
+                     hide_index=True, use_container_width=True)
 
 
 # ================= 6. 入口 =================
-if mode == "架构拓扑图 (Schema)":
-    render_schema_topology(selected_keys, spring_len)
-elif mode == "数据化原理 (Datafication)":
-    render_datafication_case_study()
\ No newline at end of file
+with span("render", mode=mode):
+    if mode == "架构拓扑图 (Schema)":
+        render_schema_topology(static_layout, verify_edges)
+    elif mode == "数据化原理 (Datafication)":
+        render_datafication_case_study()
+    elif mode == "人物关系网络 (Network)":
+        render_person_network(ego_hops, ego_cap)
+    elif mode == "任官时空分布 (Postings)":
+        render_posting_cube()
+
+# 首屏耗时：本会话中每个模式第一次渲染完成所用的时间（之后的重跑命中缓存，单独列出本次耗时）
+render_seconds = time.perf_counter() - RUN_T0
+first_render = st.session_state.setdefault("cbdb_first_render", {})
+first_render.setdefault(mode, round(render_seconds, 3))
+with st.sidebar:
+    with st.expander("⏱️ 首屏耗时"):
+        st.caption(f"本次重跑: {render_seconds * 1000:.0f} ms")
+        st.dataframe(pd.DataFrame({"模式": list(first_render), "首次渲染 (秒)": list(first_render.values())}),
+                     hide_index=True, use_container_width=True)
+
+# 连接池状态放在页面渲染之后统计，反映本次重跑的借用情况
+if DB_FINGERPRINT:
+    with st.sidebar:
+        with st.expander("🔌 连接池状态"):
+            st.json(get_db_pool(DB_PATH, DB_FINGERPRINT).stats())
+
+
+# ================= 7. 性能追踪 (调试) =================
+def render_trace_panel(trace):
+    """
+    展示本次重跑的阶段耗时与 SQL 明细，并提供 JSON Lines 下载。
+    设置环境变量 CBDB_TRACE_LOG 时同时追加写入该文件，便于离线比较多次运行。
+    """
+    st.caption(f"本次重跑 {trace.now_ms():.0f} ms · {len(trace.spans)} 个阶段 · {len(trace.statements)} 条 SQL")
+    if trace.spans:
+        spans = pd.DataFrame(trace.spans)
+        st.dataframe(spans[["name", "duration_ms", "start_ms", "thread"]].sort_values("duration_ms", ascending=False),
+                     hide_index=True, use_container_width=True)
+    if trace.statements:
+        # 耗时与行数只有经 read_sql 执行的语句才有（sqlite3 没有语句结束事件），其余语句按虚拟机指令数比较开销
+        stmts = pd.DataFrame(trace.statements).reindex(
+            columns=["duration_ms", "rows", "vm_steps", "sql", "plan", "thread"]).astype({"rows": "Int64"})
+        stmts = stmts.sort_values(["duration_ms", "vm_steps"], ascending=False, na_position="last").rename(
+            columns={"duration_ms": "duration_ms (仅 read_sql)", "rows": "rows (仅 read_sql)"})
+        st.dataframe(stmts, hide_index=True, use_container_width=True)
+
+    jsonl = trace.to_jsonl()
+    st.download_button("⬇️ 导出 JSON Lines", jsonl, file_name=f"cbdb_trace_{trace.run_id}.jsonl",
+                       mime="application/x-ndjson")
+    log_path = os.environ.get("CBDB_TRACE_LOG")
+    if log_path:
+        try:
+            with open(log_path, "a", encoding="utf-8") as f:
+                f.write(jsonl)
+        except OSError as e:
+            st.warning(f"写入追踪日志失败: {e}")
+
+
+with st.sidebar:
+    # 勾选后从下一次重跑开始记录（追踪在脚本开头根据该状态开启）
+    st.checkbox("🐞 性能追踪", key="cbdb_debug", help="记录各阶段耗时、每条 SQL 的虚拟机指令数 / 查询计划（经 read_sql 的查询另记耗时与返回行数）")
+    if TRACE is not None:
+        with st.expander("🐞 性能追踪", expanded=True):
+            render_trace_panel(TRACE)
+        stop_trace()
@@ -0,0 +1,256 @@
+"""
+批量人物档案导出（profile cards）。
+
+把人物 ID 集合装入临时表，用与页面相同的三组 JOIN（核心身份 / 入仕记录 / 任官履历）
+各执行一次集合查询，按块 (fetchmany) 流式写出 CSV 或 Parquet，不在内存中拼装整个结果集。
+
+命令行用法：
+    python batch_export.py cbdb_lite.db --ids 3767 1384 --out export/
+    python batch_export.py cbdb_lite.db --ids-file cohort.txt --format parquet
+    python batch_export.py cbdb_lite.db --cohort-sql "SELECT c_personid FROM ENTRY_DATA WHERE c_entry_code = 36 AND c_year = 1057"
+"""
+import argparse
+import csv
+import os
+import sqlite3
+import time
+
+from datafication_sql import build_panel_queries, pick_table, resolve_tables
+from nianhao import NianhaoIndex
+
+COHORT_TABLE = "cohort"
+PANEL_FILES = {"bio": "profiles_bio", "entry": "profiles_entry", "office": "profiles_office"}
+
+
+def load_cohort(conn, person_ids=None, cohort_sql=None, batch_size=50000):
+    """
+    把人物集合装入 temp.cohort（主键去重）。可直接给 ID 列表，也可给一条返回 c_personid 的 SQL，
+    后者完全在 SQLite 内完成（INSERT ... SELECT），不经过 Python。返回集合人数。
+    """
+    conn.execute(f"DROP TABLE IF EXISTS temp.{COHORT_TABLE}")
+    conn.execute(f"CREATE TEMP TABLE {COHORT_TABLE} (c_personid INTEGER PRIMARY KEY)")
+    if cohort_sql:
+        conn.execute(f"INSERT OR IGNORE INTO temp.{COHORT_TABLE} (c_personid) {cohort_sql}")
+    if person_ids is not None:
+        batch = []
+        for pid in person_ids:
+            batch.append((int(pid),))
+            if len(batch) >= batch_size:
+                conn.executemany(f"INSERT OR IGNORE INTO temp.{COHORT_TABLE} VALUES (?)", batch)
+                batch = []
+        if batch:
+            conn.executemany(f"INSERT OR IGNORE INTO temp.{COHORT_TABLE} VALUES (?)", batch)
+    return conn.execute(f"SELECT COUNT(*) FROM temp.{COHORT_TABLE}").fetchone()[0]
+
+
+# ---------------- 流式读取与年号换算 ----------------
+def _chunks(cursor, chunk_size):
+    while True:
+        chunk = cursor.fetchmany(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def convert_nianhao(names, chunks, index):
+    """
+    把原始的 [年号ID]、[年号年] 两列整块换算为 [年号纪年]、[年号换算西历]（向量化，不 JOIN NIAN_HAO）。
+    返回 (新列名, 新的块迭代器)。
+    """
+    if "年号ID" not in names:
+        return names, chunks
+    i = names.index("年号ID")
+    out_names = names[:i] + ["年号纪年", "年号换算西历"] + names[i + 2:]
+
+    def convert():
+        for chunk in chunks:
+            columns = list(zip(*chunk))
+            labels = index.labels(columns[i], columns[i + 1])
+            years = index.to_western(columns[i], columns[i + 1])
+            years = [None if y != y else int(y) for y in years.tolist()]
+            yield [row[:i] + (label, year) + row[i + 2:] for row, label, year in zip(chunk, labels, years)]
+
+    return out_names, convert()
+
+
+# ---------------- 流式写出 ----------------
+def _write_csv(names, chunks, path):
+    rows = 0
+    # utf-8-sig 便于 Excel 直接打开中文内容
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(names)
+        for chunk in chunks:
+            writer.writerows(chunk)
+            rows += len(chunk)
+    return rows
+
+
+def _write_parquet(names, chunks, path):
+    """
+    逐块写出 Parquet。SQLite 的列是动态类型，同一列在不同块中可能是整数、浮点或文本：
+    后续块与已写出的列类型冲突时，把该列放宽（整数与浮点 -> float64，其余 -> 字符串），
+    已写出的部分按行组流式重写为新类型后继续写入。
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("导出 Parquet 需要安装 pyarrow（pip install pyarrow），或改用 --format csv。")
+
+    writer = None
+    schema = None
+    current = path  # 正在写入的文件（放宽类型重写后为临时文件，结束时替换到 path）
+    rows = 0
+    try:
+        for chunk in chunks:
+            arrays = [_column_array(pa, col) for col in zip(*chunk)]
+            if schema is None:
+                schema = pa.schema([pa.field(n, a.type) for n, a in zip(names, arrays)])
+                writer = pq.ParquetWriter(current, schema)
+            targets = [_widen(pa, field.type, a.type) for field, a in zip(schema, arrays)]
+            for i, (a, target) in enumerate(zip(arrays, targets)):
+                try:
+                    arrays[i] = _to_type(pa, a, target)
+                except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                    # 例如超出 float64 精确范围的整数：退回字符串
+                    targets[i] = pa.string()
+                    arrays[i] = _to_type(pa, a, pa.string())
+            widened = pa.schema([pa.field(n, t) for n, t in zip(names, targets)])
+            if not widened.equals(schema):
+                writer.close()
+                rewritten = f"{path}.{rows}.tmp"
+                writer = _rewrite_parquet(pa, pq, current, rewritten, widened)
+                if current != path:
+                    os.remove(current)
+                current, schema = rewritten, widened
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        pq.write_table(pa.table({n: pa.array([], pa.string()) for n in names}), path)
+    elif current != path:
+        os.replace(current, path)
+    return rows
+
+
+def _text_array(pa, values):
+    return pa.array([None if v is None else str(v) for v in values], pa.string())
+
+
+def _column_array(pa, values):
+    """一列值 -> Arrow 数组；同一块内混有数字与文本等无法统一的类型时按字符串。"""
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        return _text_array(pa, values)
+
+
+def _widen(pa, current, incoming):
+    """能同时容纳两种列类型的类型：全空列取另一方，整数与浮点取 float64，其余冲突取字符串。"""
+    if incoming == current or pa.types.is_null(incoming):
+        return current
+    if pa.types.is_null(current):
+        return incoming
+    numeric = (pa.types.is_integer, pa.types.is_floating)
+    if any(f(current) for f in numeric) and any(f(incoming) for f in numeric):
+        if pa.types.is_integer(current) and pa.types.is_integer(incoming):
+            return pa.int64()
+        return pa.float64()
+    return pa.string()
+
+
+def _to_type(pa, array, target):
+    """把一列转换为 target 类型；转成字符串且 Arrow 无法直接转换时按 str() 逐值转换。"""
+    if array.type == target:
+        return array
+    try:
+        return array.cast(target)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        if target != pa.string():
+            raise
+        return _text_array(pa, array.to_pylist())
+
+
+def _rewrite_parquet(pa, pq, src, dst, schema):
+    """把已写出的文件按新 schema 逐个行组重写到 dst，返回可继续写入 dst 的 writer。"""
+    writer = pq.ParquetWriter(dst, schema)
+    source = pq.ParquetFile(src)
+    for i in range(source.num_row_groups):
+        table = source.read_row_group(i)
+        writer.write_table(pa.Table.from_arrays(
+            [_to_type(pa, col.combine_chunks(), field.type) for col, field in zip(table.columns, schema)],
+            schema=schema))
+    return writer
+
+
+WRITERS = {"csv": (_write_csv, ".csv"), "parquet": (_write_parquet, ".parquet")}
+
+
+def export_profiles(db_path, out_dir, person_ids=None, cohort_sql=None, fmt="csv", chunk_size=5000):
+    """
+    导出人物集合的三组档案表。返回 {面板: {"path", "rows", "seconds"}}，另含 "cohort" 人数。
+    数据库以只读方式打开（临时表写在 temp 库中，不修改原库）。
+    """
+    write, ext = WRITERS[fmt]
+    os.makedirs(out_dir, exist_ok=True)
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        report = {"cohort": load_cohort(conn, person_ids, cohort_sql)}
+        ts = resolve_tables(conn)
+        t_nianhao = pick_table(ts, ["NIAN_HAO"])
+        index = NianhaoIndex.from_connection(conn, t_nianhao) if t_nianhao else None
+        # 年号只取原始列，导出时整块换算
+        queries = build_panel_queries(ts, cohort=COHORT_TABLE, nianhao="raw")
+        for name, query in queries.items():
+            if query is None:
+                continue
+            path = os.path.join(out_dir, PANEL_FILES[name] + ext)
+            t0 = time.perf_counter()
+            cursor = conn.execute(query.sql)
+            names = [d[0] for d in cursor.description]
+            chunks = _chunks(cursor, chunk_size)
+            if index is not None:
+                names, chunks = convert_nianhao(names, chunks, index)
+            rows = write(names, chunks, path)
+            report[name] = {"path": path, "rows": rows, "seconds": time.perf_counter() - t0}
+    finally:
+        conn.close()
+    return report
+
+
+def _read_ids(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield int(line.split(",")[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量导出人物档案")
+    parser.add_argument("db", nargs="?", default="cbdb_lite.db")
+    parser.add_argument("--ids", nargs="*", type=int, help="人物 ID 列表")
+    parser.add_argument("--ids-file", help="每行一个人物 ID 的文本文件")
+    parser.add_argument("--cohort-sql", help="返回 c_personid 的 SQL，例如某年进士")
+    parser.add_argument("--out", default="export", help="输出目录")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="csv")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    ids = list(args.ids or [])
+    if args.ids_file:
+        ids.extend(_read_ids(args.ids_file))
+    if not ids and not args.cohort_sql:
+        parser.error("请通过 --ids、--ids-file 或 --cohort-sql 指定人物集合")
+
+    report = export_profiles(args.db, args.out, ids or None, args.cohort_sql, args.format, args.chunk_size)
+    print(f"人物集合: {report.pop('cohort')} 人")
+    for name, info in report.items():
+        print(f"  {name:<7} {info['rows']:>9} 行  {info['seconds']:.2f}s  -> {info['path']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+应用热点路径基准：codebook 加载 → 结构分析 → 布局与拓扑图 HTML → 单人物三面板查询。
+
+计时的是 app_schema 中页面实际调用的函数（get_codebook、get_schema、get_static_layout、
+get_pyvis_graph_html、get_db_pool + _read_panel），而不是在这里另写一份等价实现；
+数据库与字典路径通过环境变量 CBDB_DB_PATH / CBDB_CODEBOOK_PATH 传给应用，随后以裸模式导入 app_schema
+（导入时会按默认模式渲染一次页面，相当于预热）。
+每个阶段重复 --repeat 次取中位数，每次运行前清空该函数的内存缓存（st.cache_data / lru_cache）；
+「冷」阶段另外使用全新的磁盘缓存目录。
+结果追加到 JSON 历史文件（默认在缓存目录 .cbdb_cache/bench_history.json，不进入版本库），并与同一数据库上一次的结果比较，
+中位数变慢超过 --threshold 倍（且绝对差超过 --min-delta 毫秒）的阶段标记为回退。
+
+用法（在仓库根目录执行）：
+    python benchmarks/synth_cbdb.py synth_cbdb.db --persons 1000000
+    python benchmarks/bench_app.py synth_cbdb.db --repeat 5
+    python benchmarks/bench_app.py cbdb_lite.db --fail-on-regression
+"""
+import argparse
+import contextlib
+import datetime
+import importlib
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import cbdb_cache  # noqa: E402
+from datafication_sql import SU_SHI_ID, build_panel_queries, resolve_tables  # noqa: E402
+
+
+class FreshCache:
+    """临时把 cbdb_cache.CACHE_DIR 指向一个空目录，模拟冷启动。"""
+
+    def __enter__(self):
+        self._old = cbdb_cache.CACHE_DIR
+        self._tmp = tempfile.TemporaryDirectory(prefix="cbdb_bench_")
+        cbdb_cache.CACHE_DIR = self._tmp.name
+        return self._tmp.name
+
+    def __exit__(self, *exc):
+        cbdb_cache.CACHE_DIR = self._old
+        self._tmp.cleanup()
+
+
+def load_app(db_path, excel_path):
+    """把数据库与字典路径交给应用后以裸模式导入 app_schema，返回模块对象。"""
+    os.environ["CBDB_DB_PATH"] = os.path.abspath(db_path)
+    os.environ["CBDB_CODEBOOK_PATH"] = os.path.abspath(excel_path)
+    # 裸模式下每次调用缓存函数、渲染元素都会告警；基准只用 print 输出，直接屏蔽 WARNING 及以下的日志
+    logging.disable(logging.WARNING)
+    return importlib.import_module("app_schema")
+
+
+def _clear(fn):
+    """清空应用函数的内存缓存：lru_cache 或 st.cache_data（外层套了 @traced 时取 __wrapped__）。"""
+    if hasattr(fn, "cache_clear"):
+        fn.cache_clear()
+    elif hasattr(fn, "clear"):
+        fn.clear()
+    else:
+        _clear(fn.__wrapped__)
+
+
+def uncached(*fns, cold=False):
+    """setup 工厂：运行前清空 fns 的内存缓存；cold=True 时再换用空的磁盘缓存目录。"""
+    @contextlib.contextmanager
+    def setup():
+        for fn in fns:
+            _clear(fn)
+        if cold:
+            with FreshCache():
+                yield
+        else:
+            yield
+    return setup
+
+
+def timed(fn, repeat, setup=None):
+    """运行 repeat 次，返回 (各次耗时秒数, 最后一次的结果)。setup 为每次运行前的上下文管理器工厂。"""
+    times, result = [], None
+    for _ in range(repeat):
+        if setup:
+            with setup():
+                t0 = time.perf_counter()
+                result = fn()
+                times.append(time.perf_counter() - t0)
+        else:
+            t0 = time.perf_counter()
+            result = fn()
+            times.append(time.perf_counter() - t0)
+    return times, result
+
+
+def sample_people(db_path, n, seed=0):
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        hi = conn.execute("SELECT MAX(c_personid) FROM BIOG_MAIN").fetchone()[0] or SU_SHI_ID
+    finally:
+        conn.close()
+    rng = random.Random(seed)
+    return [SU_SHI_ID] + [rng.randint(1, hi) for _ in range(n - 1)]
+
+
+def run_stages(db_path, excel_path, repeat, people):
+    app = load_app(db_path, excel_path)
+    fp = app.DB_FINGERPRINT
+    stages = {}
+
+    def record(name, times):
+        stages[name] = {"median": statistics.median(times), "min": min(times), "runs": len(times)}
+        print(f"  {name:<26} median {stages[name]['median'] * 1000:10.2f} ms   min {stages[name]['min'] * 1000:10.2f} ms")
+
+    codebook = (app.get_codebook, app.load_codebook_metadata)
+    if os.path.exists(excel_path):
+        times, _ = timed(app.get_codebook, repeat, setup=uncached(*codebook, cold=True))
+        record("codebook_parse", times)
+        times, _ = timed(app.get_codebook, repeat, setup=uncached(*codebook))
+        record("codebook_compiled", times)
+    app.get_codebook()
+
+    schema_fns = (app.get_schema, app._analyze_snapshot)
+    times, _ = timed(app.get_schema, repeat, setup=uncached(*schema_fns, cold=True))
+    record("schema_cold", times)
+    times, schema = timed(app.get_schema, repeat, setup=uncached(*schema_fns))
+    record("schema_warm", times)
+
+    times, _ = timed(lambda: app.get_static_layout(fp), repeat, setup=uncached(app.get_static_layout, cold=True))
+    record("static_layout", times)
+    app.get_static_layout(fp)
+
+    times, html = timed(lambda: app.get_pyvis_graph_html(fp), repeat, setup=uncached(app.get_pyvis_graph_html))
+    record("graph_html", times)
+    times, _ = timed(lambda: app.get_pyvis_graph_html(fp, static_layout=True), repeat,
+                     setup=uncached(app.get_pyvis_graph_html))
+    record("graph_html_static", times)
+
+    # 与 _render_person_panels 相同：每个人物先生成三个面板的 SQL，再逐个借连接读取
+    pool = app.get_db_pool(app.DB_PATH, fp)
+
+    def person_queries():
+        for pid in people:
+            with pool.connection() as conn:
+                queries = build_panel_queries(resolve_tables(conn), pid, nianhao="function")
+            for q in queries.values():
+                if q:
+                    app._read_panel(pool, q.sql)
+
+    times, _ = timed(person_queries, repeat)
+    record(f"person_queries_x{len(people)}", times)
+
+    shape = {"tables": len(schema.docs), "columns": sum(len(rows) for rows in schema.docs.values()),
+             "schema_edges": len(schema.edges), "html_bytes": len(html or "")}
+    return stages, shape
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def find_regressions(history, run, threshold, min_delta):
+    """与同一数据库（按大小与表结构规模识别）最近一次结果比较，返回 [(阶段, 旧中位数, 新中位数)]。"""
+    previous = [h for h in history if h["dataset"] == run["dataset"]]
+    if not previous:
+        return []
+    base = previous[-1]["stages"]
+    out = []
+    for name, cur in run["stages"].items():
+        old = base.get(name)
+        if old and cur["median"] > old["median"] * threshold and cur["median"] - old["median"] > min_delta / 1000:
+            out.append((name, old["median"], cur["median"]))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="应用热点路径基准")
+    parser.add_argument("db", nargs="?", default="cbdb_lite.db")
+    parser.add_argument("--codebook", default=os.path.join(ROOT, "cbdb_codebook.xlsx"))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--people", type=int, default=20, help="单人物查询阶段抽样的人物数（含苏轼）")
+    parser.add_argument("--history", default=None, help="历史文件路径（默认为缓存目录下的 bench_history.json）")
+    parser.add_argument("--threshold", type=float, default=1.25, help="中位数变慢超过该倍数视为回退")
+    parser.add_argument("--min-delta", type=float, default=2.0, help="忽略小于该毫秒数的变化")
+    parser.add_argument("--label", default="", help="写入历史记录的备注，例如 CBDB 版本号")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+    if args.history is None:
+        args.history = cbdb_cache.cache_path("bench_history.json")
+
+    print(f"{args.db}: {os.path.getsize(args.db) / 1e6:.1f} MB")
+    stages, shape = run_stages(args.db, args.codebook, args.repeat, sample_people(args.db, args.people))
+    run = {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "label": args.label,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "db": os.path.basename(args.db),
+        "dataset": f"{os.path.getsize(args.db)}:{shape['tables']}:{shape['columns']}",
+        "shape": shape,
+        "stages": stages,
+    }
+
+    history = load_history(args.history)
+    regressions = find_regressions(history, run, args.threshold, args.min_delta)
+    history.append(run)
+    os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+    tmp = args.history + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(history, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, args.history)
+    print(f"已写入 {args.history}（共 {len(history)} 条记录）")
+
+    for name, old, new in regressions:
+        print(f"  ⚠️ 回退: {name} {old * 1000:.2f} ms -> {new * 1000:.2f} ms (x{new / old:.2f})")
+    if regressions and args.fail_on_regression:
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+表结构读取基准：逐表 PRAGMA table_info（旧实现） vs. pragma_table_info 单条集合查询。
+
+用法（在仓库根目录执行）：
+    python benchmarks/bench_introspection.py cbdb_lite.db /path/to/CBDB_full.db --repeat 5
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from schema_snapshot import _introspect_tables_bulk, _introspect_tables_per_table  # noqa: E402
+
+
+def _table_names(conn):
+    rows = conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
+    return [r[0] for r in rows if not r[0].startswith("sqlite_")]
+
+
+def legacy_pandas(conn, tables):
+    """旧实现：每张表一个 DataFrame，再用 iterrows() 遍历。"""
+    result = {}
+    for table_real in tables:
+        df_info = pd.read_sql(f"PRAGMA table_info({table_real})", conn)
+        result[table_real] = [(row['name'], row['type']) for _, row in df_info.iterrows()]
+    return result
+
+
+STRATEGIES = {
+    "legacy read_sql+iterrows": legacy_pandas,
+    "per-table PRAGMA (tuples)": _introspect_tables_per_table,
+    "bulk pragma_table_info": _introspect_tables_bulk,
+}
+
+
+def bench_db(db_path, repeat):
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        tables = _table_names(conn)
+        n_cols = sum(len(v) for v in _introspect_tables_bulk(conn, tables).values())
+        print(f"\n{db_path}: {len(tables)} 张表, {n_cols} 列, {os.path.getsize(db_path) / 1e6:.1f} MB")
+        baseline = None
+        for label, fn in STRATEGIES.items():
+            times = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                fn(conn, tables)
+                times.append(time.perf_counter() - t0)
+            med = statistics.median(times)
+            baseline = baseline or med
+            print(f"  {label:<28} median {med * 1000:9.2f} ms   x{baseline / med:6.1f}")
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("db", nargs="*", default=["cbdb_lite.db"], help="要测试的 SQLite 文件（可传多个，如 lite 与完整版）")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for db_path in args.db:
+        if not os.path.exists(db_path):
+            print(f"\n{db_path}: 文件不存在，跳过")
+            continue
+        bench_db(db_path, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
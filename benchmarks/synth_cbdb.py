@@ -0,0 +1,271 @@
+"""
+合成 CBDB 规模的 SQLite 数据库，用于基准测试。
+
+表结构取自 cbdb_codebook.xlsx 的各个工作表（字段名与真实 CBDB 一致），
+再按 CBDB 的命名习惯（c_personid / c_xxx_code / c_xxx_id，XXX_DATA / XXX_CODES）补足到指定表数。
+人物、任官、亲属、社会关系等核心表按 --persons 线性放大，数据用 NumPy 批量生成。
+人物 3767 固定为苏轼（字子瞻、号东坡居士，嘉祐二年进士），与页面默认案例一致。
+
+用法（在仓库根目录执行）：
+    python benchmarks/synth_cbdb.py synth_cbdb.db --persons 1000000 --tables 300
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SURNAMES = list("王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈姚卢姜崔钟谭陆汪范金石廖贾夏韦")
+GIVEN = list("安邦宝彬斌博昌超辰成诚承澄崇楚川春纯淳聪达德东栋恩方丰锋福甫刚高耕功固光广国海涵翰浩皓和恒弘鸿厚华怀辉惠吉嘉坚建江杰金锦进晋京经景敬靖钧俊凯康克坤朗乐礼立良林麟龙鲁禄伦茂敏明铭穆宁朋鹏平琦谦乾强卿庆秋权荣瑞睿润森山善尚绍升胜盛诗石实世寿书舒树顺硕思嗣松颂泰涛廷同伟文武熙祥翔心欣新信星兴修旭轩学雅言彦扬阳耀业义易毅逸英永勇友宇雨玉元远云泽哲真振正之志智忠州子")
+SUFFIX_ADDR = list("州府县军监")
+DYNASTIES = [(6, "Tang", "唐", 618, 907), (15, "Song", "宋", 960, 1279), (18, "Yuan", "元", 1271, 1368),
+             (19, "Ming", "明", 1368, 1644), (20, "Qing", "清", 1644, 1911)]
+TOPICS = ["EVENT", "TEXT", "INST", "STATUS", "POSSESSION", "ADDR", "OFFICE", "KIN", "ASSOC", "ENTRY", "BIOG",
+          "LITERARY", "SOCIAL", "HOUSEHOLD", "MEASURE", "OCCASION", "APPT", "PLACE", "ETHNIC", "CHORONYM"]
+SU_SHI_ID = 3767
+
+
+def codebook_tables(excel_path):
+    """{表名: [字段名]}，取自 codebook 的各工作表 (column_code 列)。"""
+    if not os.path.exists(excel_path):
+        return {}
+    import pandas as pd
+    sheets = pd.read_excel(excel_path, sheet_name=None)
+    tables = {}
+    for name, df in sheets.items():
+        df.columns = [str(c).strip().lower() for c in df.columns]
+        if name == "TABLE_LIST" or "column_code" not in df.columns:
+            continue
+        cols = [str(v).strip() for v in df["column_code"].dropna() if str(v).strip()]
+        if cols:
+            tables[name] = list(dict.fromkeys(cols))
+    return tables
+
+
+# 核心表至少需要的字段（codebook 中缺表或缺列时补上）
+CORE_COLUMNS = {
+    "BIOG_MAIN": ["c_personid", "c_name", "c_name_chn", "c_birthyear", "c_deathyear", "c_dy", "c_index_addr_id"],
+    "ALTNAME_DATA": ["c_personid", "c_alt_name", "c_alt_name_chn", "c_alt_name_type_code"],
+    "DYNASTIES": ["c_dy", "c_dynasty", "c_dynasty_chn", "c_start", "c_end"],
+    "NIAN_HAO": ["c_nianhao_id", "c_dy", "c_dynasty_chn", "c_nianhao_chn", "c_nianhao_pin", "c_firstyear",
+                 "c_lastyear"],
+    "ENTRY_CODES": ["c_entry_code", "c_entry_desc", "c_entry_desc_chn"],
+    "ENTRY_DATA": ["c_personid", "c_entry_code", "c_year", "c_age", "c_nianhao_id", "c_entry_nh_year"],
+    "OFFICE_CODES": ["c_office_id", "c_dy", "c_office_chn", "c_category_1"],
+    "OFFICE_CATEGORIES": ["c_office_category_id", "c_category_desc", "c_category_desc_chn"],
+    "POSTED_TO_OFFICE_DATA": ["c_personid", "c_office_id", "c_posting_id", "c_firstyear", "c_lastyear", "c_dy",
+                              "c_office_category_id"],
+    "POSTED_TO_ADDR_DATA": ["c_posting_id", "c_personid", "c_office_id", "c_addr_id"],
+    "ADDRESSES": ["c_addr_id", "c_name", "c_name_chn", "c_admin_type", "c_firstyear", "c_lastyear", "x_coord",
+                  "y_coord", "belongs1_ID"],
+    "ADDR_CODES": ["c_addr_id", "c_name", "c_name_chn", "c_firstyear", "c_lastyear", "x_coord", "y_coord"],
+    "KINSHIP_CODES": ["c_kincode", "c_kinrel_chn", "c_kinrel"],
+    "KIN_DATA": ["c_personid", "c_kin_id", "c_kin_code"],
+    "ASSOC_CODES": ["c_assoc_code", "c_assoc_desc", "c_assoc_desc_chn"],
+    "ASSOC_DATA": ["c_personid", "c_assoc_id", "c_assoc_code"],
+}
+
+
+def synthetic_tables(existing, target, rng):
+    """按 CBDB 命名习惯补足表：XXX_n_CODES (代码表) 与 XXX_n_DATA (引用人物、地点与代码的数据表)。"""
+    extra = {}
+    k = 1
+    while len(existing) + len(extra) < target:
+        topic = TOPICS[(k - 1) % len(TOPICS)]
+        code = f"c_{topic.lower()}{k}_code"
+        extra[f"{topic}_{k}_CODES"] = [code, f"c_{topic.lower()}{k}_desc", f"c_{topic.lower()}{k}_desc_chn"]
+        if len(existing) + len(extra) < target:
+            cols = ["c_personid", code, "c_addr_id", "c_firstyear", "c_lastyear", "c_source", "c_pages", "c_notes"]
+            if rng.random() < 0.5:
+                cols.insert(3, f"c_{TOPICS[rng.integers(len(TOPICS))].lower()}_id")
+            extra[f"{topic}_{k}_DATA"] = cols
+        k += 1
+    return extra
+
+
+def _names(rng, n, parts, p_long=0.6):
+    """随机拼接中文名（向量化）。"""
+    pools = np.asarray(parts[0]), np.asarray(parts[1])
+    out = np.char.add(rng.choice(pools[0], n), rng.choice(pools[1], n))
+    longer = rng.random(n) < p_long
+    out[longer] = np.char.add(out[longer], rng.choice(pools[1], int(longer.sum())))
+    return out
+
+
+def _insert(conn, table, columns, rows):
+    sql = f"INSERT INTO [{table}] ({', '.join(f'[{c}]' for c in columns)}) VALUES ({', '.join('?' * len(columns))})"
+    conn.executemany(sql, rows)
+
+
+def _rows(*arrays):
+    """把若干等长 NumPy 数组按行组成 Python 元组（转换为原生类型，sqlite3 才能绑定）。"""
+    return zip(*[a.tolist() for a in arrays])
+
+
+def generate(path, persons=1000000, tables=300, seed=7, codebook=None):
+    rng = np.random.default_rng(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    schema = codebook_tables(codebook or os.path.join(ROOT, "cbdb_codebook.xlsx"))
+    for table, cols in CORE_COLUMNS.items():
+        schema[table] = list(dict.fromkeys(schema.get(table, []) + cols))
+    schema.update(synthetic_tables(schema, tables, rng))
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    stats = {}
+    with conn:
+        for table, cols in schema.items():
+            conn.execute(f"CREATE TABLE [{table}] ({', '.join(f'[{c}]' for c in cols)})")
+
+        # --- 代码表 ---
+        _insert(conn, "DYNASTIES", CORE_COLUMNS["DYNASTIES"], DYNASTIES)
+        nianhao = []
+        nid = 1
+        for dy, _, dchn, start, end in DYNASTIES:
+            y = start
+            while y < end:
+                span = int(rng.integers(3, 16))
+                name = "".join(rng.choice(GIVEN, 2))
+                nianhao.append((nid, dy, dchn, name, "", y, min(y + span - 1, end)))
+                nid += 1
+                y += span
+        # 嘉祐 (1056–1063) 固定为 9999，去掉与之重叠的随机宋代年号
+        nianhao = [r for r in nianhao if not (r[1] == 15 and r[5] <= 1063 and r[6] >= 1056)]
+        nianhao.append((9999, 15, "宋", "嘉祐", "Jiayou", 1056, 1063))
+        _insert(conn, "NIAN_HAO", CORE_COLUMNS["NIAN_HAO"], nianhao)
+        _insert(conn, "ENTRY_CODES", CORE_COLUMNS["ENTRY_CODES"], [(36, "jinshi", "进士"), (1, "yin", "荫补"),
+                                                                   (2, "recommend", "荐举"), (3, "exam", "制举")])
+        n_office = 30000
+        office_names = np.char.add(np.char.add(rng.choice(["知", "通判", "判", "提举", "转运使"], n_office),
+                                               rng.choice(GIVEN, n_office)), rng.choice(SUFFIX_ADDR, n_office))
+        _insert(conn, "OFFICE_CODES", CORE_COLUMNS["OFFICE_CODES"],
+                _rows(np.arange(1, n_office + 1), rng.choice([d[0] for d in DYNASTIES], n_office), office_names,
+                      rng.integers(1, 40, n_office)))
+        _insert(conn, "OFFICE_CATEGORIES", CORE_COLUMNS["OFFICE_CATEGORIES"],
+                [(i, f"cat{i}", f"类别{i}") for i in range(1, 40)])
+        n_addr = 30000
+        addr_ids = np.arange(1, n_addr + 1)
+        addr_names = np.char.add(_names(rng, n_addr, (GIVEN, GIVEN), p_long=0.0), rng.choice(SUFFIX_ADDR, n_addr))
+        x, y = np.round(rng.uniform(98, 123, n_addr), 3), np.round(rng.uniform(20, 42, n_addr), 3)
+        parents = np.where(addr_ids > 3000, rng.integers(1, 3001, n_addr), addr_ids)
+        _insert(conn, "ADDRESSES", CORE_COLUMNS["ADDRESSES"],
+                _rows(addr_ids, np.char.add("Addr", addr_ids.astype(str)), addr_names, rng.integers(5, 9, n_addr),
+                      np.full(n_addr, 960), np.full(n_addr, 1911), x, y, parents))
+        _insert(conn, "ADDR_CODES", CORE_COLUMNS["ADDR_CODES"],
+                _rows(addr_ids, np.char.add("Addr", addr_ids.astype(str)), addr_names, np.full(n_addr, 960),
+                      np.full(n_addr, 1911), x, y))
+        _insert(conn, "KINSHIP_CODES", CORE_COLUMNS["KINSHIP_CODES"],
+                [(75, "父", "F"), (180, "子", "S"), (127, "兄", "B+"), (126, "弟", "B-"), (111, "妻", "W")])
+        _insert(conn, "ASSOC_CODES", CORE_COLUMNS["ASSOC_CODES"], [(i, f"a{i}", f"关系{i}") for i in range(1, 500)])
+
+        # --- 人物 ---
+        pid = np.arange(1, persons + 1)
+        dy_idx = rng.integers(0, len(DYNASTIES), persons)
+        starts = np.asarray([d[3] for d in DYNASTIES])[dy_idx]
+        ends = np.asarray([d[4] for d in DYNASTIES])[dy_idx]
+        birth = (starts - 20 + rng.random(persons) * (ends - starts - 10)).astype(np.int64)
+        death = birth + rng.integers(30, 80, persons)
+        names = _names(rng, persons, (SURNAMES, GIVEN))
+        dy_codes = np.asarray([d[0] for d in DYNASTIES])[dy_idx]
+        latin = np.char.add("P", pid.astype(str))
+        if persons >= SU_SHI_ID:
+            i = SU_SHI_ID - 1
+            names[i], latin[i], birth[i], death[i], dy_codes[i] = "苏轼", "Su Shi", 1037, 1101, 15
+        _insert(conn, "BIOG_MAIN", CORE_COLUMNS["BIOG_MAIN"],
+                _rows(pid, latin, names, birth, death, dy_codes, rng.integers(1, n_addr + 1, persons)))
+
+        alt_owner = np.repeat(pid, rng.integers(0, 3, persons))
+        alt_names = _names(rng, len(alt_owner), (GIVEN, GIVEN), p_long=0.1)
+        _insert(conn, "ALTNAME_DATA", CORE_COLUMNS["ALTNAME_DATA"],
+                _rows(alt_owner, np.full(len(alt_owner), ""), alt_names, rng.integers(1, 6, len(alt_owner))))
+        if persons >= SU_SHI_ID:
+            _insert(conn, "ALTNAME_DATA", CORE_COLUMNS["ALTNAME_DATA"],
+                    [(SU_SHI_ID, "Zizhan", "子瞻", 4), (SU_SHI_ID, "Dongpo", "东坡居士", 5)])
+        stats["BIOG_MAIN"] = persons
+
+        # --- 入仕：约 30% 人物，年号按入仕年份反查 ---
+        ent = np.flatnonzero(rng.random(persons) < 0.3)
+        ent_year = birth[ent] + rng.integers(18, 41, len(ent))
+        nh = np.asarray([(r[0], r[5], r[6]) for r in nianhao])
+        nh = nh[np.argsort(nh[:, 1])]
+        k = np.clip(np.searchsorted(nh[:, 1], ent_year, side="right") - 1, 0, len(nh) - 1)
+        inside = (nh[k, 1] <= ent_year) & (ent_year <= nh[k, 2])
+        nh_id = np.where(inside, nh[k, 0], -1)
+        nh_year = np.where(inside, ent_year - nh[k, 1] + 1, -1)
+        rows = [(p, c, yr, a, None if n < 0 else n, None if n < 0 else ny) for p, c, yr, a, n, ny in
+                _rows(pid[ent], rng.choice([36, 1, 2, 3], len(ent)), ent_year, ent_year - birth[ent], nh_id, nh_year)
+                if p != SU_SHI_ID]
+        rows.append((SU_SHI_ID, 36, 1057, 21, 9999, 2))
+        _insert(conn, "ENTRY_DATA", CORE_COLUMNS["ENTRY_DATA"], rows)
+        stats["ENTRY_DATA"] = len(rows)
+
+        # --- 任官：每人 0~5 次 ---
+        owner_idx = np.repeat(np.arange(persons), rng.integers(0, 6, persons))
+        n_post = len(owner_idx)
+        posting = np.arange(1, n_post + 1)
+        first = birth[owner_idx] + rng.integers(20, 61, n_post)
+        office = rng.integers(1, n_office + 1, n_post)
+        _insert(conn, "POSTED_TO_OFFICE_DATA", CORE_COLUMNS["POSTED_TO_OFFICE_DATA"],
+                _rows(pid[owner_idx], office, posting, first, first + rng.integers(0, 6, n_post), dy_codes[owner_idx],
+                      rng.integers(1, 40, n_post)))
+        _insert(conn, "POSTED_TO_ADDR_DATA", CORE_COLUMNS["POSTED_TO_ADDR_DATA"],
+                _rows(posting, pid[owner_idx], office, rng.integers(1, n_addr + 1, n_post)))
+        stats["POSTED_TO_OFFICE_DATA"] = n_post
+
+        # --- 亲属与社会关系：每人 0~3 条，度数分布带少量中心人物 ---
+        for table, cols, codes in (("KIN_DATA", CORE_COLUMNS["KIN_DATA"], [75, 180, 127, 126, 111]),
+                                   ("ASSOC_DATA", CORE_COLUMNS["ASSOC_DATA"], list(range(1, 500)))):
+            src = np.repeat(pid, rng.integers(0, 4, persons))
+            hubs = rng.integers(1, min(persons, 5000) + 1, len(src) // 20)
+            src = np.concatenate([src, hubs])
+            dst = rng.integers(1, persons + 1, len(src))
+            _insert(conn, table, cols, _rows(src, dst, rng.choice(codes, len(src))))
+            stats[table] = len(src)
+
+        # --- 其余表：代码表 50 行，数据表按人物数的 1% ---
+        filled = set(CORE_COLUMNS)
+        for table, cols in schema.items():
+            if table in filled:
+                continue
+            n = 50 if table.endswith("CODES") else max(100, persons // 100)
+            values = []
+            for c in cols:
+                if c == "c_personid":
+                    values.append(rng.integers(1, persons + 1, n))
+                elif c.endswith(("_code", "_id", "_ID")):
+                    values.append(rng.integers(1, 50, n))
+                elif c.endswith(("year", "_year")):
+                    values.append(rng.integers(600, 1912, n))
+                else:
+                    values.append(np.full(n, None, dtype=object))
+            _insert(conn, table, cols, _rows(*values))
+
+    conn.close()
+    stats["tables"] = len(schema)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成 CBDB 规模的合成数据库")
+    parser.add_argument("out", nargs="?", default="synth_cbdb.db")
+    parser.add_argument("--persons", type=int, default=1000000)
+    parser.add_argument("--tables", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--codebook", default=None, help="默认使用仓库根目录的 cbdb_codebook.xlsx")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    stats = generate(args.out, args.persons, args.tables, args.seed, args.codebook)
+    print(f"{args.out}: {os.path.getsize(args.out) / 1e6:.1f} MB，用时 {time.perf_counter() - t0:.1f}s")
+    for k, v in stats.items():
+        print(f"  {k:<24} {v:>12,}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
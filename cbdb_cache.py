@@ -0,0 +1,39 @@
+"""
+本地持久化缓存目录的公共工具。
+
+Streamlit 的 st.cache_data 只在单个进程内有效，容器重启或新副本都会重新计算；
+这里统一管理落盘的编译产物（codebook 编译库、结构快照等），按源文件内容指纹命名。
+"""
+import hashlib
+import os
+import tempfile
+
+# 缓存目录，可用环境变量覆盖（例如部署时挂载到持久卷）
+CACHE_DIR = os.environ.get("CBDB_CACHE_DIR", ".cbdb_cache")
+
+
+def cache_path(name):
+    """返回缓存目录下的文件路径，目录不存在时自动创建。"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    return os.path.join(CACHE_DIR, name)
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """按内容计算文件的 SHA-256 指纹（分块读取，不会把大文件一次读入内存）。"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def atomic_target(final_path):
+    """
+    在目标文件同目录下创建临时文件并返回其路径。
+    调用方写完后用 os.replace(tmp, final_path) 原子替换，多个进程并发重建时不会读到半成品。
+    """
+    directory = os.path.dirname(final_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    return tmp
@@ -0,0 +1,221 @@
+"""
+人物关系网络的全图中心性：PageRank、度数与近似中介中心性 (betweenness)。
+
+在 person_graph.py 的 CSR 邻接数组上做整图向量化迭代（np.bincount 完成稀疏矩阵乘向量），
+不逐节点循环。中介中心性用 Brandes 算法的枢纽抽样近似：随机选 k 个源点做逐层 BFS，
+每层的路径计数与依赖回传都按边数组批量计算，结果按 n/k 缩放。
+
+结果与图的 ids 数组逐位对齐，存为图目录下的一个结构化数组 centrality.npy（内存映射读取），
+另存 centrality.json 记录各阶段耗时与内存峰值，便于跨 CBDB 版本对比。
+整图计算只在命令行离线进行，页面只读取已有的结果（load_centrality），缺失时不显示指标。
+
+命令行用法（离线预计算）：
+    python centrality.py cbdb_lite.db --pivots 256
+"""
+import json
+import os
+import time
+import tracemalloc
+
+import numpy as np
+
+from cbdb_cache import atomic_target
+
+CENTRALITY_DTYPE = np.dtype([("pagerank", "<f4"), ("rank", "<i4"), ("degree", "<i4"), ("betweenness", "<f4")])
+
+
+def simple_edges(graph):
+    """CSR -> 去重后的有向边数组 (src, dst)（无向图每条边两个方向各一条，忽略关系种类）。"""
+    n = len(graph)
+    src = np.repeat(np.arange(n, dtype=np.int64), np.diff(np.asarray(graph.indptr)))
+    dst = np.asarray(graph.indices, dtype=np.int64)
+    # 同一对人物可能有多种关系，CSR 中按 (src, dst) 有序，相邻去重即可
+    keep = np.ones(len(src), dtype=bool)
+    keep[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+    return src[keep], dst[keep]
+
+
+def pagerank(n, src, dst, damping=0.85, tol=1e-10, max_iter=200):
+    """幂迭代 PageRank；悬挂节点的权重均匀分配。返回 (分数, 迭代次数)。"""
+    out_degree = np.bincount(src, minlength=n).astype(np.float64)
+    dangling = out_degree == 0
+    inv_out = np.divide(1.0, out_degree, out=np.zeros(n), where=~dangling)
+    x = np.full(n, 1.0 / n)
+    for it in range(1, max_iter + 1):
+        spread = np.bincount(dst, weights=(x * inv_out)[src], minlength=n)
+        x_new = damping * (spread + x[dangling].sum() / n) + (1 - damping) / n
+        err = np.abs(x_new - x).sum()
+        x = x_new
+        if err < n * tol:
+            break
+    return x, it
+
+
+def _expand(indptr, dst, frontier):
+    """frontier 中每个节点的全部出边，返回 (起点数组, 终点数组)。"""
+    starts = indptr[frontier]
+    counts = indptr[frontier + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+    return np.repeat(frontier, counts), dst[offsets]
+
+
+def approx_betweenness(n, src, dst, pivots=256, seed=0):
+    """Brandes 枢纽抽样近似的中介中心性（无向图，未归一化，按 n/k 缩放）。"""
+    bc = np.zeros(n)
+    if n == 0:
+        return bc
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    rng = np.random.default_rng(seed)
+    sources = rng.choice(n, size=min(pivots, n), replace=False)
+
+    dist = np.empty(n, dtype=np.int64)
+    for s in sources:
+        dist.fill(-1)
+        dist[s] = 0
+        sigma = np.zeros(n)
+        sigma[s] = 1.0
+        frontier = np.array([s], dtype=np.int64)
+        levels = []
+        depth = 0
+        while len(frontier):
+            u, v = _expand(indptr, dst, frontier)
+            fresh = v[dist[v] == -1]
+            dist[fresh] = depth + 1
+            on_path = dist[v] == depth + 1
+            u, v = u[on_path], v[on_path]
+            sigma += np.bincount(v, weights=sigma[u], minlength=n)
+            levels.append((u, v))
+            frontier = np.unique(v)
+            depth += 1
+
+        delta = np.zeros(n)
+        for u, v in reversed(levels):
+            delta += np.bincount(u, weights=sigma[u] / sigma[v] * (1 + delta[v]), minlength=n)
+        delta[s] = 0
+        bc += delta
+    # 每条无向最短路径被两端各计一次
+    return bc * (n / len(sources)) / 2
+
+
+def compute_centrality(graph, pivots=256, damping=0.85):
+    """计算全部指标，返回 (结构化数组, 报告 dict)。"""
+    report = {"nodes": len(graph), "pivots": int(min(pivots, len(graph)))}
+    tracemalloc.start()
+    try:
+        t0 = time.perf_counter()
+        src, dst = simple_edges(graph)
+        n = len(graph)
+        report["edges"] = int(len(src) // 2)
+        report["edges_seconds"] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        pr, iterations = pagerank(n, src, dst, damping)
+        report["pagerank_seconds"] = time.perf_counter() - t0
+        report["pagerank_iterations"] = iterations
+
+        t0 = time.perf_counter()
+        bc = approx_betweenness(n, src, dst, pivots)
+        report["betweenness_seconds"] = time.perf_counter() - t0
+
+        result = np.zeros(n, dtype=CENTRALITY_DTYPE)
+        result["pagerank"] = pr
+        result["degree"] = np.bincount(src, minlength=n)
+        result["betweenness"] = bc
+        # 排名从 1 开始（PageRank 降序）
+        result["rank"][np.argsort(-pr, kind="stable")] = np.arange(1, n + 1)
+        report["peak_memory_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+    report["result_bytes"] = int(result.nbytes)
+    return result, report
+
+
+class Centrality:
+    """按人物 ID 查询中心性指标（与 PersonGraph 的 ids 对齐，内存映射读取）。"""
+
+    def __init__(self, graph, values, report):
+        self.graph = graph
+        self.values = values
+        self.report = report
+
+    def lookup(self, person_id):
+        i = self.graph.index_of(person_id)
+        if i is None:
+            return None
+        row = self.values[i]
+        return {"pagerank": float(row["pagerank"]), "rank": int(row["rank"]), "degree": int(row["degree"]),
+                "betweenness": float(row["betweenness"]), "total": len(self.graph)}
+
+    def top(self, k=20, by="pagerank"):
+        """按指标降序的前 k 位 (c_personid, 指标值)。"""
+        column = np.asarray(self.values[by])
+        order = np.argsort(-column, kind="stable")[:k]
+        return [(int(self.graph.ids[i]), float(column[i])) for i in order]
+
+
+def _result_paths(graph_path):
+    return os.path.join(graph_path, "centrality.npy"), os.path.join(graph_path, "centrality.json")
+
+
+def save_centrality(graph, values, report):
+    """把计算结果写入图目录（先写临时文件再改名）。"""
+    values_path, report_path = _result_paths(graph.path)
+    tmp = atomic_target(values_path)
+    with open(tmp, "wb") as f:
+        np.save(f, values)
+    os.replace(tmp, values_path)
+    tmp = atomic_target(report_path)
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, report_path)
+
+
+def load_centrality(graph_path):
+    """读取图目录中预计算的中心性（不做任何计算）；尚未用命令行预计算时返回 None。"""
+    from person_graph import PersonGraph
+
+    values_path, report_path = _result_paths(graph_path)
+    if not (os.path.exists(values_path) and os.path.exists(report_path)):
+        return None
+    with open(report_path, "r", encoding="utf-8") as f:
+        report = json.load(f)
+    return Centrality(PersonGraph(graph_path), np.load(values_path, mmap_mode="r"), report)
+
+
+def main():
+    import argparse
+    import sqlite3
+
+    from datafication_sql import pick_table, resolve_tables
+    from person_graph import PersonGraph, ensure_person_graph
+    from schema_snapshot import db_fingerprint
+
+    parser = argparse.ArgumentParser(description="预计算人物关系网络的中心性指标")
+    parser.add_argument("db", nargs="?", default="cbdb_lite.db")
+    parser.add_argument("--pivots", type=int, default=256, help="近似中介中心性的抽样源点数")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    try:
+        ts = resolve_tables(conn)
+        graph = PersonGraph(ensure_person_graph(conn, db_fingerprint(args.db), pick_table(ts, ["KIN_DATA"]),
+                                                pick_table(ts, ["ASSOC_DATA"])))
+    finally:
+        conn.close()
+
+    values, report = compute_centrality(graph, args.pivots)
+    save_centrality(graph, values, report)
+    print(json.dumps(report, ensure_ascii=False, indent=1))
+    print(f"已写入 {graph.path}")
+    centrality = Centrality(graph, values, report)
+    for by in ("pagerank", "betweenness"):
+        print(f"Top {args.top} by {by}: " + ", ".join(f"{pid}({v:.4g})" for pid, v in centrality.top(args.top, by)))
+
+
+if __name__ == "__main__":
+    main()
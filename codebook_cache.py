@@ -0,0 +1,125 @@
+"""
+cbdb_codebook.xlsx 的编译缓存。
+
+Excel 解析（openpyxl 逐个 sheet 读取）是冷启动最慢的一步。这里把解析结果
+（TABLE_MEANING_MAP 与 FIELD_DESC_MAP）编译成一个小 SQLite 文件，文件名带上
+xlsx 的内容哈希：工作簿不变时直接读编译库，只有工作簿变化才重新解析。
+"""
+import os
+import sqlite3
+
+import pandas as pd
+
+from cbdb_cache import atomic_target, cache_path, file_digest
+
+# 编译格式版本，修改表结构或解析规则时递增，旧产物自动失效
+CODEBOOK_FORMAT = 1
+
+
+def _clean(series):
+    """统一把一列转成去空白的字符串，NaN 视为空串。"""
+    return series.fillna("").astype(str).str.strip()
+
+
+def _prefer_cn(cn, en):
+    """优先使用中文释义，中文为空时回退到英文（向量化版本）。"""
+    cn = _clean(cn)
+    en = _clean(en)
+    return cn.where((cn != "") & (cn.str.lower() != "nan"), en)
+
+
+def _column(df, name):
+    """取列，缺列时返回等长空列。"""
+    if name in df.columns:
+        return df[name]
+    return pd.Series([""] * len(df), index=df.index, dtype=object)
+
+
+def parse_codebook(excel_path):
+    """
+    解析 Excel 字典，返回 (t_map, f_map)。
+    所有 sheet 一次性读入，按列向量化提取，不再逐行 iterrows()。
+    """
+    sheets = pd.read_excel(excel_path, sheet_name=None)
+
+    t_map = {}
+    f_map = {}
+
+    # 1. 表含义 (TABLE_LIST sheet)
+    df_tables = sheets.pop("TABLE_LIST", None)
+    if df_tables is not None:
+        df_tables.columns = [str(c).lower() for c in df_tables.columns]
+        codes = _clean(_column(df_tables, "table_code")).str.upper()
+        meanings = _prefer_cn(_column(df_tables, "explanation_cn"), _column(df_tables, "explanation_en"))
+        meanings = meanings.where(meanings.str.lower() != "nan", "")
+        keep = (codes != "") & (codes != "NAN")
+        t_map = dict(zip(codes[keep], meanings[keep]))
+
+    # 2. 字段含义 (其余每个 sheet 对应一张表)
+    frames = []
+    for df_sheet in sheets.values():
+        df_sheet.columns = [str(c).lower() for c in df_sheet.columns]
+        if "column_code" not in df_sheet.columns:
+            continue
+        frames.append(pd.DataFrame({
+            "code": _clean(df_sheet["column_code"]),
+            "meaning": _prefer_cn(_column(df_sheet, "meaning_cn"), _column(df_sheet, "meaning_en")),
+        }))
+
+    if frames:
+        df_fields = pd.concat(frames, ignore_index=True)
+        df_fields = df_fields[(df_fields["code"] != "") & (df_fields["code"].str.lower() != "nan")
+                              & (df_fields["meaning"] != "") & (df_fields["meaning"].str.lower() != "nan")]
+        # 同名字段保留第一次出现的释义（与旧逻辑一致）
+        df_fields = df_fields.drop_duplicates("code", keep="first")
+        f_map = dict(zip(df_fields["code"], df_fields["meaning"]))
+
+    return t_map, f_map
+
+
+def _compiled_path(digest):
+    return cache_path(f"codebook_v{CODEBOOK_FORMAT}_{digest[:16]}.sqlite")
+
+
+def _write_compiled(path, t_map, f_map):
+    tmp = atomic_target(path)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.execute("CREATE TABLE table_meaning (code TEXT PRIMARY KEY, meaning TEXT)")
+        conn.execute("CREATE TABLE field_desc (code TEXT PRIMARY KEY, meaning TEXT)")
+        conn.executemany("INSERT INTO table_meaning VALUES (?, ?)", t_map.items())
+        conn.executemany("INSERT INTO field_desc VALUES (?, ?)", f_map.items())
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, path)
+
+
+def _read_compiled(path):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        t_map = dict(conn.execute("SELECT code, meaning FROM table_meaning"))
+        f_map = dict(conn.execute("SELECT code, meaning FROM field_desc"))
+    finally:
+        conn.close()
+    return t_map, f_map
+
+
+def load_compiled_codebook(excel_path):
+    """
+    读取编译后的字典；编译库不存在（首次启动或工作簿已变化）时解析 Excel 并写入。
+    返回 (t_map, f_map)。
+    """
+    digest = file_digest(excel_path)
+    path = _compiled_path(digest)
+
+    if os.path.exists(path):
+        try:
+            return _read_compiled(path)
+        except sqlite3.Error:
+            # 编译库损坏时丢弃重建
+            os.remove(path)
+
+    t_map, f_map = parse_codebook(excel_path)
+    _write_compiled(path, t_map, f_map)
+    return t_map, f_map
@@ -0,0 +1,285 @@
+"""
+字段统计画像：每张表的行数，以及每个字段的空值率、不同值个数估计、最小/最大值与示例值。
+
+对大表做全量 COUNT(DISTINCT) 太慢，这里每张表至多流式读取一遍：
+- 行数用 COUNT(*)（SQLite 会选最窄的索引扫描）；
+- 行数超过 scan_limit 时不再读全表，改为按随机 rowid 探测至多 sample_rows 行
+  （rowid 查找走主键 B 树，与连线校验的抽样相同）；WITHOUT ROWID 表退化为带 LIMIT 的随机过滤；
+- 不同值个数用 HyperLogLog 估计（每列固定 2^p 个寄存器，内存与表大小无关）；
+- 另用蓄水池抽样保留固定行数，用于展示示例值。
+页面只在选中某张表时统计该表（单表无从并行，在页面进程内完成）；命令行 `python column_stats.py 库文件`
+在进程池中并行统计全部表，预先填好页面使用的同一缓存。结果按数据库指纹缓存为 JSON，失败的表不缓存。
+"""
+import json
+import os
+import random
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from cbdb_cache import atomic_target, cache_path
+
+# 统计格式版本，修改统计口径或缓存结构时递增
+STATS_FORMAT = 1
+
+SCAN_LIMIT = 200000
+SAMPLE_ROWS = 20000
+PROBE_BATCH = 500
+RESERVOIR_SIZE = 1000
+CHUNK_SIZE = 20000
+SAMPLE_VALUES = 3
+
+
+class HyperLogLog:
+    """
+    HyperLogLog 基数估计（64 位哈希，2^p 个寄存器，标准误差约 1.04/sqrt(2^p)）。
+    """
+
+    def __init__(self, p=14):
+        self.p = p
+        self.m = 1 << p
+        self.registers = np.zeros(self.m, dtype=np.uint8)
+
+    def add_hashes(self, hashes):
+        """批量加入 uint64 哈希值。"""
+        if len(hashes) == 0:
+            return
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        idx = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = hashes << np.uint64(self.p)
+        # 前导零个数 + 1；frexp 的指数即二进制位数
+        _, bits = np.frexp(rest.astype(np.float64))
+        rank = np.where(rest == 0, 64 - self.p + 1, 64 - bits + 1)
+        rank = np.minimum(rank, 64 - self.p + 1).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rank)
+
+    def add_values(self, values):
+        """批量加入任意值（先转成字符串再哈希，空值由调用方剔除）。"""
+        if len(values):
+            self.add_hashes(pd.util.hash_array(np.asarray([str(v) for v in values], dtype=object)))
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            # 小基数区间改用线性计数
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+
+class Reservoir:
+    """固定容量的蓄水池抽样（Algorithm R，按块向量化）。"""
+
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.rows = []
+        self.seen = 0
+        self.rng = np.random.default_rng(seed)
+
+    def add(self, chunk):
+        take = max(0, min(self.size - len(self.rows), len(chunk)))
+        self.rows.extend(chunk[:take])
+        self.seen += take
+        rest = chunk[take:]
+        if not rest:
+            return
+        # 第 i 个元素 (从 0 计) 以 size/(i+1) 的概率替换随机位置；同一位置多次命中时后者覆盖前者
+        positions = self.rng.integers(0, np.arange(self.seen + 1, self.seen + len(rest) + 1))
+        for k in np.flatnonzero(positions < self.size):
+            self.rows[positions[k]] = rest[k]
+        self.seen += len(rest)
+
+
+def _json_value(value, max_len=40):
+    if value is None:
+        return None
+    if isinstance(value, bytes):
+        return f"<{len(value)} bytes>"
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    if isinstance(value, str) and len(value) > max_len:
+        return value[:max_len] + "…"
+    return value
+
+
+def _sortable(value):
+    """按 SQLite 的排序规则比较混合类型：数值 < 文本 < BLOB。"""
+    if isinstance(value, (int, float)):
+        return 0, value, ""
+    if isinstance(value, str):
+        return 1, 0, value
+    return 2, 0, str(value)
+
+
+def _scan_chunks(cursor, chunk_size):
+    while True:
+        chunk = cursor.fetchmany(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+def _probe_chunks(conn, table, select, sample_rows, rng):
+    """按随机 rowid 分批探测至多 sample_rows 行（rowid 有空洞时实际行数更少）。"""
+    try:
+        lo, hi = conn.execute(f"SELECT MIN(rowid), MAX(rowid) FROM [{table}]").fetchone()
+    except sqlite3.OperationalError:
+        # WITHOUT ROWID 表：退化为按随机数过滤的有界扫描
+        yield conn.execute(select + " WHERE abs(random() % 100) < 10 LIMIT ?", (sample_rows,)).fetchall()
+        return
+    if lo is None:
+        return
+    rowids = sorted(set(rng.randint(lo, hi) for _ in range(sample_rows)))
+    for i in range(0, len(rowids), PROBE_BATCH):
+        batch = rowids[i:i + PROBE_BATCH]
+        chunk = conn.execute(select + f" WHERE rowid IN ({','.join('?' * len(batch))})", batch).fetchall()
+        if chunk:
+            yield chunk
+
+
+def profile_table(db_path, table, scan_limit=SCAN_LIMIT, sample_rows=SAMPLE_ROWS,
+                  reservoir_size=RESERVOIR_SIZE, chunk_size=CHUNK_SIZE):
+    """
+    统计单张表。返回 {"rows", "scanned", "sampled", "columns": {字段: {...}}}。
+    抽样时空值率为样本估计，最小/最大值取自样本，不同值个数按样本规模外推（近似唯一的列）。
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        names = [r[1] for r in conn.execute(f"PRAGMA table_info([{table}])")]
+        rows = conn.execute(f"SELECT COUNT(*) FROM [{table}]").fetchone()[0]
+        select = f"SELECT {', '.join(f'[{n}]' for n in names)} FROM [{table}]"
+        sampled = rows > scan_limit
+        if sampled:
+            chunks = _probe_chunks(conn, table, select, sample_rows, random.Random(table))  # 固定种子：结果可复现
+        else:
+            chunks = _scan_chunks(conn.execute(select), chunk_size)
+
+        hlls = [HyperLogLog() for _ in names]
+        non_null = [0] * len(names)
+        lows = [None] * len(names)
+        highs = [None] * len(names)
+        reservoir = Reservoir(reservoir_size)
+        scanned = 0
+        for chunk in chunks:
+            scanned += len(chunk)
+            reservoir.add(chunk)
+            for i, values in enumerate(zip(*chunk)):
+                present = [v for v in values if v is not None]
+                if not present:
+                    continue
+                non_null[i] += len(present)
+                hlls[i].add_values(present)
+                low, high = min(present, key=_sortable), max(present, key=_sortable)
+                if lows[i] is None or _sortable(low) < _sortable(lows[i]):
+                    lows[i] = low
+                if highs[i] is None or _sortable(high) > _sortable(highs[i]):
+                    highs[i] = high
+    finally:
+        conn.close()
+
+    columns = {}
+    for i, name in enumerate(names):
+        distinct = hlls[i].count() if non_null[i] else 0
+        distinct = min(distinct, non_null[i])
+        if sampled and non_null[i] and distinct >= 0.9 * non_null[i]:
+            # 样本中几乎全不相同（编号类字段），按总行数外推
+            distinct = int(round(distinct * rows / max(scanned, 1)))
+        examples = []
+        for row in reservoir.rows:
+            v = _json_value(row[i])
+            if v is not None and v not in examples:
+                examples.append(v)
+                if len(examples) >= SAMPLE_VALUES:
+                    break
+        columns[name] = {
+            "null_rate": 1 - non_null[i] / scanned if scanned else None,
+            "distinct": distinct,
+            "min": _json_value(lows[i]),
+            "max": _json_value(highs[i]),
+            "examples": examples,
+        }
+    return {"rows": rows, "scanned": scanned, "sampled": sampled, "columns": columns}
+
+
+def _profile_job(args):
+    db_path, table, options = args
+    try:
+        return table, profile_table(db_path, table, **options)
+    except Exception as e:
+        return table, {"error": str(e)}
+
+
+def profile_tables(db_path, tables, workers=None, **options):
+    """在进程池中并行统计多张表，返回 {表: 统计结果}；单表失败时记为 {"error": ...}。"""
+    tables = list(tables)
+    if not tables:
+        return {}
+    jobs = [(db_path, t, options) for t in tables]
+    workers = min(workers or os.cpu_count() or 1, len(tables))
+    if workers <= 1:
+        return dict(map(_profile_job, jobs))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return dict(executor.map(_profile_job, jobs))
+
+
+def load_or_profile(db_path, fingerprint, tables, workers=None):
+    """
+    按数据库指纹读取缓存的统计结果；缺少的表才重新统计并写回缓存。
+    失败的表（{"error": ...}，如数据库被锁、运行被中断）只返回给调用方、不写入缓存，下次请求时重试。
+    """
+    key = "_".join(str(x) for x in fingerprint)
+    path = cache_path(f"colstats_v{STATS_FORMAT}_{key}.json")
+    stats = {}
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            stats = {}
+        # 旧版本可能写入过失败记录：视为缺失，重新统计
+        stats = {t: s for t, s in stats.items() if "error" not in s}
+
+    missing = [t for t in tables if t not in stats]
+    if missing:
+        fresh = profile_tables(db_path, missing, workers)
+        ok = {t: s for t, s in fresh.items() if "error" not in s}
+        if ok:
+            stats.update(ok)
+            tmp = atomic_target(path)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(stats, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        return dict(stats, **fresh)
+    return stats
+
+
+def main():
+    import argparse
+    import time
+
+    from schema_snapshot import db_fingerprint
+
+    parser = argparse.ArgumentParser(description="统计各表字段画像")
+    parser.add_argument("db", nargs="?", default="cbdb_lite.db")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    names = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")]
+    conn.close()
+    t0 = time.perf_counter()
+    result = load_or_profile(args.db, db_fingerprint(args.db), names, args.workers)
+    print(f"{len(result)} 张表，耗时 {time.perf_counter() - t0:.2f}s")
+    for t, s in sorted(result.items()):
+        print(f"  {t:<28} {s.get('rows', '-'):>10} 行  {'抽样' if s.get('sampled') else ''}{s.get('error', '')}")
+
+
+if __name__ == "__main__":
+    main()
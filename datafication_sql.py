@@ -0,0 +1,213 @@
+"""
+数据化原理页面的 SQL 生成。
+
+三个面板（核心身份 / 入仕记录 / 任官履历）的查询都在这里按实际存在的表拼接，
+页面展示、索引诊断、批量导出等功能共用同一份 SQL。每条查询同时给出它依赖的查找列（IndexSpec），
+供索引诊断判断哪些 JOIN / 过滤列缺少索引。
+
+每个构建函数既可以针对单个人物 (person_id)，也可以针对一个人物集合 (cohort：
+临时表名，含 c_personid 列)。集合模式下用 JOIN 临时表代替 WHERE，一次查询取回所有人。
+
+年号纪年的取法 (nianhao)：
+- "join"：逐行 LEFT JOIN NIAN_HAO 拼接文本；
+- "function"：调用 nianhao.register_functions() 注册的 SQL 函数，不再 JOIN，并给出换算后的西历；
+- "raw"：只取 (年号ID, 年数) 原始列，由调用方整块向量化换算（批量导出使用）。
+"""
+from collections import namedtuple
+
+SU_SHI_ID = 3767  # 默认案例人物：苏轼
+
+# 查询中一次按键查找：alias 为 SQL 中的表别名，keys 为查找列，include 为同表还需读取的列（覆盖索引）
+IndexSpec = namedtuple("IndexSpec", ["alias", "table", "keys", "include"])
+PanelQuery = namedtuple("PanelQuery", ["sql", "lookups"])
+
+SELECT_SEP = ",\n    "
+
+
+def resolve_tables(conn):
+    """返回 {大写表名: 真实表名}。"""
+    rows = conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
+    return {r[0].upper(): r[0] for r in rows}
+
+
+def pick_table(ts, candidates):
+    """按候选名（大写）查找真实表名，都不存在时返回 None。"""
+    for x in candidates:
+        if x in ts: return ts[x]
+    return None
+
+
+def _cohort_join(cohort, alias):
+    return f"JOIN temp.{cohort} K ON K.c_personid = {alias}.c_personid"
+
+
+def build_bio_query(ts, person_id=None, cohort=None):
+    """核心身份：BIOG_MAIN + DYNASTIES + ALTNAME_DATA（别名聚合为一行）。"""
+    T_DYNASTY = pick_table(ts, ["DYNASTIES"])
+    T_ALT_DATA = pick_table(ts, ["ALTNAME_DATA"])
+
+    # 基础字段（使用列表存储，方便换行拼接）
+    select_parts = [
+        "B.c_personid AS [人物ID]",
+        "B.c_name_chn AS [姓名]",
+        "B.c_birthyear AS [生年]"
+    ]
+    join_parts = []
+    group_by = ""
+    lookups = [IndexSpec("B", "BIOG_MAIN", ["c_personid"], ["c_name_chn", "c_birthyear", "c_dy"])]
+
+    # 连接朝代
+    if T_DYNASTY:
+        select_parts.append("D.c_dynasty_chn AS [朝代]")
+        join_parts.append(f"LEFT JOIN {T_DYNASTY} D ON B.c_dy = D.c_dy")
+        lookups.append(IndexSpec("D", T_DYNASTY, ["c_dy"], ["c_dynasty_chn"]))
+
+    # 连接别名并聚合 (一对多 -> 一对一字符串)
+    if T_ALT_DATA:
+        select_parts.append("GROUP_CONCAT(DISTINCT ALT.c_alt_name_chn) AS [别名/字号]")
+        join_parts.append(f"LEFT JOIN {T_ALT_DATA} ALT ON B.c_personid = ALT.c_personid")
+        group_by = "GROUP BY B.c_personid"
+        lookups.append(IndexSpec("ALT", T_ALT_DATA, ["c_personid"], ["c_alt_name_chn"]))
+    else:
+        select_parts.append("'[别名表缺失]' AS [别名/字号]")
+
+    if cohort:
+        join_parts.insert(0, _cohort_join(cohort, "B"))
+        where = ""
+        group_by = "GROUP BY B.c_personid\nORDER BY B.c_personid" if group_by else "ORDER BY B.c_personid"
+    else:
+        where = f"WHERE B.c_personid = {int(person_id)}"
+
+    joins = "\n".join(join_parts)
+    sql = f"""SELECT 
+    {SELECT_SEP.join(select_parts)}
+FROM BIOG_MAIN B 
+{joins}
+{where}
+{group_by}"""
+    return PanelQuery(sql, lookups)
+
+
+def build_entry_query(ts, person_id=None, cohort=None, nianhao="join"):
+    """入仕记录：ENTRY_DATA + ENTRY_CODES (+ NIAN_HAO)；缺少入仕表时返回 None。"""
+    T_ENTRY_DATA = pick_table(ts, ["ENTRY_DATA"])
+    T_ENTRY_CODES = pick_table(ts, ["ENTRY_CODES", "CODE_ENTRY"])
+    T_NIAN_HAO = pick_table(ts, ["NIAN_HAO"])
+    if not (T_ENTRY_DATA and T_ENTRY_CODES):
+        return None
+
+    cols = [
+        "E.c_year AS [西历]",
+        "C.c_entry_desc_chn AS [入仕途径]",
+        "E.c_age AS [年龄]"
+    ]
+    joins = [
+        f"LEFT JOIN {T_ENTRY_CODES} C ON E.c_entry_code = C.c_entry_code"
+    ]
+    entry_cols = ["c_year", "c_entry_code", "c_age"]
+    lookups = [IndexSpec("C", T_ENTRY_CODES, ["c_entry_code"], ["c_entry_desc_chn"])]
+
+    if T_NIAN_HAO and nianhao == "function":
+        cols.insert(0, "nianhao_label(E.c_nianhao_id, E.c_entry_nh_year) AS [年号纪年]")
+        cols.insert(2, "nianhao_year(E.c_nianhao_id, E.c_entry_nh_year) AS [年号换算西历]")
+        entry_cols += ["c_nianhao_id", "c_entry_nh_year"]
+    elif T_NIAN_HAO and nianhao == "raw":
+        cols[0:0] = ["E.c_nianhao_id AS [年号ID]", "E.c_entry_nh_year AS [年号年]"]
+        entry_cols += ["c_nianhao_id", "c_entry_nh_year"]
+    elif T_NIAN_HAO:
+        cols.insert(0, "N.c_nianhao_chn || ' ' || E.c_entry_nh_year || '年' AS [年号纪年]")
+        joins.append(f"LEFT JOIN {T_NIAN_HAO} N ON E.c_nianhao_id = N.c_nianhao_id")
+        entry_cols += ["c_nianhao_id", "c_entry_nh_year"]
+        lookups.append(IndexSpec("N", T_NIAN_HAO, ["c_nianhao_id"], ["c_nianhao_chn"]))
+    lookups.insert(0, IndexSpec("E", T_ENTRY_DATA, ["c_personid"], entry_cols))
+
+    if cohort:
+        cols.insert(0, "E.c_personid AS [人物ID]")
+        joins.insert(0, _cohort_join(cohort, "E"))
+        sql = f"""SELECT 
+    {SELECT_SEP.join(cols)}
+FROM {T_ENTRY_DATA} E
+{' '.join(joins)}
+ORDER BY E.c_personid, E.c_year"""
+        return PanelQuery(sql, lookups)
+
+    # 苏轼案例精准定位嘉祐二年，其他人物列出全部记录
+    if int(person_id) == SU_SHI_ID:
+        entry_filter = "\n  AND E.c_year = 1057"
+    else:
+        entry_filter = "\nORDER BY E.c_year"
+
+    sql = f"""SELECT 
+    {SELECT_SEP.join(cols)}
+FROM {T_ENTRY_DATA} E
+{' '.join(joins)}
+WHERE E.c_personid = {int(person_id)} {entry_filter}"""
+    return PanelQuery(sql, lookups)
+
+
+def build_office_query(ts, person_id=None, cohort=None, limit=10, nianhao="join"):
+    """
+    任官履历：POSTED_TO_OFFICE_DATA + OFFICE_CODES + POSTED_TO_ADDR_DATA + ADDRESSES。
+    单人模式按任职年份取前 limit 条；集合模式返回全部记录。
+    """
+    T_OFFICE_DATA = pick_table(ts, ["POSTED_TO_OFFICE_DATA"])
+    T_OFFICE_CODES = pick_table(ts, ["OFFICE_CODES", "CODE_OFFICE"])
+    T_ADDR_DATA = pick_table(ts, ["POSTED_TO_ADDR_DATA"])
+    T_ADDRESSES_OFFICE = pick_table(ts, ["ADDRESSES"])
+
+    # 基础字段（使用列表存储，方便换行拼接）
+    select_parts_office = [
+        "P.c_firstyear AS [任职年份]"
+    ]
+    if nianhao == "function" and pick_table(ts, ["NIAN_HAO"]):
+        select_parts_office.append("nianhao_eras(P.c_firstyear) AS [任职年号]")
+    join_clause = []
+    lookups = [IndexSpec("P", T_OFFICE_DATA, ["c_personid"], ["c_firstyear", "c_office_id", "c_posting_id"])]
+
+    if T_OFFICE_CODES:
+        select_parts_office.append("O.c_office_chn AS [官职名称]")
+        join_clause.append(f"LEFT JOIN {T_OFFICE_CODES} O ON P.c_office_id = O.c_office_id")
+        lookups.append(IndexSpec("O", T_OFFICE_CODES, ["c_office_id"], ["c_office_chn"]))
+    else:
+        select_parts_office.append("'[未知官职]' AS [官职名称]")
+
+    # ✨ 修复任职地点连接：使用 COALESCE 处理空值，空值显示为 "—"
+    if T_ADDR_DATA and T_ADDRESSES_OFFICE:
+        # COALESCE(A.c_name_chn, '—') 确保如果 A.c_name_chn 为空，则显示"—"
+        select_parts_office.append("COALESCE(A.c_name_chn, '—') AS [任职地点]")
+        join_clause.append(f"LEFT JOIN {T_ADDR_DATA} PA ON P.c_posting_id = PA.c_posting_id")
+        join_clause.append(f"LEFT JOIN {T_ADDRESSES_OFFICE} A ON PA.c_addr_id = A.c_addr_id")
+        lookups.append(IndexSpec("PA", T_ADDR_DATA, ["c_posting_id"], ["c_addr_id"]))
+        lookups.append(IndexSpec("A", T_ADDRESSES_OFFICE, ["c_addr_id"], ["c_name_chn"]))
+    else:
+        select_parts_office.append("'—' AS [任职地点]")  # 如果表不存在，直接显示"—"
+
+    if cohort:
+        select_parts_office.insert(0, "P.c_personid AS [人物ID]")
+        join_clause.insert(0, _cohort_join(cohort, "P"))
+        joins = "\n".join(join_clause)
+        sql = f"""SELECT 
+    {SELECT_SEP.join(select_parts_office)}
+FROM {T_OFFICE_DATA} P
+{joins}
+ORDER BY P.c_personid, P.c_firstyear"""
+        return PanelQuery(sql, lookups)
+
+    joins = "\n".join(join_clause)
+    sql = f"""SELECT 
+    {SELECT_SEP.join(select_parts_office)}
+FROM {T_OFFICE_DATA} P
+{joins}
+WHERE P.c_personid = {int(person_id)}
+ORDER BY P.c_firstyear
+LIMIT {int(limit)}"""
+    return PanelQuery(sql, lookups)
+
+
+def build_panel_queries(ts, person_id=None, cohort=None, nianhao="join"):
+    """三个面板的查询 {面板名: PanelQuery 或 None}。"""
+    return {
+        "bio": build_bio_query(ts, person_id, cohort),
+        "entry": build_entry_query(ts, person_id, cohort, nianhao),
+        "office": build_office_query(ts, person_id, cohort, nianhao=nianhao),
+    }
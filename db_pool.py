@@ -0,0 +1,127 @@
+"""
+进程级只读 SQLite 连接池。
+
+连接以 `mode=ro&immutable=1` 打开并设置 mmap_size / cache_size / query_only，
+借出期间由一个线程独占使用，归还后留给后续重跑复用，省去每次重跑的建连和冷页缓存。
+没有做成线程本地 (threading.local) 的连接：Streamlit 每次重跑都在新的脚本线程中执行，
+面板查询的线程池也是临时的，按线程绑定的连接在下一次重跑时用不上、线程结束后也无人关闭。
+因此连接在线程之间轮转（check_same_thread=False），但同一时刻只属于借出它的那个线程。
+可传入 init(conn) 在每个新连接上做额外初始化（例如注册自定义 SQL 函数），
+以及 checkout(conn)：每次借出时包裹在连接外的上下文管理器工厂（例如 SQL 追踪）。
+池的统计信息（已打开连接、复用命中、等待次数等）可在侧边栏查看，便于按负载调整池大小。
+"""
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import quote
+
+DEFAULT_PRAGMAS = {
+    "mmap_size": 256 * 1024 * 1024,  # 256 MB 内存映射
+    "cache_size": -32 * 1024,        # 每个连接 32 MB 页缓存（负数单位为 KiB）
+    "query_only": 1,
+}
+
+
+class PoolTimeout(RuntimeError):
+    """连接数已达上限，且在等待时间内没有连接归还。"""
+
+
+class ReadOnlyPool:
+    def __init__(self, db_path, max_connections=8, timeout=30.0, pragmas=None, init=None,
+                 checkout=None):
+        self.db_path = db_path
+        self.init = init
+        self.checkout = checkout
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.pragmas = dict(DEFAULT_PRAGMAS, **(pragmas or {}))
+        self._idle = queue.LifoQueue()  # 后进先出：优先复用最近用过、页缓存最热的连接
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = {"opened": 0, "in_use": 0, "hits": 0, "misses": 0, "waits": 0, "wait_seconds": 0.0,
+                       "peak_in_use": 0}
+
+    def _open(self):
+        uri = f"file:{quote(self.db_path)}?mode=ro&immutable=1"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        if self.init:
+            self.init(conn)
+        return conn
+
+    def _checkout(self):
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self._stats["hits"] += 1
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._stats["opened"] < self.max_connections
+            if can_open:
+                self._stats["opened"] += 1
+                self._stats["misses"] += 1
+        if can_open:
+            try:
+                return self._open()
+            except Exception:
+                with self._lock:
+                    self._stats["opened"] -= 1
+                raise
+
+        # 连接数已达上限：等待其他线程归还
+        t0 = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolTimeout(f"数据库连接池已满：{self.max_connections} 个连接均在使用中，"
+                              f"等待 {self.timeout:g} 秒仍没有连接归还，请稍后重试") from None
+        with self._lock:
+            self._stats["waits"] += 1
+            self._stats["wait_seconds"] += time.perf_counter() - t0
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """借出一个只读连接，with 块结束后自动归还。"""
+        conn = self._checkout()
+        with self._lock:
+            self._stats["in_use"] += 1
+            self._stats["peak_in_use"] = max(self._stats["peak_in_use"], self._stats["in_use"])
+        try:
+            if self.checkout:
+                with self.checkout(conn):
+                    yield conn
+            else:
+                yield conn
+        finally:
+            with self._lock:
+                self._stats["in_use"] -= 1
+                closed = self._closed
+            if closed:
+                conn.close()
+            else:
+                self._idle.put(conn)
+
+    def stats(self):
+        with self._lock:
+            data = dict(self._stats)
+        data["idle"] = self._idle.qsize()
+        data["max_connections"] = self.max_connections
+        data["wait_seconds"] = round(data["wait_seconds"], 4)
+        return data
+
+    def close(self):
+        """关闭所有空闲连接；借出中的连接在归还时关闭。"""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
@@ -0,0 +1,122 @@
+"""
+推断连线的引用覆盖率校验：估计源表字段的取值有多大比例能在目标表的同名键中找到。
+
+结构图的连线完全来自命名规则（c_personid -> BIOG_MAIN、*_id / *_code -> *_CODES / *_DATA、
+孤岛表按同名字段救援），其中不少并不成立。全量反连接 (anti-join) 要扫描整张表，这里改为有界抽样：
+- 源表按随机 rowid 取至多 sample_size 行（rowid 查找走主键 B 树，不扫表）；
+- 抽到的不同取值分批用 `键 IN (...)` 到目标表探测，目标键有索引时为索引查找，
+  没有索引时每批最多扫描一遍目标表（目标多为小的代码表）；
+- 覆盖率 = 能在目标表找到的非空抽样行 / 非空抽样行，作为连线置信度。
+各连线在线程池中并行校验（每个线程向只读连接池借用独立连接），结果按数据库指纹缓存为 JSON。
+"""
+import json
+import os
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from cbdb_cache import atomic_target, cache_path
+
+# 校验格式版本，修改抽样口径或缓存结构时递增
+CONFIDENCE_FORMAT = 1
+
+SAMPLE_SIZE = 1000
+PROBE_BATCH = 500
+
+
+def edge_key(src, dst, label):
+    return f"{src}|{dst}|{label}"
+
+
+def _sample_values(conn, table, column, sample_size, rng):
+    """从源表抽取至多 sample_size 行该字段的取值（含 NULL）。"""
+    try:
+        lo, hi = conn.execute(f"SELECT MIN(rowid), MAX(rowid) FROM [{table}]").fetchone()
+    except Exception:
+        # WITHOUT ROWID 表：退化为按随机数过滤的有界扫描
+        return [r[0] for r in conn.execute(
+            f"SELECT [{column}] FROM [{table}] WHERE abs(random() % 100) < 10 LIMIT ?", (sample_size,))]
+    if lo is None:
+        return []
+    if hi - lo + 1 <= sample_size:
+        return [r[0] for r in conn.execute(f"SELECT [{column}] FROM [{table}]")]
+    rowids = sorted(set(rng.randint(lo, hi) for _ in range(sample_size)))
+    values = []
+    for i in range(0, len(rowids), PROBE_BATCH):
+        batch = rowids[i:i + PROBE_BATCH]
+        values += [r[0] for r in conn.execute(
+            f"SELECT [{column}] FROM [{table}] WHERE rowid IN ({','.join('?' * len(batch))})", batch)]
+    return values
+
+
+def _found_keys(conn, table, column, values):
+    """返回 values 中能在目标表 column 里找到的取值集合。"""
+    values = list(values)
+    found = set()
+    for i in range(0, len(values), PROBE_BATCH):
+        batch = values[i:i + PROBE_BATCH]
+        found.update(r[0] for r in conn.execute(
+            f"SELECT DISTINCT [{column}] FROM [{table}] WHERE [{column}] IN ({','.join('?' * len(batch))})", batch))
+    return found
+
+
+def score_edge(conn, src, dst, label, sample_size=SAMPLE_SIZE):
+    """
+    校验一条连线，返回 {"confidence", "sampled", "non_null"}。
+    源表为空或抽样全为空值时没有可校验的取值，confidence 为 None。
+    """
+    rng = random.Random(edge_key(src, dst, label))  # 固定种子：同一数据库上结果可复现
+    values = _sample_values(conn, src, label, sample_size, rng)
+    non_null = [v for v in values if v is not None]
+    result = {"confidence": None, "sampled": len(values), "non_null": len(non_null)}
+    if non_null:
+        found = _found_keys(conn, dst, label, set(non_null))
+        # 值的类型可能与目标键不同（如 '12' 与 12），按字符串再比较一次
+        found_text = {str(v) for v in found}
+        hits = sum(1 for v in non_null if v in found or str(v) in found_text)
+        result["confidence"] = round(hits / len(non_null), 4)
+    return result
+
+
+def score_edges(pool, edges, columns, sample_size=SAMPLE_SIZE, workers=8):
+    """
+    并行校验多条连线，返回 {edge_key: 结果}。
+    columns 为 {表: 字段名集合}，目标表没有同名键的连线无法校验 (confidence 为 None)；
+    单条失败时记为 {"confidence": None, "error": ...}。
+    """
+    def job(edge):
+        src, dst, label = edge
+        if label not in columns.get(src, ()) or label not in columns.get(dst, ()):
+            return edge_key(*edge), {"confidence": None, "sampled": 0, "non_null": 0}
+        try:
+            with pool.connection() as conn:
+                return edge_key(*edge), score_edge(conn, src, dst, label, sample_size)
+        except Exception as e:
+            return edge_key(*edge), {"confidence": None, "error": str(e)}
+
+    edges = list(edges)
+    if not edges:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(edges)))) as executor:
+        return dict(executor.map(job, edges))
+
+
+def load_or_score(pool, fingerprint, edges, columns, sample_size=SAMPLE_SIZE):
+    """按数据库指纹读取缓存的校验结果；缺少的连线才重新校验并写回缓存。返回 {edge_key: 结果}。"""
+    key = "_".join(str(x) for x in fingerprint)
+    path = cache_path(f"edge_confidence_v{CONFIDENCE_FORMAT}_{key}.json")
+    scores = {}
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                scores = json.load(f)
+        except (OSError, ValueError):
+            scores = {}
+
+    missing = [e for e in edges if edge_key(*e) not in scores]
+    if missing:
+        scores.update(score_edges(pool, missing, columns, sample_size, workers=pool.max_connections))
+        tmp = atomic_target(path)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(scores, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    return scores
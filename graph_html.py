@@ -0,0 +1,140 @@
+"""
+vis-network 拓扑图 HTML 的内存渲染。
+
+模板在导入时解析一次（切分为静态片段与占位符），渲染时只把节点/边/选项的 JSON
+拼接进去，不经过文件系统，也没有共享的可变状态，可被多个 Streamlit 会话并发调用。
+"""
+import json
+import re
+
+from edge_confidence import edge_key
+
+VIS_NETWORK_JS = ('<script src="https://cdnjs.cloudflare.com/ajax/libs/vis-network/9.1.2/dist/vis-network.min.js" '
+                  'integrity="sha512-LnvoEWDFrqGHlHmDD2101OrLcbsfkrzoSpvtSQtxK3RMnRV0eOkhhBN2dXHKRrUU8p2DGRTk35n4O8nWSVe1mQ==" '
+                  'crossorigin="anonymous" referrerpolicy="no-referrer"></script>')
+VIS_NETWORK_CSS = ('<link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/vis-network/9.1.2/dist/dist/vis-network.min.css" '
+                   'integrity="sha512-WgxfT5LWjfszlPHXRmBWHkV2eceiWTOBvrKCNbdgDYTHrT2AeLCGbF4sZlZw3UMN3WtL0tGUoIAKsu8mllg/XA==" '
+                   'crossorigin="anonymous" referrerpolicy="no-referrer" />')
+
+# 页面结构与 pyvis 导出的一致：#mynetwork 容器 + 全局变量 network / nodes / edges，
+# 便于拓扑页叠加的控制面板脚本直接操作。
+_TEMPLATE = """<html>
+<head>
+<meta charset="utf-8">
+{{vis_css}}
+{{vis_js}}
+<style type="text/css">
+    #mynetwork {
+        width: {{width}};
+        height: {{height}};
+        background-color: {{bgcolor}};
+        border: 1px solid lightgray;
+        position: relative;
+        float: left;
+    }
+</style>
+</head>
+<body>
+<div id="mynetwork"></div>
+<script type="text/javascript">
+    var nodes = new vis.DataSet({{nodes}});
+    var edges = new vis.DataSet({{edges}});
+    var container = document.getElementById('mynetwork');
+    var network = new vis.Network(container, {nodes: nodes, edges: edges}, {{options}});
+</script>
+</body>
+</html>
+"""
+
+
+def _parse_template(template):
+    """把模板切成 [静态文本, 占位符名, 静态文本, ...]，奇数位为占位符。"""
+    return re.split(r"\{\{(\w+)\}\}", template)
+
+
+_TEMPLATE_PARTS = _parse_template(_TEMPLATE)
+
+
+def to_script_json(obj):
+    """序列化为可安全嵌入 <script> 的 JSON（转义 </ 以免提前结束脚本块）。"""
+    return json.dumps(obj, ensure_ascii=False).replace("</", "<\\/")
+
+
+def schema_vis_data(nodes_real, edges_real, theme, confidence=None):
+    """
+    结构图的 vis.js 节点与边：节点按连线数分三档大小，带 cbdbGroup 供前端按模块筛选。
+    给出 confidence ({edge_key: 校验结果}) 时，连线宽度随引用覆盖率变化，并带 cbdbConf 供前端按置信度隐藏。
+    """
+    node_degrees = {n: 0 for n in nodes_real}
+    valid_edges = []
+    for src, dst, label in edges_real:
+        if src in nodes_real and dst in nodes_real:
+            valid_edges.append((src, dst, label))
+            node_degrees[src] += 1
+            node_degrees[dst] += 1
+
+    vis_nodes = []
+    for node_id, info in nodes_real.items():
+        size = 15
+        if node_degrees[node_id] > 5: size = 25
+        if node_degrees[node_id] > 20: size = 40
+        vis_nodes.append({"id": node_id, "label": info["label"], "title": info["title"],
+                          "color": theme.get(info["group"], "#E0E0E0"), "shape": "dot", "size": size,
+                          "borderWidth": 1, "font": {"color": "black"}, "cbdbGroup": info["group"]})
+    vis_edges = [{"id": i, "from": src, "to": dst, "title": label, "color": "#CFD8DC", "width": 1}
+                 for i, (src, dst, label) in enumerate(valid_edges)]
+    if confidence is not None:
+        for edge in vis_edges:
+            conf = confidence.get(edge_key(edge["from"], edge["to"], edge["title"]), {}).get("confidence")
+            edge["cbdbConf"] = conf
+            if conf is not None:
+                edge["width"] = round(1 + 2 * conf, 2)
+    return vis_nodes, vis_edges
+
+
+def field_lens_data(link_keys, field_info, vis_edges):
+    """
+    字段透视镜的紧凑数据：表名只出现一次（tables 数组），字段按 fields 顺序以下标引用，
+    fieldEdges 为每个字段对应的连线 id（字段 -> 连线的倒排索引），前端切换字段时只更新这些连线。
+    """
+    tables = []
+    table_idx = {}
+    field_idx = {f: i for i, f in enumerate(link_keys)}
+    field_edges = [[] for _ in link_keys]
+    for e in vis_edges:
+        i = field_idx.get(e["title"])
+        if i is not None:
+            field_edges[i].append(e["id"])
+
+    desc, field_tables = [], []
+    for f in link_keys:
+        info = field_info.get(f, {"desc": f, "tables": []})
+        desc.append(info["desc"])
+        ids = []
+        for t in info["tables"]:
+            if t not in table_idx:
+                table_idx[t] = len(tables)
+                tables.append(t)
+            ids.append(table_idx[t])
+        field_tables.append(ids)
+    return {"tables": tables, "fields": list(link_keys), "desc": desc, "fieldTables": field_tables,
+            "fieldEdges": field_edges}
+
+
+def render_network_html(nodes, edges, options, height="800px", width="100%", bgcolor="#ffffff"):
+    """
+    由节点、边（vis.js 数据格式的 dict 列表）与选项 dict 生成完整 HTML 字符串。
+    """
+    values = {
+        "vis_css": VIS_NETWORK_CSS,
+        "vis_js": VIS_NETWORK_JS,
+        "width": width,
+        "height": height,
+        "bgcolor": bgcolor,
+        "nodes": to_script_json(nodes),
+        "edges": to_script_json(edges),
+        "options": to_script_json(options),
+    }
+    parts = list(_TEMPLATE_PARTS)
+    parts[1::2] = [values[name] for name in _TEMPLATE_PARTS[1::2]]
+    return "".join(parts)
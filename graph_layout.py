@@ -0,0 +1,131 @@
+"""
+服务端预计算的静态拓扑布局（NumPy 向量化的应力优化 / stress majorization）。
+
+以图上的跳数距离为目标距离，先用经典 MDS 得到初始坐标，再迭代最小化应力。
+结果归一化为「平均连线长度 = 1」的单位坐标：浏览器端用 连线长度 × 单位坐标 即得最终位置，
+调整连线长度只是一次缩放，不需要重新计算布局。
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from cbdb_cache import atomic_target, cache_path
+
+# 布局算法版本，修改算法或参数时递增，旧缓存自动失效
+LAYOUT_FORMAT = 1
+
+
+def hop_distances(tables, edges):
+    """
+    所有表两两之间的最短跳数矩阵（矩阵形式的 BFS，逐层扩展可达集合）。
+    不连通的表对记为 (最大跳数 + 1)，让各连通块相互靠近但不重叠。
+    """
+    n = len(tables)
+    index = {t: i for i, t in enumerate(tables)}
+    adj = np.zeros((n, n), dtype=np.float32)
+    for src, dst, _ in edges:
+        i, j = index.get(src), index.get(dst)
+        if i is not None and j is not None and i != j:
+            adj[i, j] = adj[j, i] = 1.0
+
+    dist = np.full((n, n), np.inf)
+    np.fill_diagonal(dist, 0.0)
+    reached = np.eye(n, dtype=bool)
+    frontier = np.eye(n, dtype=np.float32)
+    hop = 0
+    while frontier.any():
+        hop += 1
+        nxt = (frontier @ adj > 0) & ~reached
+        dist[nxt] = hop
+        reached |= nxt
+        frontier = nxt.astype(np.float32)
+
+    finite = dist[np.isfinite(dist)]
+    dist[~np.isfinite(dist)] = (finite.max() if finite.size else 0.0) + 1.0
+    return dist
+
+
+def _classical_mds(dist):
+    """经典 MDS：对双中心化的距离平方矩阵取前两个特征向量，作为确定性的初始坐标。"""
+    n = len(dist)
+    j = np.eye(n) - np.ones((n, n)) / n
+    b = -0.5 * j @ (dist ** 2) @ j
+    vals, vecs = np.linalg.eigh(b)
+    order = np.argsort(vals)[::-1][:2]
+    coords = vecs[:, order] * np.sqrt(np.maximum(vals[order], 1e-9))
+    # 完全对称的图 MDS 可能退化到一条线上，加一点确定性扰动打破对称
+    rng = np.random.default_rng(0)
+    return coords + rng.normal(scale=1e-3, size=coords.shape)
+
+
+def stress_majorization(dist, max_iter=300, tol=1e-4):
+    """
+    加权应力优化（权重 d^-2），每次迭代对所有节点同时做向量化的局部更新。
+    返回 n×2 坐标。
+    """
+    n = len(dist)
+    if n == 0:
+        return np.zeros((0, 2))
+    if n == 1:
+        return np.zeros((1, 2))
+
+    x = _classical_mds(dist)
+    with np.errstate(divide="ignore"):
+        w = np.where(dist > 0, dist ** -2.0, 0.0)
+    w_sum = w.sum(axis=1)[:, None]
+
+    wd = w * dist
+    for _ in range(max_iter):
+        # 当前两两距离（用 |xi|² + |xj|² - 2 xi·xj 避免构造 n×n×2 的差值张量）
+        sq = (x ** 2).sum(axis=1)
+        cur = np.sqrt(np.maximum(sq[:, None] + sq[None, :] - 2.0 * x @ x.T, 1e-18))
+        # x_i ← Σ_j w_ij (x_j + d_ij (x_i - x_j) / |x_i - x_j|) / Σ_j w_ij
+        m = wd / cur
+        x_new = (w @ x + x * m.sum(axis=1)[:, None] - m @ x) / w_sum
+        moved = np.abs(x_new - x).max()
+        x = x_new
+        if moved < tol * max(1.0, np.abs(x).max()):
+            break
+    return x
+
+
+def unit_layout(tables, edges):
+    """计算单位坐标 {表: (x, y)}：居中，平均连线长度归一为 1。"""
+    if not tables:
+        return {}
+    x = stress_majorization(hop_distances(tables, edges))
+    x -= x.mean(axis=0)
+
+    index = {t: i for i, t in enumerate(tables)}
+    pairs = np.array([(index[s], index[d]) for s, d, _ in edges if s in index and d in index and s != d])
+    if len(pairs):
+        mean_edge = np.linalg.norm(x[pairs[:, 0]] - x[pairs[:, 1]], axis=1).mean()
+        if mean_edge > 0:
+            x /= mean_edge
+    return {t: (float(x[i, 0]), float(x[i, 1])) for t, i in index.items()}
+
+
+def _layout_key(tables, edges):
+    h = hashlib.sha1()
+    h.update(json.dumps([list(tables), [list(e[:2]) for e in edges]], ensure_ascii=False).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def load_or_compute_layout(tables, edges):
+    """按表与连线内容缓存单位布局到本地缓存目录；结构不变时直接读取。"""
+    path = cache_path(f"layout_v{LAYOUT_FORMAT}_{_layout_key(tables, edges)}.json")
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return {t: tuple(xy) for t, xy in json.load(f).items()}
+        except (OSError, ValueError):
+            pass
+
+    layout = unit_layout(tables, edges)
+    tmp = atomic_target(path)
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(layout, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    return layout
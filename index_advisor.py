@@ -0,0 +1,192 @@
+"""
+数据化查询的索引诊断与覆盖索引构建。
+
+对页面实际生成的 SQL 执行 EXPLAIN QUERY PLAN，找出全表扫描（SCAN）和
+SQLite 每次查询临时建立的自动索引（AUTOMATIC INDEX），据此给出覆盖索引建议。
+发布版数据库保持原样：索引建在缓存目录下的旁路副本中（SQLite 的索引必须与表在同一个文件里，
+ATTACH 的数据库无法为主库的表建索引），并报告建索引前后的查询耗时。
+
+命令行用法：
+    python index_advisor.py cbdb_lite.db            # 只诊断
+    python index_advisor.py cbdb_lite.db --build    # 诊断并构建带索引的旁路副本
+"""
+import argparse
+import os
+import re
+import sqlite3
+import statistics
+import time
+
+from cbdb_cache import atomic_target, cache_path
+from datafication_sql import SU_SHI_ID, build_panel_queries, resolve_tables
+from nianhao import register_functions
+from schema_snapshot import db_fingerprint
+
+_PLAN_TARGET = re.compile(r"^(SCAN|SEARCH)(?: TABLE)? (\S+)(?: AS (\S+))?(.*)$")
+
+
+def _connect(db_path):
+    """只读打开数据库，并注册页面查询用到的年号函数（与页面连接池相同）。"""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    register_functions(conn)
+    return conn
+
+
+def explain(conn, sql):
+    """返回 EXPLAIN QUERY PLAN 的 detail 列表。"""
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql)]
+
+
+def find_scans(conn, query):
+    """
+    找出查询中需要索引的查找：全表扫描，或依赖自动临时索引的查找。
+    返回 [{"alias", "table", "detail", "spec"}]，spec 为对应的 IndexSpec（没有登记时为 None）。
+    """
+    specs = {spec.alias: spec for spec in query.lookups}
+    problems = []
+    for detail in explain(conn, query.sql):
+        m = _PLAN_TARGET.match(detail)
+        if not m:
+            continue
+        kind, name, alias, rest = m.groups()
+        alias = alias or name
+        if kind == "SCAN" or "AUTOMATIC" in rest:
+            spec = specs.get(alias)
+            problems.append({"alias": alias, "table": spec.table if spec else name, "detail": detail, "spec": spec})
+    return problems
+
+
+def index_statement(spec):
+    """为一次查找生成覆盖索引语句：查找列在前，其余读取列在后。"""
+    cols = list(dict.fromkeys(list(spec.keys) + list(spec.include)))
+    name = f"cbdb_adv_{spec.table}_{'_'.join(spec.keys)}".lower()
+    col_sql = ", ".join(cols)
+    return f"CREATE INDEX IF NOT EXISTS {name} ON {spec.table} ({col_sql})"
+
+
+def recommend(problems):
+    """由诊断结果生成去重后的建索引语句。"""
+    return list(dict.fromkeys(index_statement(p["spec"]) for p in problems if p["spec"] is not None))
+
+
+# ---------------- 旁路副本 ----------------
+SIDECAR_PREFIX = "indexed_"
+
+
+def sidecar_path(fingerprint):
+    """带索引旁路副本的路径（按原库指纹命名）。"""
+    key = "_".join(str(x) for x in fingerprint)
+    return cache_path(f"{SIDECAR_PREFIX}{key}.db")
+
+
+def prune_sidecars(keep):
+    """删除缓存目录中其他指纹（原库已变化）留下的旁路副本，返回删除的文件列表。"""
+    keep = os.path.abspath(keep)
+    folder = os.path.dirname(keep)
+    removed = []
+    for name in os.listdir(folder):
+        path = os.path.join(folder, name)
+        if name.startswith(SIDECAR_PREFIX) and name.endswith(".db") and os.path.abspath(path) != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                # 仍被其他进程打开（Windows）时留到下次再删
+                continue
+            removed.append(path)
+    return removed
+
+
+def build_sidecar(db_path, target_path, statements):
+    """用 backup API 复制数据库，再在副本上建索引并 ANALYZE；完成后原子替换到 target_path。"""
+    tmp = atomic_target(target_path)
+    src = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    dst = sqlite3.connect(tmp)
+    try:
+        src.backup(dst, pages=4096)
+        for stmt in statements:
+            dst.execute(stmt)
+        dst.execute("ANALYZE")
+        dst.commit()
+    finally:
+        dst.close()
+        src.close()
+    os.replace(tmp, target_path)
+
+
+def time_query(db_path, sql, repeat=5):
+    """查询耗时中位数（秒），每次完整取回结果。"""
+    conn = _connect(db_path)
+    try:
+        times = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            conn.execute(sql).fetchall()
+            times.append(time.perf_counter() - t0)
+    finally:
+        conn.close()
+    return statistics.median(times)
+
+
+def advise(db_path, person_id=SU_SHI_ID, build=False, fingerprint=None, repeat=5):
+    """
+    诊断数据化页面的三条查询。返回：
+    {"panels": {面板: {"sql", "problems", "before", "after"}}, "statements": [...], "sidecar": 路径或 None}
+    build=True 时构建旁路副本并测量建索引后的耗时。
+    """
+    conn = _connect(db_path)
+    try:
+        # 与页面相同，年号经 SQL 函数换算（不 JOIN NIAN_HAO）
+        queries = {k: q for k, q in build_panel_queries(resolve_tables(conn), person_id, nianhao="function").items() if q}
+        panels = {k: {"sql": q.sql, "problems": find_scans(conn, q)} for k, q in queries.items()}
+    finally:
+        conn.close()
+
+    statements = recommend([p for panel in panels.values() for p in panel["problems"]])
+    for panel in panels.values():
+        panel["before"] = time_query(db_path, panel["sql"], repeat)
+
+    target = None
+    if build and statements:
+        if fingerprint is None:
+            fingerprint = db_fingerprint(db_path)
+        target = sidecar_path(fingerprint)
+        build_sidecar(db_path, target, statements)
+        prune_sidecars(target)
+        check = _connect(target)
+        try:
+            for k, q in queries.items():
+                panels[k]["after"] = time_query(target, q.sql, repeat)
+                panels[k]["problems_after"] = find_scans(check, q)
+        finally:
+            check.close()
+
+    return {"panels": panels, "statements": statements, "sidecar": target}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据化查询索引诊断")
+    parser.add_argument("db", nargs="?", default="cbdb_lite.db")
+    parser.add_argument("--person", type=int, default=SU_SHI_ID)
+    parser.add_argument("--build", action="store_true", help="构建带覆盖索引的旁路副本")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    report = advise(args.db, args.person, build=args.build, repeat=args.repeat)
+    for name, panel in report["panels"].items():
+        print(f"\n[{name}] 建索引前 {panel['before'] * 1000:.2f} ms", end="")
+        if "after" in panel:
+            print(f" -> 建索引后 {panel['after'] * 1000:.2f} ms", end="")
+        print()
+        for p in panel["problems"]:
+            print(f"  ⚠ {p['detail']}")
+        for p in panel.get("problems_after", []):
+            print(f"  (仍存在) {p['detail']}")
+    print("\n建议索引:")
+    for stmt in report["statements"] or ["(无)"]:
+        print(f"  {stmt};")
+    if report["sidecar"]:
+        print(f"\n旁路副本: {report['sidecar']}")
+
+
+if __name__ == "__main__":
+    main()
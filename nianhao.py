@@ -0,0 +1,179 @@
+"""
+年号 (NIAN_HAO) 区间索引：年号纪年与西历之间的向量化换算。
+
+NIAN_HAO 只有约千行，整表读入内存后按 c_nianhao_id 排序：
+- 年号 + 年数 -> 西历：np.searchsorted 定位年号，西历 = 元年 + 年数 - 1；
+- 西历 -> 候选年号：区间按起始年排序，用「起始年 <= y」与「最长区间长度」确定候选范围后批量过滤，
+  同一年可能对应多个并立政权的年号，全部返回。
+同一套索引注册为 SQLite 函数（nianhao_year / nianhao_label / nianhao_eras），
+页面查询不再为每行 LEFT JOIN NIAN_HAO；批量导出则直接对整块数组换算。
+"""
+import functools
+import math
+
+import numpy as np
+import pandas as pd
+
+from datafication_sql import pick_table, resolve_tables
+
+
+def _numbers(values):
+    """
+    参数数组 -> float64 数组。与 SQL 函数相同的规则：数字文本按数值解释，
+    空值、非数字文本、BLOB 与非有限值为 NaN；integral=True 时非整数也为 NaN（年号 ID、年数只能是整数）。
+    """
+    out = pd.to_numeric(pd.Series(list(values), dtype=object), errors="coerce").to_numpy(dtype=np.float64, copy=True)
+    out[~np.isfinite(out)] = np.nan
+    return out
+
+
+def _integers(values):
+    out = _numbers(values)
+    out[out != np.floor(out)] = np.nan
+    return out
+
+
+class NianhaoIndex:
+    def __init__(self, ids, first, last, names, dynasties):
+        order = np.argsort(ids, kind="stable")
+        self.ids = np.asarray(ids, dtype=np.int64)[order]
+        self.first = np.asarray(first, dtype=np.float64)[order]
+        self.last = np.asarray(last, dtype=np.float64)[order]
+        self.names = np.asarray(names, dtype=object)[order]
+        self.dynasties = np.asarray(dynasties, dtype=object)[order]
+
+        # 反查用：只保留起止年完整的年号，按元年排序
+        valid = ~np.isnan(self.first) & ~np.isnan(self.last)
+        by_start = np.flatnonzero(valid)[np.argsort(self.first[valid], kind="stable")]
+        self._by_start = by_start
+        self._starts = self.first[by_start]
+        self._ends = self.last[by_start]
+        self._max_span = float((self._ends - self._starts).max()) if len(by_start) else 0.0
+
+    @classmethod
+    def from_connection(cls, conn, table="NIAN_HAO"):
+        rows = conn.execute(f"SELECT c_nianhao_id, c_firstyear, c_lastyear, c_nianhao_chn, c_dynasty_chn "
+                            f"FROM {table} WHERE c_nianhao_id IS NOT NULL").fetchall()
+        if not rows:
+            return cls([], [], [], [], [])
+        ids, first, last, names, dynasties = zip(*rows)
+        first = [np.nan if v is None else v for v in first]
+        last = [np.nan if v is None else v for v in last]
+        return cls(ids, first, last, names, dynasties)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _locate(self, nianhao_ids):
+        """年号 ID 数组 -> 索引下标数组（未知、为空或不是整数时为 -1）。"""
+        ids = _integers(nianhao_ids)
+        known = ~np.isnan(ids)
+        keys = np.where(known, ids, 0).astype(np.int64)
+        pos = np.minimum(np.searchsorted(self.ids, keys), max(len(self.ids) - 1, 0))
+        ok = known & (len(self.ids) > 0)
+        if len(self.ids):
+            ok &= self.ids[pos] == keys
+        return np.where(ok, pos, -1)
+
+    def to_western(self, nianhao_ids, years):
+        """(年号, 年数) 数组 -> 西历 float 数组（无法换算处为 NaN）。"""
+        pos = self._locate(nianhao_ids)
+        years = _integers(years)
+        first = np.where(pos >= 0, self.first[pos] if len(self.ids) else np.nan, np.nan)
+        return first + years - 1
+
+    def labels(self, nianhao_ids, years):
+        """(年号, 年数) 数组 -> 「嘉祐 2年」形式的文本数组（与原 SQL 拼接结果一致，无法换算处为 None）。"""
+        pos = self._locate(nianhao_ids)
+        years = _integers(years)
+        out = np.full(len(pos), None, dtype=object)
+        for i in np.flatnonzero(pos >= 0):
+            if not np.isnan(years[i]) and self.names[pos[i]] is not None:
+                out[i] = f"{self.names[pos[i]]} {int(years[i])}年"
+        return out
+
+    def _candidates(self, western_years):
+        """返回 (输入下标, 年号在索引中的下标, 该年号第几年)。"""
+        years = _integers(western_years)
+        known = np.flatnonzero(~np.isnan(years))
+        if not len(known) or not len(self._starts):
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, empty
+        y = years[known]
+        lo = np.searchsorted(self._starts, y - self._max_span, side="left")
+        hi = np.searchsorted(self._starts, y, side="right")
+        counts = hi - lo
+        owner = np.repeat(np.arange(len(y)), counts)
+        cand = np.repeat(lo - np.cumsum(counts) + counts, counts) + np.arange(int(counts.sum()))
+        hit = self._ends[cand] >= y[owner]
+        owner, cand = owner[hit], cand[hit]
+        era = self._by_start[cand]
+        return known[owner], era, (y[owner] - self.first[era] + 1).astype(np.int64)
+
+    def eras_of(self, western_years):
+        """
+        西历数组 -> 全部候选年号。返回三个等长数组 (输入下标, 年号 ID, 该年号第几年)。
+        """
+        owner, era, nh_year = self._candidates(western_years)
+        return owner, self.ids[era], nh_year
+
+    def describe_years(self, western_years):
+        """西历数组 -> 候选年号文本（如「宋 嘉祐 2年」，多个候选以「; 」分隔）。"""
+        out = [[] for _ in range(len(western_years))]
+        for i, p, nh_year in zip(*self._candidates(western_years)):
+            out[i].append(f"{self.dynasties[p] or ''} {self.names[p]} {nh_year}年".strip())
+        return ["; ".join(x) if x else None for x in out]
+
+
+def _sql_number(value):
+    """SQL 函数参数 -> int / float；空值原样返回，非数字文本或 BLOB 抛出 ValueError。"""
+    if value is None:
+        return None
+    number = float(value.decode() if isinstance(value, bytes) else value)
+    if not math.isfinite(number):
+        raise ValueError(value)
+    return int(number) if number.is_integer() else number
+
+
+def _null_on_error(fn):
+    """SQLite 列是动态类型：参数无法换算时返回 NULL，而不是让整条查询报错。"""
+    @functools.wraps(fn)
+    def wrapper(*args):
+        try:
+            return fn(*(_sql_number(a) for a in args))
+        except (TypeError, ValueError, OverflowError, UnicodeDecodeError):
+            return None
+    return wrapper
+
+
+def register_functions(conn, index=None):
+    """
+    在连接上注册 SQL 函数；连接所在库没有 NIAN_HAO 表且未给出索引时返回 False。
+    参数按数值解释（'2' 与 2 相同），无法转换为数字时函数返回 NULL。
+        nianhao_year(年号ID, 年数)   -> 西历
+        nianhao_label(年号ID, 年数)  -> '嘉祐 2年'
+        nianhao_eras(西历)           -> '宋 嘉祐 2年; ...'
+    """
+    if index is None:
+        table = pick_table(resolve_tables(conn), ["NIAN_HAO"])
+        if not table:
+            return False
+        index = NianhaoIndex.from_connection(conn, table)
+
+    @_null_on_error
+    def year(nh_id, nh_year):
+        w = index.to_western([nh_id], [nh_year])[0]
+        return None if np.isnan(w) else int(w)
+
+    @_null_on_error
+    def label(nh_id, nh_year):
+        return index.labels([nh_id], [nh_year])[0]
+
+    @_null_on_error
+    def eras(y):
+        return index.describe_years([y])[0]
+
+    conn.create_function("nianhao_year", 2, year, deterministic=True)
+    conn.create_function("nianhao_label", 2, label, deterministic=True)
+    conn.create_function("nianhao_eras", 1, eras, deterministic=True)
+    return True
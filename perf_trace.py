@@ -0,0 +1,166 @@
+"""
+热点路径的轻量级性能追踪：阶段耗时 (span) 与 SQL 语句追踪。
+
+追踪只在调用 start_trace() 之后、在同一上下文 (contextvars) 内生效；未开启时
+span() / sql_trace() 只做一次 ContextVar 读取就返回空上下文，几乎没有开销。
+线程池中的任务需用 contextvars.copy_context().run 提交，才能记录到同一份追踪里。
+
+SQL 通过 sqlite3 的 set_trace_callback 捕获每条语句（含参数展开后的文本），
+set_progress_handler 统计虚拟机指令数（所有语句都有，可作为相对开销）；连接归还前对 SELECT 语句
+补做 EXPLAIN QUERY PLAN。sqlite3 只在语句开始时回调、没有结束事件，「到下一条语句开始」的间隔
+会把其间的 Python 工作算到上一条语句上，因此只有经 read_sql() 执行的语句记录耗时与返回行数
+（围绕其执行与取数计时），其余语句的 duration_ms / rows 为空。结果可导出为 JSON Lines。
+"""
+import contextvars
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+import pandas as pd
+
+PROGRESS_STEP = 1000  # 每执行这么多条虚拟机指令回调一次进度处理器
+
+_current = contextvars.ContextVar("cbdb_trace", default=None)
+_NULL = nullcontext()
+
+
+class Trace:
+    """一次页面运行的追踪记录。"""
+
+    def __init__(self, run_id=None):
+        self.run_id = run_id or time.strftime("%Y%m%dT%H%M%S")
+        self.t0 = time.perf_counter()
+        self.spans = []
+        self.statements = []
+        self._lock = threading.Lock()
+
+    def now_ms(self):
+        return (time.perf_counter() - self.t0) * 1000
+
+    def add_span(self, record):
+        with self._lock:
+            self.spans.append(record)
+
+    def add_statements(self, records):
+        with self._lock:
+            self.statements.extend(records)
+
+    def to_jsonl(self):
+        """每个 span / 语句一行 JSON，便于日志系统采集。"""
+        lines = []
+        for kind, records in (("span", self.spans), ("sql", self.statements)):
+            for r in records:
+                lines.append(json.dumps({"run_id": self.run_id, "type": kind, **r}, ensure_ascii=False, default=str))
+        return "\n".join(lines) + ("\n" if lines else "")
+
+
+def start_trace(run_id=None):
+    """在当前上下文开启追踪并返回 Trace。"""
+    trace = Trace(run_id)
+    _current.set(trace)
+    return trace
+
+
+def stop_trace():
+    _current.set(None)
+
+
+def current_trace():
+    return _current.get()
+
+
+@contextmanager
+def _span(trace, name, attrs):
+    start = trace.now_ms()
+    record = {"name": name, "start_ms": round(start, 3), "thread": threading.current_thread().name, **attrs}
+    try:
+        yield record
+    finally:
+        record["duration_ms"] = round(trace.now_ms() - start, 3)
+        trace.add_span(record)
+
+
+def span(name, **attrs):
+    """记录一个阶段的耗时；with 块内可向返回的 dict 追加属性。未开启追踪时为空上下文。"""
+    trace = _current.get()
+    if trace is None:
+        return _NULL
+    return _span(trace, name, attrs)
+
+
+def traced(name):
+    """函数装饰器版的 span（放在 st.cache_data 之外时，记录的是页面实际付出的时间，含缓存命中）。"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            trace = _current.get()
+            if trace is None:
+                return fn(*args, **kwargs)
+            with _span(trace, name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# 正在被追踪的连接 -> 该次借用中记录的语句（供 read_sql 补充行数与精确耗时）
+_active = {}
+
+
+@contextmanager
+def _sql_trace(trace, conn):
+    records = []
+    thread = threading.current_thread().name
+
+    def on_statement(sql):
+        # 耗时与行数只由 read_sql 填写（见模块说明）
+        records.append({"sql": sql, "start_ms": round(trace.now_ms(), 3), "thread": thread, "vm_steps": 0,
+                        "duration_ms": None, "rows": None})
+
+    def on_progress():
+        if records:
+            records[-1]["vm_steps"] += PROGRESS_STEP
+        return 0
+
+    conn.set_trace_callback(on_statement)
+    conn.set_progress_handler(on_progress, PROGRESS_STEP)
+    _active[id(conn)] = records
+    try:
+        yield conn
+    finally:
+        _active.pop(id(conn), None)
+        conn.set_trace_callback(None)
+        conn.set_progress_handler(None, PROGRESS_STEP)
+        for r in records:
+            if r["sql"].lstrip().upper().startswith(("SELECT", "WITH")):
+                try:
+                    r["plan"] = "; ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + r["sql"]))
+                except Exception as e:
+                    r["plan"] = f"(无法获取: {e})"
+        trace.add_statements(records)
+
+
+def sql_trace(conn):
+    """在连接借用期间追踪其执行的 SQL（可作为连接池的 checkout 钩子）。未开启追踪时为空上下文。"""
+    trace = _current.get()
+    if trace is None:
+        return _NULL
+    return _sql_trace(trace, conn)
+
+
+def read_sql(sql, conn, **kwargs):
+    """pd.read_sql 的追踪版本：记录精确耗时与返回行数。"""
+    trace = _current.get()
+    if trace is None:
+        return pd.read_sql(sql, conn, **kwargs)
+    records = _active.get(id(conn))
+    first = len(records) if records is not None else 0
+    with _span(trace, "read_sql", {}) as record:
+        df = pd.read_sql(sql, conn, **kwargs)
+        record["rows"] = len(df)
+    if records is not None and len(records) > first:
+        # 该次调用执行的语句：以 read_sql 围绕执行与取数的计时作为耗时，并补上行数
+        records[first]["rows"] = len(df)
+        records[first]["duration_ms"] = record["duration_ms"]
+    return df
@@ -0,0 +1,172 @@
+"""
+人物关系图：由 KIN_DATA（亲属）与 ASSOC_DATA（社会关系）构建的 CSR 邻接数组。
+
+每个数据库指纹只构建一次，以 .npy 文件写入缓存目录，之后用 np.load(mmap_mode="r")
+内存映射打开：多个进程共享操作系统页缓存，不必把整张图读入各自内存。
+k 跳自我网络 (ego network) 只读取被访问节点的邻接切片，毫秒级返回；
+对高连接度的中心人物设置邻居上限，避免二跳扩展时节点数爆炸。
+"""
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from cbdb_cache import cache_path
+
+# 图文件格式版本，修改构建规则或数组布局时递增
+GRAPH_FORMAT = 1
+
+KIND_KIN = 0
+KIND_ASSOC = 1
+
+_ARRAYS = ("ids", "indptr", "indices", "kinds", "codes")
+
+
+def _read_edges(conn, table, src_col, dst_col, code_col):
+    rows = conn.execute(
+        f"SELECT [{src_col}], [{dst_col}], COALESCE([{code_col}], -1) FROM [{table}] "
+        f"WHERE [{src_col}] IS NOT NULL AND [{dst_col}] IS NOT NULL AND [{src_col}] <> [{dst_col}]"
+    ).fetchall()
+    if not rows:
+        return np.empty((0, 3), dtype=np.int64)
+    return np.asarray(rows, dtype=np.int64)
+
+
+def build_csr(conn, t_kin=None, t_assoc=None):
+    """
+    读取两张关系表，生成无向 CSR 数组 dict：
+    ids（稠密下标 -> c_personid，升序）、indptr、indices（邻居的稠密下标）、kinds（0 亲属 / 1 社会关系）、codes（关系代码）。
+    """
+    parts = []
+    if t_kin:
+        e = _read_edges(conn, t_kin, "c_personid", "c_kin_id", "c_kin_code")
+        parts.append(np.column_stack([e, np.full(len(e), KIND_KIN)]))
+    if t_assoc:
+        e = _read_edges(conn, t_assoc, "c_personid", "c_assoc_id", "c_assoc_code")
+        parts.append(np.column_stack([e, np.full(len(e), KIND_ASSOC)]))
+    edges = np.concatenate(parts) if parts else np.empty((0, 4), dtype=np.int64)
+
+    # 双向存储，并去掉重复记录（同一对人物、同一关系只保留一条）
+    both = np.concatenate([edges, edges[:, [1, 0, 2, 3]]])
+    both = np.unique(both, axis=0)
+
+    ids = np.unique(both[:, :2]) if len(both) else np.empty(0, dtype=np.int64)
+    src = np.searchsorted(ids, both[:, 0])
+    dst = np.searchsorted(ids, both[:, 1])
+    # np.unique 已按 (src, dst, ...) 排序，同一人物的邻居连续存放
+    indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+    np.add.at(indptr, src + 1, 1)
+    np.cumsum(indptr, out=indptr)
+    return {
+        "ids": ids.astype(np.int64),
+        "indptr": indptr,
+        "indices": dst.astype(np.int32),
+        "kinds": both[:, 3].astype(np.int8),
+        "codes": both[:, 2].astype(np.int32),
+    }
+
+
+def graph_dir(fingerprint):
+    """按数据库指纹的图目录路径（不检查是否已构建）。"""
+    key = "_".join(str(x) for x in fingerprint)
+    return cache_path(f"person_graph_v{GRAPH_FORMAT}_{key}")
+
+
+def ensure_person_graph(conn, fingerprint, t_kin=None, t_assoc=None):
+    """返回按指纹缓存的图目录；不存在时构建（写入临时目录后整体改名，并发构建互不干扰）。"""
+    path = graph_dir(fingerprint)
+    if os.path.exists(os.path.join(path, "ids.npy")):
+        return path
+
+    arrays = build_csr(conn, t_kin, t_assoc)
+    tmp = tempfile.mkdtemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        for name in _ARRAYS:
+            np.save(os.path.join(tmp, f"{name}.npy"), arrays[name])
+        os.replace(tmp, path)
+    except OSError:
+        # 其他进程已先一步写好
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not os.path.exists(os.path.join(path, "ids.npy")):
+            raise
+    return path
+
+
+class PersonGraph:
+    """内存映射的 CSR 人物关系图。"""
+
+    def __init__(self, path):
+        self.path = path
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in _ARRAYS}
+        self.ids = arrays["ids"]
+        self.indptr = arrays["indptr"]
+        self.indices = arrays["indices"]
+        self.kinds = arrays["kinds"]
+        self.codes = arrays["codes"]
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def edge_count(self):
+        return len(self.indices) // 2
+
+    def index_of(self, person_id):
+        """c_personid -> 稠密下标；不在图中时返回 None。"""
+        i = int(np.searchsorted(self.ids, person_id))
+        if i < len(self.ids) and self.ids[i] == person_id:
+            return i
+        return None
+
+    def degree(self, i):
+        return int(self.indptr[i + 1] - self.indptr[i])
+
+    def _neighbors(self, i, cap):
+        """邻接切片；超过上限时优先保留亲属，其次保留连接度高的人物。"""
+        lo, hi = int(self.indptr[i]), int(self.indptr[i + 1])
+        nbrs = np.asarray(self.indices[lo:hi])
+        kinds = np.asarray(self.kinds[lo:hi])
+        codes = np.asarray(self.codes[lo:hi])
+        if cap and len(nbrs) > cap:
+            deg = self.indptr[nbrs + 1] - self.indptr[nbrs]
+            order = np.lexsort((-deg, kinds))[:cap]
+            return nbrs[order], kinds[order], codes[order], len(nbrs) - cap
+        return nbrs, kinds, codes, 0
+
+    def ego_network(self, person_id, hops=2, max_neighbors=30, max_nodes=400):
+        """
+        以 person_id 为中心的 k 跳自我网络。
+        返回 {"nodes": {c_personid: 跳数}, "edges": [(a, b, kind, code)], "capped": {被截断的人物: 省略的邻居数}}。
+        """
+        center = self.index_of(person_id)
+        if center is None:
+            return {"nodes": {}, "edges": [], "capped": {}}
+
+        hop_of = {center: 0}
+        frontier = [center]
+        edges = {}
+        capped = {}
+        for hop in range(1, hops + 1):
+            next_frontier = []
+            for i in frontier:
+                nbrs, kinds, codes, dropped = self._neighbors(i, max_neighbors)
+                if dropped:
+                    capped[int(self.ids[i])] = dropped
+                for j, kind, code in zip(nbrs.tolist(), kinds.tolist(), codes.tolist()):
+                    if j not in hop_of:
+                        if len(hop_of) >= max_nodes:
+                            capped[int(self.ids[i])] = capped.get(int(self.ids[i]), 0) + 1
+                            continue
+                        hop_of[j] = hop
+                        next_frontier.append(j)
+                    key = (min(i, j), max(i, j), kind, code)
+                    edges[key] = None
+            frontier = next_frontier
+
+        ids = self.ids
+        return {
+            "nodes": {int(ids[i]): h for i, h in hop_of.items()},
+            "edges": [(int(ids[a]), int(ids[b]), k, c) for a, b, k, c in edges],
+            "capped": capped,
+        }
@@ -0,0 +1,107 @@
+"""
+人物检索：BIOG_MAIN 姓名 + ALTNAME_DATA 字号/别名的 FTS5 旁路索引。
+
+索引写在缓存目录下的独立 SQLite 文件中（发布版数据库保持只读、不被修改），
+每个数据库指纹只构建一次。FTS5 内置分词器不适合中文（unicode61 把整串汉字当成一个词，
+trigram 不支持两字查询），因此在 Python 端把汉字切成「单字 + 相邻二字」词元，
+以空格分隔写入，由 unicode61 按空格切分；查询时用同样的规则切分后做 AND 匹配。
+"""
+import os
+import sqlite3
+
+from cbdb_cache import atomic_target, cache_path
+from text_tokens import cjk_query_tokens, cjk_runs, cjk_tokens, latin_words
+
+# 索引格式版本，修改分词规则或表结构时递增
+INDEX_FORMAT = 1
+
+
+def build_match_expression(query):
+    """把用户输入转成 FTS5 MATCH 表达式；没有可检索内容时返回 None。"""
+    terms = []
+    for run in cjk_runs(query):
+        terms.extend(f'"{tok}"' for tok in cjk_query_tokens(run))
+    for word in latin_words(query):
+        terms.append(f'latin : "{word}"*')
+    if not terms:
+        return None
+    return " AND ".join(dict.fromkeys(terms))
+
+
+# ---------------- 构建 ----------------
+def _index_path(fingerprint):
+    key = "_".join(str(x) for x in fingerprint)
+    return cache_path(f"person_fts_v{INDEX_FORMAT}_{key}.sqlite")
+
+
+def _iter_people(conn, t_biog, t_alt, batch_size=20000):
+    """流式读取人物及其别名（别名按人物聚合），避免一次性载入全部行。"""
+    alt_select = "NULL, NULL"
+    alt_join = ""
+    if t_alt:
+        alt_select = "GROUP_CONCAT(A.c_alt_name_chn, ' '), GROUP_CONCAT(A.c_alt_name, ' ')"
+        alt_join = f"LEFT JOIN {t_alt} A ON A.c_personid = B.c_personid"
+    cur = conn.execute(f"""SELECT B.c_personid, B.c_name_chn, B.c_name, B.c_birthyear, B.c_deathyear, {alt_select}
+FROM {t_biog} B
+{alt_join}
+GROUP BY B.c_personid""")
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            break
+        yield rows
+
+
+def build_person_index(conn, index_path, t_biog="BIOG_MAIN", t_alt="ALTNAME_DATA"):
+    """从源数据库（只读连接）构建 FTS5 旁路索引，写完后原子替换到 index_path。"""
+    tmp = atomic_target(index_path)
+    out = sqlite3.connect(tmp)
+    try:
+        out.execute("""CREATE VIRTUAL TABLE person_fts USING fts5(
+    name_tokens, alt_tokens, latin,
+    personid UNINDEXED, name_chn UNINDEXED, name UNINDEXED, alt_names UNINDEXED,
+    birthyear UNINDEXED, deathyear UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+)""")
+        for rows in _iter_people(conn, t_biog, t_alt):
+            out.executemany("INSERT INTO person_fts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+                (" ".join(cjk_tokens(name_chn)), " ".join(cjk_tokens(alt_chn)),
+                 " ".join(filter(None, [name or "", alt_latin or ""])),
+                 pid, name_chn, name, alt_chn, by, dy)
+                for pid, name_chn, name, by, dy, alt_chn, alt_latin in rows
+            ])
+        out.execute("INSERT INTO person_fts(person_fts) VALUES ('optimize')")
+        out.commit()
+    finally:
+        out.close()
+    os.replace(tmp, index_path)
+
+
+def ensure_person_index(conn, fingerprint, t_biog="BIOG_MAIN", t_alt="ALTNAME_DATA"):
+    """返回当前数据库指纹对应的索引路径，不存在时先构建。"""
+    path = _index_path(fingerprint)
+    if not os.path.exists(path):
+        build_person_index(conn, path, t_biog, t_alt)
+    return path
+
+
+# ---------------- 查询 ----------------
+def search_persons(index_path, query, limit=20):
+    """
+    按姓名 / 字号 / 别名检索人物，返回按相关度排序的 dict 列表。
+    姓名完全相同的排在最前，其余按 bm25（姓名列权重高于别名列）排序。
+    """
+    expr = build_match_expression(query)
+    if expr is None:
+        return []
+    conn = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("""SELECT personid, name_chn, name, alt_names, birthyear, deathyear
+FROM person_fts
+WHERE person_fts MATCH ?
+ORDER BY (name_chn = ?) DESC, bm25(person_fts, 10.0, 4.0, 6.0)
+LIMIT ?""", (expr, query.strip(), limit)).fetchall()
+    finally:
+        conn.close()
+    keys = ("personid", "name_chn", "name", "alt_names", "birthyear", "deathyear")
+    return [dict(zip(keys, r)) for r in rows]
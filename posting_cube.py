@@ -0,0 +1,172 @@
+"""
+任官记录的时空数据立方体：按 任职地点 × 年代 (十年) × 朝代 × 官职类别 预聚合的任官次数。
+
+POSTED_TO_OFFICE_DATA → POSTED_TO_ADDR_DATA 的全库 GROUP BY 只在每个数据库指纹下执行一次，
+结果以稀疏坐标形式（每个非空格子一行：四个维度的下标 + 计数）存为 NumPy 数组。
+切片是对坐标数组做布尔掩码，上卷 (rollup) 是对所选维度的组合下标做 np.bincount，
+都在内存中向量化完成，不再访问数据库。
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from cbdb_cache import atomic_target, cache_path
+from datafication_sql import pick_table
+
+# 立方体格式版本，修改聚合口径或数组布局时递增
+CUBE_FORMAT = 2
+
+UNKNOWN = -1  # 维度值缺失（年份、朝代、类别为空；年份为 0 即 CBDB 的「不详」）
+DIMS = ("addr", "decade", "dynasty", "category")
+
+
+def _cube_path(fingerprint):
+    key = "_".join(str(x) for x in fingerprint)
+    return cache_path(f"posting_cube_v{CUBE_FORMAT}_{key}.npz")
+
+
+def _labels(conn, sql):
+    return {k: v for k, v in conn.execute(sql).fetchall() if k is not None}
+
+
+def build_cube(conn, ts):
+    """执行一次全库聚合，返回立方体的数组 dict；缺少任官或地点表时返回 None。"""
+    t_office = pick_table(ts, ["POSTED_TO_OFFICE_DATA"])
+    t_post_addr = pick_table(ts, ["POSTED_TO_ADDR_DATA"])
+    t_addr = pick_table(ts, ["ADDRESSES", "ADDR_CODES"])
+    if not (t_office and t_post_addr and t_addr):
+        return None
+
+    # 年代向下取整到十年（SQLite 的整数除法向零取整，这里用取模写法使公元前年份也向下取整）；
+    # CBDB 中年份 0 表示不详，与 NULL 一样归入未知年代
+    rows = conn.execute(f"""
+        SELECT PA.c_addr_id,
+               CASE WHEN P.c_firstyear IS NULL OR P.c_firstyear = 0 THEN {UNKNOWN}
+                    ELSE P.c_firstyear - ((P.c_firstyear % 10) + 10) % 10 END,
+               COALESCE(P.c_dy, {UNKNOWN}),
+               COALESCE(P.c_office_category_id, {UNKNOWN}),
+               COUNT(*)
+        FROM {t_office} P
+        JOIN {t_post_addr} PA ON P.c_posting_id = PA.c_posting_id
+        WHERE PA.c_addr_id IS NOT NULL
+        GROUP BY 1, 2, 3, 4
+    """).fetchall()
+    facts = np.asarray(rows, dtype=np.int64).reshape(-1, 5)
+
+    # 地点维度：任职地点及其上级行政区 (belongs1_ID)，带坐标
+    has_parent = "belongs1_ID" in {r[1] for r in conn.execute(f"PRAGMA table_info({t_addr})")}
+    parent_col = "belongs1_ID" if has_parent else "NULL"
+    addr_rows = {r[0]: r[1:] for r in conn.execute(
+        f"SELECT c_addr_id, c_name_chn, x_coord, y_coord, {parent_col} FROM {t_addr}")}
+    used = np.unique(facts[:, 0])
+    parents = {a: addr_rows.get(a, (None, None, None, None))[3] for a in used.tolist()}
+    addr_ids = np.unique(np.concatenate([used, np.asarray([p for p in parents.values() if p is not None], dtype=np.int64)]))
+    meta = [addr_rows.get(a, (None, None, None, None)) for a in addr_ids.tolist()]
+    parent_ids = np.asarray([m[3] if m[3] is not None else a for a, m in zip(addr_ids.tolist(), meta)], dtype=np.int64)
+    parent_idx = np.searchsorted(addr_ids, parent_ids)
+    parent_idx[(parent_idx >= len(addr_ids)) | (addr_ids[np.minimum(parent_idx, len(addr_ids) - 1)] != parent_ids)] = -1
+    parent_idx = np.where(parent_idx < 0, np.arange(len(addr_ids)), parent_idx)
+
+    t_dy = pick_table(ts, ["DYNASTIES"])
+    t_cat = pick_table(ts, ["OFFICE_CATEGORIES"])
+    dy_names = _labels(conn, f"SELECT c_dy, c_dynasty_chn FROM {t_dy}") if t_dy else {}
+    cat_names = _labels(conn, f"SELECT c_office_category_id, c_category_desc_chn FROM {t_cat}") if t_cat else {}
+
+    arrays = {"count": facts[:, 4]}
+    for pos, dim in enumerate(DIMS):
+        values = addr_ids if dim == "addr" else np.unique(facts[:, pos])
+        arrays[f"{dim}_values"] = values
+        arrays[f"{dim}_idx"] = np.searchsorted(values, facts[:, pos]).astype(np.int32)
+    arrays["addr_name"] = np.asarray([m[0] or str(a) for a, m in zip(addr_ids.tolist(), meta)], dtype=str)
+    arrays["addr_x"] = np.asarray([m[1] if m[1] is not None else np.nan for m in meta], dtype=np.float64)
+    arrays["addr_y"] = np.asarray([m[2] if m[2] is not None else np.nan for m in meta], dtype=np.float64)
+    arrays["addr_parent"] = parent_idx.astype(np.int32)
+    arrays["dynasty_name"] = np.asarray([dy_names.get(v) or ("不详" if v == UNKNOWN else str(v))
+                                         for v in arrays["dynasty_values"].tolist()], dtype=str)
+    arrays["category_name"] = np.asarray([cat_names.get(v) or ("未分类" if v == UNKNOWN else str(v))
+                                          for v in arrays["category_values"].tolist()], dtype=str)
+    return arrays
+
+
+def ensure_cube(conn, ts, fingerprint):
+    """按数据库指纹读取或构建立方体，返回 PostingCube（缺少相关表时返回 None）。"""
+    path = _cube_path(fingerprint)
+    if not os.path.exists(path):
+        arrays = build_cube(conn, ts)
+        if arrays is None:
+            return None
+        tmp = atomic_target(path)
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+    with np.load(path) as data:
+        return PostingCube({k: data[k] for k in data.files})
+
+
+class PostingCube:
+    """稀疏存储的任官立方体，支持切片与上卷。"""
+
+    def __init__(self, arrays):
+        self.a = arrays
+        self.count = arrays["count"]
+
+    @property
+    def total(self):
+        return int(self.count.sum())
+
+    def values(self, dim):
+        return self.a[f"{dim}_values"]
+
+    def names(self, dim):
+        if dim == "decade":
+            return np.asarray([("不详" if v == UNKNOWN else f"{v}s") for v in self.values(dim).tolist()])
+        return self.a[f"{dim}_name"]
+
+    def mask(self, dynasties=None, categories=None, decades=None):
+        """
+        按维度值过滤，返回布尔掩码。dynasties / categories 为原始代码集合，
+        decades 为 (起, 止) 闭区间（此时年份不详的记录被排除）。
+        """
+        m = np.ones(len(self.count), dtype=bool)
+        for dim, chosen in (("dynasty", dynasties), ("category", categories)):
+            if chosen is not None:
+                m &= np.isin(self.values(dim), list(chosen))[self.a[f"{dim}_idx"]]
+        if decades is not None:
+            dec = self.values("decade")[self.a["decade_idx"]]
+            m &= (dec != UNKNOWN) & (dec >= decades[0]) & (dec <= decades[1])
+        return m
+
+    def _dim_index(self, dim, parent):
+        idx = self.a[f"{dim}_idx"]
+        if dim == "addr" and parent:
+            return self.a["addr_parent"][idx]
+        return idx
+
+    def rollup(self, dims, mask=None, parent=False):
+        """
+        按所选维度上卷（其余维度求和），返回只含非零格子的 DataFrame：
+        每个维度一列下标 (<dim>_idx)，外加 count。parent=True 时地点上卷到上级行政区。
+        """
+        dims = list(dims)
+        mask = np.ones(len(self.count), dtype=bool) if mask is None else mask
+        sizes = [len(self.values(d)) for d in dims]
+        flat = np.zeros(int(mask.sum()), dtype=np.int64)
+        for d, size in zip(dims, sizes):
+            flat = flat * size + self._dim_index(d, parent)[mask]
+        keys, inverse = np.unique(flat, return_inverse=True)
+        sums = np.bincount(inverse, weights=self.count[mask], minlength=len(keys)).astype(np.int64)
+        df = pd.DataFrame({"count": sums})
+        for d, size in zip(reversed(dims), reversed(sizes)):
+            df.insert(0, f"{d}_idx", keys % size)
+            keys = keys // size
+        return df
+
+    def addr_frame(self, mask=None, parent=False):
+        """按地点汇总，附带名称与坐标（用于地图）。"""
+        df = self.rollup(["addr"], mask, parent)
+        idx = df["addr_idx"].to_numpy()
+        df["地点"] = self.a["addr_name"][idx]
+        df["lon"] = self.a["addr_x"][idx]
+        df["lat"] = self.a["addr_y"][idx]
+        return df.sort_values("count", ascending=False, ignore_index=True)
@@ -0,0 +1,121 @@
+"""
+任意表的数据分页预览：按 rowid 键集分页，每次只读取固定行数的一块。
+
+- 键集分页 `WHERE rowid > ? ORDER BY rowid LIMIT ?` 走主键 B 树定位，翻到第几页都不扫描前面的行，
+  也不像 OFFSET 那样越翻越慢；
+- 标准库 sqlite3 只能逐行返回元组，无法按列取数：每块至多 size 行的元组转置为列后构造 Arrow 数组
+  （不再经过逐行 dict / DataFrame），st.dataframe 可直接显示；
+- 最近读取的块保存在进程级 LRU 缓存中，往回翻页时直接命中；
+- 可选按推断的代码表连线（*_CODES 以及 BIOG_MAIN、DYNASTIES）把代码列解码为中文名称，
+  每块只对其中出现的不同代码做一次批量查询。
+pyarrow 在第一次预览时才导入。
+"""
+import threading
+from collections import OrderedDict
+
+CHUNK_ROWS = 200
+FIRST_ROWID = -(2 ** 63)  # 第一页的起点：比任何 rowid 都小
+LOOKUP_BATCH = 500
+
+# 除 *_CODES 之外，也作为代码表解码的目标表
+LOOKUP_TABLES = ("BIOG_MAIN", "DYNASTIES")
+
+
+def _column_array(pa, values):
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+        # SQLite 列是动态类型，同一列混有数字与文本时按文本展示
+        return pa.array([None if v is None else str(v) for v in values], pa.string())
+
+
+def fetch_chunk(conn, table, after_rowid=FIRST_ROWID, size=CHUNK_ROWS):
+    """
+    读取 rowid > after_rowid 的前 size 行，返回 (Arrow 表, 本块最后一行的 rowid)；没有更多行时 rowid 为 None。
+    sqlite3 游标只产生行元组，这里按块取回后转置为列；内存中同时只有这一块的行。
+    表为 WITHOUT ROWID 时 SQLite 抛出 OperationalError。
+    """
+    import pyarrow as pa
+
+    cur = conn.execute(f"SELECT rowid, * FROM [{table}] WHERE rowid > ? ORDER BY rowid LIMIT ?", (after_rowid, size))
+    names = ["rowid"] + [d[0] for d in cur.description[1:]]
+    rows = cur.fetchall()
+    if not rows:
+        return pa.table({n: pa.array([], pa.string()) for n in names}), None
+    columns = list(zip(*rows))
+    return pa.Table.from_arrays([_column_array(pa, col) for col in columns], names=names), columns[0][-1]
+
+
+def _label_column(columns):
+    """代码表中用于显示的名称列：优先中文名称 (*_chn)，其次说明 (*_desc)。"""
+    for suffix in ("_chn", "_desc"):
+        for col in columns:
+            if col.lower().endswith(suffix):
+                return col
+    return None
+
+
+def code_lookups(table, edges, schema_docs):
+    """
+    由推断连线得到 table 的可解码代码列，返回 [(代码列, 代码表, 名称列), ...]。
+    只取指向代码表、且代码表有同名键与名称列的连线。
+    """
+    out = []
+    for src, dst, column in edges:
+        if src != table or dst == table:
+            continue
+        if not (dst.upper().endswith("_CODES") or dst.upper() in LOOKUP_TABLES):
+            continue
+        dst_columns = [row[0] for row in schema_docs.get(dst, [])]
+        label = _label_column(dst_columns)
+        if column in dst_columns and label and label != column:
+            out.append((column, dst, label))
+    return out
+
+
+def decode_codes(conn, chunk, lookups):
+    """在每个代码列之后插入解码后的名称列（列名形如「c_dy → c_dynasty_chn」）。"""
+    import pyarrow as pa
+
+    for column, target, label in lookups:
+        if column not in chunk.column_names:
+            continue
+        values = chunk.column(column).to_pylist()
+        codes = list({v for v in values if v is not None})
+        names = {}
+        for i in range(0, len(codes), LOOKUP_BATCH):
+            batch = codes[i:i + LOOKUP_BATCH]
+            names.update(conn.execute(
+                f"SELECT [{column}], MIN([{label}]) FROM [{target}] "
+                f"WHERE [{column}] IN ({','.join('?' * len(batch))}) GROUP BY 1", batch))
+        decoded = [None if names.get(v) is None else str(names[v]) for v in values]
+        chunk = chunk.add_column(chunk.column_names.index(column) + 1, f"{column} → {label}",
+                                 pa.array(decoded, pa.string()))
+    return chunk
+
+
+class ChunkCache:
+    """线程安全的块级 LRU 缓存。"""
+
+    def __init__(self, max_chunks=32):
+        self.max_chunks = max_chunks
+        self._chunks = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key, loader):
+        """返回 (值, 是否命中缓存)；未命中时调用 loader() 读取并放入缓存。"""
+        with self._lock:
+            if key in self._chunks:
+                self._chunks.move_to_end(key)
+                self.hits += 1
+                return self._chunks[key], True
+        value = loader()
+        with self._lock:
+            self.misses += 1
+            self._chunks[key] = value
+            self._chunks.move_to_end(key)
+            while len(self._chunks) > self.max_chunks:
+                self._chunks.popitem(last=False)
+        return value, False
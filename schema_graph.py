@@ -0,0 +1,116 @@
+"""
+带索引的表结构关系图。
+
+替代原先在 Python 列表上做 `not in` 判重的边集合：
+- 邻接表 adj[表] -> {相邻表: [连接字段, ...]}，查询相邻表为 O(1)
+- 双向边索引（集合），加边判重为 O(1)
+- 字段关联表 col_to_tables[字段] -> [表, ...]
+- 任意两表之间的最短连接路径（BFS），在 precompute_paths() 后直接查表
+"""
+from collections import deque
+
+
+class SchemaGraph:
+    def __init__(self):
+        self.tables = []            # 节点（保持加入顺序）
+        self.edges = []             # [(src, dst, label), ...]，保持加入顺序，供拓扑图渲染
+        self.adj = {}               # {表: {相邻表: [字段, ...]}}
+        self.col_to_tables = {}     # {字段: [表, ...]}
+        self._table_cols = set()    # {(表, 字段)}，生成 JOIN 条件时判断字段归属
+        self._edge_index = set()    # {(src, dst, label)}，正反两个方向都登记
+        self._paths = None          # {起点: {终点: (上一跳表, 字段)}}，precompute_paths() 后生成
+
+    # ---------------- 构建 ----------------
+    def add_table(self, table):
+        if table not in self.adj:
+            self.tables.append(table)
+            self.adj[table] = {}
+
+    def add_column(self, table, col):
+        self.col_to_tables.setdefault(col, []).append(table)
+        self._table_cols.add((table, col))
+
+    def add_edge(self, src, dst, label):
+        """添加一条无向连接；自环或已存在（任一方向）时返回 False。"""
+        if src == dst or (src, dst, label) in self._edge_index:
+            return False
+        self._edge_index.add((src, dst, label))
+        self._edge_index.add((dst, src, label))
+        self.edges.append((src, dst, label))
+        self.add_table(src)
+        self.add_table(dst)
+        self.adj[src].setdefault(dst, []).append(label)
+        self.adj[dst].setdefault(src, []).append(label)
+        self._paths = None
+        return True
+
+    def is_connected(self, table):
+        return bool(self.adj.get(table))
+
+    # ---------------- 查询 ----------------
+    def neighbors(self, table):
+        """相邻表及连接字段：{相邻表: [字段, ...]}。"""
+        return self.adj.get(table, {})
+
+    def tables_with_column(self, col):
+        """包含指定字段的所有表。"""
+        return self.col_to_tables.get(col, [])
+
+    def _bfs(self, start):
+        parents = {start: None}
+        queue = deque([start])
+        while queue:
+            cur = queue.popleft()
+            for nxt, labels in self.adj[cur].items():
+                if nxt not in parents:
+                    parents[nxt] = (cur, labels[0])
+                    queue.append(nxt)
+        return parents
+
+    def precompute_paths(self):
+        """为每个表预先跑一次 BFS，缓存最短路径树（表数为 n 时总代价 O(n·(n+e))）。"""
+        self._paths = {t: self._bfs(t) for t in self.tables}
+
+    def shortest_path(self, src, dst):
+        """
+        两表之间的最短连接路径，返回 [(表A, 表B, 字段), ...]；
+        src == dst 时返回空列表，不连通时返回 None。
+        """
+        if src not in self.adj or dst not in self.adj:
+            return None
+        if self._paths is None:
+            self.precompute_paths()
+        parents = self._paths[src]
+        if dst not in parents:
+            return None
+        hops = []
+        cur = dst
+        while parents[cur] is not None:
+            prev, label = parents[cur]
+            hops.append((prev, cur, label))
+            cur = prev
+        hops.reverse()
+        return hops
+
+    def _key_column(self, table, label):
+        """
+        连接字段在某张表中的实际列名。
+        命名推断的连接字段可能只存在于一侧（如 BIOG_MAIN.c_index_addr_id -> ADDR_CODES.c_addr_id）。
+        """
+        if (table, label) in self._table_cols:
+            return label
+        stripped = label.replace("index_", "")
+        if (table, stripped) in self._table_cols:
+            return stripped
+        return label
+
+    def join_sql(self, src, dst, limit=100):
+        """按最短连接路径生成 JOIN 语句；不连通时返回 None。"""
+        hops = self.shortest_path(src, dst)
+        if hops is None:
+            return None
+        lines = [f"SELECT *\nFROM {src} T0"]
+        for i, (a, b, label) in enumerate(hops, start=1):
+            lines.append(f"JOIN {b} T{i} ON T{i - 1}.{self._key_column(a, label)} = T{i}.{self._key_column(b, label)}")
+        lines.append(f"LIMIT {limit}")
+        return "\n".join(lines)
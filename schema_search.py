@@ -0,0 +1,114 @@
+"""
+表结构检索：在表名、字段名、表含义 (TABLE_LIST) 与字段释义上做内存倒排索引。
+
+文档分两类：每张表一条（表名 + 表含义），每个字段一条（字段名 + 释义 + 所在表）。
+词元为字符 n-gram，中文不需要分词器：
+- 汉字与人物检索共用 text_tokens 的规则，切成单字 + 相邻二字，查询时两字及以上只用二字词元；
+- 字母数字按 _ 等分隔切词，词本身作词元，长于 3 的词再加上各个三字母片段，
+  查询 addr 也能命中 c_addr_id、ADDRESSES。
+倒排表为 {词元: {文档: 权重}}，名称中的词元权重高于释义；查询对各词元的 idf × 权重求和
+（长词整词命中另有加分）。只返回命中词元最多的文档：全部命中的优先，没有时退而求其次；
+二字词元完全找不到时（如「科举」），再按单字检索。
+"""
+import math
+import re
+from collections import defaultdict
+
+from text_tokens import cjk_query_tokens, cjk_runs, cjk_tokens, latin_words
+
+NAME_WEIGHT = 3.0  # 表名 / 字段名中的词元相对释义的权重
+EXACT_BONUS = 100.0  # 查询与名称完全相同时的加分
+
+
+def index_tokens(text):
+    """建索引用的词元：汉字单字 + 二字，字母数字词及其三字母片段。"""
+    tokens = cjk_tokens(text)
+    for word in latin_words(text):
+        tokens.append(word)
+        if len(word) > 3:
+            tokens.extend(word[i:i + 3] for i in range(len(word) - 2))
+    return tokens
+
+
+def query_tokens(query, single_chars=False):
+    """
+    查询用的词元，返回 (必需词元, 加分词元)，均去重保序。与 index_tokens 对应，
+    长词以三字母片段匹配、整词只用于加分；single_chars=True 时汉字按单字切分。
+    """
+    tokens, bonus = [], []
+    for run in cjk_runs(query):
+        tokens.extend(list(run) if single_chars else cjk_query_tokens(run))
+    for word in latin_words(query):
+        if len(word) <= 3:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i:i + 3] for i in range(len(word) - 2))
+            bonus.append(word)
+    return list(dict.fromkeys(tokens)), list(dict.fromkeys(bonus))
+
+
+class SchemaSearchIndex:
+    def __init__(self, docs):
+        """docs 为 dict 列表：kind ("table" / "field")、name、meaning、tables（字段所在的表）。"""
+        self.docs = docs
+        postings = defaultdict(dict)
+        for i, doc in enumerate(docs):
+            for tok in index_tokens(doc["name"]):
+                postings[tok][i] = postings[tok].get(i, 0.0) + NAME_WEIGHT
+            for tok in index_tokens(doc["meaning"]):
+                postings[tok][i] = postings[tok].get(i, 0.0) + 1.0
+        self.postings = dict(postings)
+        n = len(docs)
+        self.idf = {tok: math.log(1 + n / len(p)) for tok, p in self.postings.items()}
+
+    @classmethod
+    def from_schema(cls, schema_docs, table_meaning_map, field_info):
+        """由结构字典 {表: [[字段, 类型, 释义], ...]}、表含义与 {字段: {desc, tables}} 建立索引。"""
+        docs = []
+        for table in sorted(schema_docs):
+            meaning = table_meaning_map.get(table.upper(), table_meaning_map.get(table, ""))
+            docs.append({"kind": "table", "name": table, "meaning": meaning or "", "tables": [table]})
+        for field in sorted(field_info):
+            info = field_info[field]
+            desc = "" if info["desc"] == field else info["desc"]
+            docs.append({"kind": "field", "name": field, "meaning": desc, "tables": list(info["tables"])})
+        return cls(docs)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def _score(self, tokens, bonus):
+        scores = defaultdict(float)
+        hits = defaultdict(int)
+        for tok in tokens:
+            for doc, weight in self.postings.get(tok, {}).items():
+                scores[doc] += self.idf[tok] * weight
+                hits[doc] += 1
+        for tok in bonus:
+            for doc, weight in self.postings.get(tok, {}).items():
+                if doc in scores:
+                    scores[doc] += self.idf[tok] * weight
+        return scores, hits
+
+    def search(self, query, limit=20):
+        """返回按相关度排序的文档 dict 列表（附 score）；没有可检索内容时返回空列表。"""
+        tokens, bonus = query_tokens(query)
+        if not tokens:
+            return []
+        scores, hits = self._score(tokens, bonus)
+        if not hits:
+            scores, hits = self._score(*query_tokens(query, single_chars=True))
+        if not hits:
+            return []
+
+        need = max(hits.values())
+        exact = query.strip().lower()
+        ranked = []
+        for doc, score in scores.items():
+            if hits[doc] < need:
+                continue
+            if self.docs[doc]["name"].lower() == exact:
+                score += EXACT_BONUS
+            ranked.append((-score, self.docs[doc]["kind"] != "table", self.docs[doc]["name"], doc))
+        ranked.sort()
+        return [dict(self.docs[doc], score=round(-neg, 3)) for neg, _, _, doc in ranked[:limit]]
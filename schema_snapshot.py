@@ -0,0 +1,308 @@
+"""
+数据库结构快照：按数据库指纹缓存表结构分析结果，并支持按表增量刷新。
+
+指纹由 (文件大小, mtime, PRAGMA schema_version) 组成。指纹不变时直接复用；
+指纹变化时只比较 sqlite_master 中每张表的 DDL，只有 DDL 改变（或新增）的表
+才重新执行 PRAGMA table_info，并只为这些表重算命名规则连接。
+"""
+import hashlib
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+
+from cbdb_cache import atomic_target, cache_path
+from schema_graph import SchemaGraph
+
+IGNORE_COLS = {"c_created_by", "c_created_date", "c_modified_by", "c_modified_date", "tts_sysno", "c_notes", "c_source",
+               "c_pages"}
+
+# 快照格式版本，修改缓存结构或连接推断规则时递增
+SNAPSHOT_FORMAT = 1
+
+
+def db_fingerprint(db_path):
+    """返回数据库指纹 (文件大小, mtime_ns, schema_version)。"""
+    st_ = os.stat(db_path)
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+    finally:
+        conn.close()
+    return st_.st_size, st_.st_mtime_ns, schema_version
+
+
+def classify_table(table_upper):
+    """简单的分组逻辑：按表名关键字归入拓扑图中的模块。"""
+    if "BIOG" in table_upper:
+        return "Core"
+    if any(x in table_upper for x in ["OFFICE", "POSTED", "APPT"]):
+        return "Office"
+    if "KIN" in table_upper:
+        return "Kinship"
+    if "ASSOC" in table_upper:
+        return "Social"
+    if "ENTRY" in table_upper:
+        return "Entry"
+    if "TEXT" in table_upper:
+        return "Text"
+    if any(x in table_upper for x in ["CODES", "DYNAST", "ADDR"]):
+        return "Dict"
+    return "Other"
+
+
+def describe_field(fname, field_desc_map):
+    """字段释义：优先取 Excel 字典，没有时按命名规则兜底推断。"""
+    desc = field_desc_map.get(fname, "")
+    if not desc:
+        if fname.endswith("_chn"):
+            desc = "中文名称"
+        elif fname.endswith("_code"):
+            desc = "代码 (FK)"
+        elif fname.endswith("_id"):
+            desc = "ID (FK)"
+        elif fname.endswith("_year"):
+            desc = "年份"
+    return desc
+
+
+# ---------------- 表结构读取 ----------------
+def _read_table_ddl(conn):
+    """返回 {表名: DDL 哈希}，保持 sqlite_master 中的顺序；大小写重复的表名只保留最后一个。"""
+    rows = conn.execute("SELECT name, sql FROM sqlite_master WHERE type='table';").fetchall()
+    by_upper = {}
+    for name, sql in rows:
+        if name.startswith("sqlite_"):
+            continue
+        by_upper[name.upper()] = (name, hashlib.sha1((sql or "").encode("utf-8")).hexdigest())
+    return {name: ddl_hash for name, ddl_hash in by_upper.values()}
+
+
+# 按表名过滤时的参数个数上限（低于旧版 SQLite 默认的 999 个绑定参数）
+MAX_FILTER_PARAMS = 500
+
+# 一次集合查询取出所有表的全部列：sqlite_master 与 pragma_table_info 表值函数连接
+BULK_COLUMNS_SQL = """SELECT m.name, p.name, p.type
+FROM sqlite_master m
+JOIN pragma_table_info(m.name) p
+WHERE m.type = 'table'{name_filter}
+ORDER BY m.rowid, p.cid"""
+
+
+def _introspect_tables_bulk(conn, tables):
+    """单条查询读取指定表的列信息，在一次遍历中按表分组，返回 {表名: [(列名, 类型), ...]}。"""
+    wanted = set(tables)
+    params = []
+    name_filter = ""
+    # 只刷新部分表时把表名作为参数传入，避免把全库列信息都取回来
+    if len(wanted) <= MAX_FILTER_PARAMS:
+        name_filter = f" AND m.name IN ({', '.join('?' * len(wanted))})"
+        params = sorted(wanted)
+    rows = conn.execute(BULK_COLUMNS_SQL.format(name_filter=name_filter), params).fetchall()
+
+    result = {}
+    for table_real, col, ctype in rows:
+        if table_real not in wanted: continue
+        cols = result.get(table_real)
+        if cols is None:
+            cols = result[table_real] = []
+        cols.append((col, ctype))
+    # 没有列的表（极少见）不会出现在连接结果里，补齐为空列表
+    for table_real in tables:
+        result.setdefault(table_real, [])
+    return result
+
+
+def _introspect_tables_per_table(conn, tables):
+    """逐表执行 PRAGMA table_info（旧版 SQLite 或批量查询失败时的兜底路径）；读取失败的表跳过。"""
+    result = {}
+    for table_real in tables:
+        try:
+            rows = conn.execute(f"PRAGMA table_info({table_real})").fetchall()
+        except sqlite3.Error:
+            continue
+        result[table_real] = [(r[1], r[2]) for r in rows]
+    return result
+
+
+def _introspect_tables(conn, tables):
+    """读取指定表的列信息，返回 {表名: [(列名, 类型), ...]}。"""
+    if not tables:
+        return {}
+    try:
+        return _introspect_tables_bulk(conn, tables)
+    except sqlite3.Error:
+        # SQLite < 3.16 没有 pragma_table_info；或个别表（如缺少模块的虚表）导致整条查询失败
+        return _introspect_tables_per_table(conn, tables)
+
+
+# ---------------- 持久化快照 ----------------
+def _snapshot_file(db_path):
+    key = hashlib.sha1(os.path.abspath(db_path).encode("utf-8")).hexdigest()[:16]
+    return cache_path(f"schema_v{SNAPSHOT_FORMAT}_{key}.json")
+
+
+def _load_persisted(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_persisted(path, data):
+    tmp = atomic_target(path)
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+@contextmanager
+def _connect(db_path, pool=None):
+    """优先从连接池借用只读连接，没有连接池时临时打开一个。"""
+    if pool is not None:
+        with pool.connection() as conn:
+            yield conn
+        return
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def refresh_table_columns(db_path, pool=None):
+    """
+    增量刷新表结构。
+    返回 (tables, changed)：tables 为 {表名: {"ddl": 哈希, "columns": [[列名, 类型], ...], "rule_edges": [...]}}，
+    changed 为本次重新读取过的表名集合（指纹未变时为空集合）。
+    """
+    fingerprint = list(db_fingerprint(db_path))
+    path = _snapshot_file(db_path)
+    cached = _load_persisted(path)
+    if cached and cached.get("fingerprint") == fingerprint:
+        return cached["tables"], set()
+
+    old_tables = cached["tables"] if cached else {}
+
+    with _connect(db_path, pool) as conn:
+        ddl = _read_table_ddl(conn)
+        changed = [t for t, h in ddl.items() if t not in old_tables or old_tables[t]["ddl"] != h]
+        fresh = _introspect_tables(conn, changed)
+
+    # 表名集合变化会影响所有表的连接候选，此时所有表的规则连接都要重算
+    same_table_set = set(ddl) == set(old_tables)
+    tables = {}
+    for t, h in ddl.items():
+        if t in fresh:
+            tables[t] = {"ddl": h, "columns": [list(c) for c in fresh[t]], "rule_edges": None}
+        elif t in old_tables and t not in changed:
+            entry = dict(old_tables[t])
+            if not same_table_set:
+                entry["rule_edges"] = None
+            tables[t] = entry
+        # 其余：DDL 变化但读取失败的表，与旧逻辑一致直接跳过
+
+    _fill_rule_edges(tables)
+    _save_persisted(path, {"fingerprint": fingerprint, "tables": tables})
+    return tables, set(fresh)
+
+
+# ---------------- 连接推断 ----------------
+def _rule_edges_for(table_real, columns, table_map):
+    """第二遍扫描中单张表的命名规则连接，返回 [(src, dst, label), ...]（未去重）。"""
+    table_names = set(table_map.values())
+    out = []
+    for col, _ in columns:
+        if col in IGNORE_COLS: continue
+
+        # 强规则连接
+        if col == "c_personid" and "BIOG_MAIN" in table_names:
+            out.append((table_real, "BIOG_MAIN", col))
+            continue
+        if col == "c_dy" and "DYNASTIES" in table_names:
+            out.append((table_real, "DYNASTIES", col))
+            continue
+
+        # 命名推断连接 (例如 c_addr_id -> ADDR_CODES)
+        if "_code" in col or "_id" in col:
+            core_root = col.replace("c_", "").replace("_code", "").replace("_id", "").replace("index_", "").upper()
+            if len(core_root) > 2:
+                candidates = [f"{core_root}_CODES", f"{core_root}_DATA", f"CODE_{core_root}"]
+                for cand in candidates:
+                    if cand in table_map and table_map[cand] != table_real:
+                        out.append((table_real, table_map[cand], col))
+                        break
+    return out
+
+
+def _fill_rule_edges(tables):
+    """为 rule_edges 缺失（新读取或失效）的表计算命名规则连接。"""
+    table_map = {t.upper(): t for t in tables}
+    for t, entry in tables.items():
+        if entry.get("rule_edges") is None:
+            entry["rule_edges"] = [list(e) for e in _rule_edges_for(t, entry["columns"], table_map)]
+
+
+def build_schema(tables, table_meaning_map, field_desc_map):
+    """
+    由表结构生成拓扑图与字典所需的全部数据。
+    返回 (nodes, edges, schema_docs, field_info_for_js, all_link_keys, graph)，graph 为 SchemaGraph。
+    """
+    nodes = {}
+    schema_docs = {}
+    field_info_for_js = {}
+    graph = SchemaGraph()
+
+    # --- 第一遍扫描：构建节点 (表) ---
+    for table_real, entry in tables.items():
+        table_upper = table_real.upper()
+        columns = entry["columns"]
+        graph.add_table(table_real)
+
+        # 📝 使用从 Excel 加载的字典
+        # 尝试大写匹配，如果没有再尝试原名匹配
+        cn_meaning = table_meaning_map.get(table_upper, table_meaning_map.get(table_real, ""))
+        if not cn_meaning: cn_meaning = "(未定义含义)"
+
+        # 纯文本 Tooltip
+        tooltip_text = f"【 {table_real} 】\n\n📝 含义: {cn_meaning}\n📊 列数: {len(columns)}"
+
+        nodes[table_real] = {
+            "label": table_real,
+            "group": classify_table(table_upper),
+            "title": tooltip_text
+        }
+
+        doc_rows = []
+        for fname, ftype in columns:
+            if fname not in IGNORE_COLS:
+                graph.add_column(table_real, fname)
+
+            desc = describe_field(fname, field_desc_map)
+            doc_rows.append([fname, ftype, desc])
+
+            if fname not in field_info_for_js:
+                field_info_for_js[fname] = {"desc": desc or fname, "tables": []}
+            field_info_for_js[fname]["tables"].append(table_real)
+
+        schema_docs[table_real] = doc_rows
+
+    # --- 第二遍扫描：建立连接 (基于命名规则，按表缓存) ---
+    for table_real, entry in tables.items():
+        for src, dst, label in entry["rule_edges"]:
+            graph.add_edge(src, dst, label)
+
+    # --- 第三遍扫描：孤岛救援 (基于字段同名) ---
+    orphan_tables = [t for t in nodes if not graph.is_connected(t)]
+    for orphan in orphan_tables:
+        for fname, _ in tables[orphan]["columns"]:
+            if fname in IGNORE_COLS: continue
+            # 与第一个同样拥有该字段的其他表相连
+            other = next((t for t in graph.tables_with_column(fname) if t != orphan), None)
+            if other is not None:
+                graph.add_edge(orphan, other, fname)
+            if graph.is_connected(orphan): break
+
+    graph.precompute_paths()
+    return nodes, graph.edges, schema_docs, field_info_for_js, sorted(graph.col_to_tables), graph
@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from batch_export import _write_parquet
+
+
+def _write(tmp_path, chunks, names=("v",)):
+    path = os.path.join(tmp_path, "out.parquet")
+    rows = _write_parquet(list(names), iter(chunks), path)
+    return rows, pq.read_table(path), sorted(os.listdir(tmp_path))
+
+
+def test_mixed_type_column_widens_to_string(tmp_path):
+    rows, table, files = _write(tmp_path, [[(1,), (2,)], [(2.5,), ("x",)]])
+    assert rows == 4
+    assert table.schema.field("v").type == pa.string()
+    assert table.column("v").to_pylist() == ["1", "2", "2.5", "x"]
+    assert files == ["out.parquet"]  # 重写用的临时文件已替换掉
+
+
+def test_int_then_float_widens_to_float(tmp_path):
+    rows, table, _ = _write(tmp_path, [[(1, "a"), (2, "b")], [(2.5, "c"), (None, None)]], names=("v", "s"))
+    assert table.schema.field("v").type == pa.float64()
+    assert table.column("v").to_pylist() == [1.0, 2.0, 2.5, None]
+    assert table.column("s").to_pylist() == ["a", "b", "c", None]
+
+
+def test_all_null_first_chunk_takes_later_type(tmp_path):
+    rows, table, _ = _write(tmp_path, [[(None,)], [(3,), (4,)]])
+    assert table.schema.field("v").type == pa.int64()
+    assert table.column("v").to_pylist() == [None, 3, 4]
+
+
+def test_no_rows_writes_empty_file(tmp_path):
+    rows, table, _ = _write(tmp_path, [], names=("a", "b"))
+    assert rows == 0
+    assert table.column_names == ["a", "b"]
@@ -0,0 +1,52 @@
+import sqlite3
+
+from column_stats import profile_table
+
+
+def _make_db(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v TEXT, n INTEGER)")
+    conn.executemany("INSERT INTO t VALUES (?, ?, ?)",
+                     ((i, None if i % 4 == 0 else f"v{i % 7}", i) for i in range(1, rows + 1)))
+    conn.commit()
+    conn.close()
+
+
+def test_small_table_is_scanned_in_full(tmp_path):
+    db = str(tmp_path / "s.db")
+    _make_db(db, 100)
+    stats = profile_table(db, "t")
+    assert (stats["rows"], stats["scanned"], stats["sampled"]) == (100, 100, False)
+    assert stats["columns"]["v"]["null_rate"] == 0.25
+    assert stats["columns"]["v"]["distinct"] == 7
+    assert (stats["columns"]["n"]["min"], stats["columns"]["n"]["max"]) == (1, 100)
+
+
+def test_large_table_is_sampled_by_rowid_probes(tmp_path):
+    db = str(tmp_path / "l.db")
+    _make_db(db, 5000)
+    stats = profile_table(db, "t", scan_limit=1000, sample_rows=400)
+    assert stats["rows"] == 5000 and stats["sampled"]
+    assert 300 < stats["scanned"] <= 400
+    assert abs(stats["columns"]["v"]["null_rate"] - 0.25) < 0.1
+    # 近似唯一的列按总行数外推
+    assert stats["columns"]["n"]["distinct"] > 2500
+    assert profile_table(db, "t", scan_limit=1000, sample_rows=400) == stats
+
+
+def test_failed_tables_are_not_cached(tmp_path, monkeypatch):
+    import column_stats
+    import cbdb_cache
+
+    monkeypatch.setattr(cbdb_cache, "CACHE_DIR", str(tmp_path / "cache"))
+    db = str(tmp_path / "c.db")
+    _make_db(db, 10)
+    stats = column_stats.load_or_profile(db, (1, 2), ["t", "missing"], workers=1)
+    assert "error" in stats["missing"] and stats["t"]["rows"] == 10
+
+    calls = []
+    real = column_stats.profile_tables
+    monkeypatch.setattr(column_stats, "profile_tables",
+                        lambda db_path, tables, workers=None: calls.append(list(tables)) or real(db_path, tables, workers))
+    column_stats.load_or_profile(db, (1, 2), ["t", "missing"], workers=1)
+    assert calls == [["missing"]]  # 成功的表来自缓存，失败的表重试
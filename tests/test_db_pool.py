@@ -0,0 +1,42 @@
+import sqlite3
+
+import pytest
+
+from db_pool import PoolTimeout, ReadOnlyPool
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "t.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (x)")
+    conn.execute("INSERT INTO t VALUES (1)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_connections_are_reused(db):
+    pool = ReadOnlyPool(db, max_connections=2)
+    with pool.connection() as conn:
+        assert conn.execute("SELECT x FROM t").fetchone() == (1,)
+    with pool.connection() as again:
+        assert again is conn
+    assert pool.stats()["hits"] == 1
+
+
+def test_exhausted_pool_raises_pool_timeout(db):
+    pool = ReadOnlyPool(db, max_connections=1, timeout=0.05)
+    with pool.connection():
+        with pytest.raises(PoolTimeout):
+            with pool.connection():
+                pass
+
+
+def test_closed_pool_closes_connections_on_release(db):
+    pool = ReadOnlyPool(db)
+    with pool.connection() as conn:
+        pool.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    assert pool.stats()["idle"] == 0
@@ -0,0 +1,12 @@
+import os
+
+from index_advisor import prune_sidecars
+
+
+def test_prune_sidecars_keeps_only_the_current_copy(tmp_path):
+    for name in ("indexed_1_2_3.db", "indexed_4_5_6.db", "codebook_v1_x.sqlite", "indexed_notes.txt"):
+        (tmp_path / name).write_bytes(b"")
+    keep = str(tmp_path / "indexed_4_5_6.db")
+    removed = prune_sidecars(keep)
+    assert [os.path.basename(p) for p in removed] == ["indexed_1_2_3.db"]
+    assert sorted(os.listdir(tmp_path)) == ["codebook_v1_x.sqlite", "indexed_4_5_6.db", "indexed_notes.txt"]
@@ -0,0 +1,47 @@
+import sqlite3
+
+from nianhao import NianhaoIndex, register_functions
+
+
+def _conn():
+    conn = sqlite3.connect(":memory:")
+    index = NianhaoIndex([1, 2], [1056, 1064], [1063, 1067], ["嘉祐", "治平"], ["宋", "宋"])
+    assert register_functions(conn, index)
+    return conn
+
+
+def test_functions_convert_numeric_arguments():
+    conn = _conn()
+    assert conn.execute("SELECT nianhao_year(1, 2), nianhao_label(1, 2), nianhao_eras(1057)").fetchone() == \
+        (1057, "嘉祐 2年", "宋 嘉祐 2年")
+    # 文本形式的数字按数值解释
+    assert conn.execute("SELECT nianhao_year('1', '2'), nianhao_eras('1064')").fetchone() == (1057, "宋 治平 1年")
+
+
+def test_functions_return_null_on_bad_arguments():
+    conn = _conn()
+    row = conn.execute("SELECT nianhao_eras('abc'), nianhao_year('x', 2), nianhao_label(1, x'ff'), "
+                       "nianhao_year(NULL, 2), nianhao_eras(9999)").fetchone()
+    assert row == (None, None, None, None, None)
+
+
+def test_vectorised_conversion_treats_text_and_fractional_ids_as_unknown():
+    index = NianhaoIndex([1, 2], [1056, 1064], [1063, 1067], ["嘉祐", "治平"], ["宋", "宋"])
+    ids = [1, "1", "abc", 2.5, None, 1]
+    years = [2, "2", 2, 2, 2, "x"]
+    western = index.to_western(ids, years)
+    assert western[:2].tolist() == [1057, 1057]
+    assert all(w != w for w in western[2:])  # NaN
+    assert index.labels(ids, years).tolist() == ["嘉祐 2年", "嘉祐 2年", None, None, None, None]
+    assert index.describe_years([1057, "abc", 1057.5]) == ["宋 嘉祐 2年", None, None]
+
+
+def test_batch_export_conversion_does_not_abort_on_bad_rows():
+    from batch_export import convert_nianhao
+
+    index = NianhaoIndex([1], [1056], [1063], ["嘉祐"], ["宋"])
+    names = ["人物ID", "年号ID", "年号年"]
+    chunks = [[(1, 1, 2), (2, "abc", 2), (3, 2.5, 2)]]
+    out_names, out = convert_nianhao(names, iter(chunks), index)
+    assert out_names == ["人物ID", "年号纪年", "年号换算西历"]
+    assert list(out) == [[(1, "嘉祐 2年", 1057), (2, None, None), (3, None, None)]]
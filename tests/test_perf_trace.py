@@ -0,0 +1,21 @@
+import sqlite3
+import time
+
+from perf_trace import read_sql, sql_trace, start_trace, stop_trace
+
+
+def test_python_work_is_not_charged_to_the_previous_statement():
+    trace = start_trace()
+    try:
+        conn = sqlite3.connect(":memory:")
+        with sql_trace(conn):
+            conn.execute("SELECT 1").fetchall()
+            time.sleep(0.05)  # 两条语句之间的 Python 工作
+            read_sql("SELECT 1 AS a UNION ALL SELECT 2", conn)
+    finally:
+        stop_trace()
+    first, second = trace.statements
+    assert first["duration_ms"] is None and first["rows"] is None
+    assert second["rows"] == 2
+    assert second["duration_ms"] is not None and second["duration_ms"] < 50
+    assert "plan" in first
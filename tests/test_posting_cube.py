@@ -0,0 +1,19 @@
+import sqlite3
+
+from posting_cube import UNKNOWN, build_cube
+
+
+def test_year_zero_is_an_unknown_decade():
+    conn = sqlite3.connect(":memory:")
+    conn.executescript("""
+        CREATE TABLE POSTED_TO_OFFICE_DATA (c_posting_id, c_firstyear, c_dy, c_office_category_id);
+        CREATE TABLE POSTED_TO_ADDR_DATA (c_posting_id, c_addr_id);
+        CREATE TABLE ADDRESSES (c_addr_id, c_name_chn, x_coord, y_coord);
+        INSERT INTO POSTED_TO_OFFICE_DATA VALUES (1, 1057, 15, 1), (2, 0, 15, 1), (3, NULL, 15, 1), (4, -5, 15, 1);
+        INSERT INTO POSTED_TO_ADDR_DATA VALUES (1, 100), (2, 100), (3, 100), (4, 100);
+        INSERT INTO ADDRESSES VALUES (100, '开封', 114.3, 34.8);
+    """)
+    ts = {r[0].upper(): r[0] for r in conn.execute("SELECT name FROM sqlite_master")}
+    arrays = build_cube(conn, ts)
+    decades = dict(zip(arrays["decade_values"][arrays["decade_idx"]].tolist(), arrays["count"].tolist()))
+    assert decades == {1050: 1, UNKNOWN: 2, -10: 1}
@@ -0,0 +1,53 @@
+import sqlite3
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+from row_preview import FIRST_ROWID, ChunkCache, fetch_chunk
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT, v)")
+    conn.executemany("INSERT INTO t VALUES (?, ?, ?)", [(i * 3, f"n{i}", i) for i in range(1, 11)])
+    yield conn
+    conn.close()
+
+
+def test_paging_round_trip(conn):
+    pages, after = [], FIRST_ROWID
+    while True:
+        chunk, last = fetch_chunk(conn, "t", after, size=4)
+        if last is None:
+            assert chunk.num_rows == 0
+            break
+        pages.append(chunk.column("rowid").to_pylist())
+        after = last
+    assert [len(p) for p in pages] == [4, 4, 2]
+    assert sum(pages, []) == [i * 3 for i in range(1, 11)]
+    # 从任一页的最后一行继续读取，得到的就是下一页
+    chunk, _ = fetch_chunk(conn, "t", pages[0][-1], size=4)
+    assert chunk.column("rowid").to_pylist() == pages[1]
+    assert chunk.column_names == ["rowid", "id", "name", "v"]
+
+
+def test_mixed_type_column_is_shown_as_text(conn):
+    conn.execute("UPDATE t SET v = 'x' WHERE id = 6")
+    conn.execute("UPDATE t SET v = 2.5 WHERE id = 9")
+    chunk, _ = fetch_chunk(conn, "t", size=4)
+    assert chunk.schema.field("v").type == pa.string()
+    assert chunk.column("v").to_pylist() == ["1", "x", "2.5", "4"]
+    # 其他列保持原类型
+    assert chunk.schema.field("id").type == pa.int64()
+
+
+def test_chunk_cache_evicts_least_recently_used():
+    cache = ChunkCache(max_chunks=2)
+    assert cache.get_or_load("a", lambda: 1) == (1, False)
+    cache.get_or_load("b", lambda: 2)
+    assert cache.get_or_load("a", lambda: 0) == (1, True)
+    cache.get_or_load("c", lambda: 3)
+    assert cache.get_or_load("b", lambda: 22) == (22, False)
+    assert (cache.hits, cache.misses) == (1, 4)
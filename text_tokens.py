@@ -0,0 +1,39 @@
+"""
+中文检索共用的切词规则（人物检索 person_search 与表结构检索 schema_search 共用）。
+
+中文不需要分词器：汉字按连续串切成「单字 + 相邻二字」词元，查询时单字用单字、
+两字及以上只用相邻二字；字母数字按连续串切词并转为小写。
+建索引与查询两端必须使用同一套规则；修改规则时需递增人物检索的落盘索引版本 (person_search.INDEX_FORMAT)。
+"""
+import re
+
+CJK_RUN = re.compile(r"[㐀-䶿一-鿿豈-﫿\U00020000-\U0002ffff]+")
+LATIN_WORD = re.compile(r"[0-9A-Za-z]+")
+
+
+def cjk_runs(text):
+    """文本中的连续汉字串。"""
+    return CJK_RUN.findall(text or "")
+
+
+def latin_words(text):
+    """文本中的字母数字词（小写）。"""
+    return [w.lower() for w in LATIN_WORD.findall(text or "")]
+
+
+def cjk_tokens(text):
+    """把文本中的汉字切成单字与相邻二字词元（如 东坡居士 -> 东 东坡 坡 坡居 居 居士 士）。"""
+    tokens = []
+    for run in cjk_runs(text):
+        for i, ch in enumerate(run):
+            tokens.append(ch)
+            if i + 1 < len(run):
+                tokens.append(run[i:i + 2])
+    return tokens
+
+
+def cjk_query_tokens(run):
+    """查询端切分一个汉字串：单字查询用单字词元，两字及以上用相邻二字词元。"""
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]